@@ -1,7 +1,9 @@
 import gurobipy as gp
 from gurobipy import GRB
 
-def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, S, R, L_SLO):
+from d2_options import as_solver_options
+
+def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, S, R, L_SLO, options=None):
 
     print("M_SRC Source Nodes:")
     print(M_SRC)
@@ -135,6 +137,7 @@ def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, S, R, L_SLO):
         name="Const10")
 
     model.Params.Threads = 1
+    as_solver_options(options).major.apply(model)
 
     # Run Optimization
     model.optimize()
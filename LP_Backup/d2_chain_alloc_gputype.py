@@ -1,15 +1,19 @@
 import gurobipy as gp
 from gurobipy import GRB
 
-def lp_scheduler3(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
+from d2_options import as_solver_options
+from d2_profile import as_profile_table
 
-    P_conf = gp.tuplelist([(m, g, k) for m in M for g in G for k in range(len(P[m, g]))])
+def lp_scheduler3(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, options=None):
 
-    P_b = {(m, g, k): P[m, g][k][0] for m, g, k in P_conf}
-    P_p = {(m, g, k): P[m, g][k][1] for m, g, k in P_conf}
-    P_l = {(m, g, k): P[m, g][k][2] for m, g, k in P_conf}
-    P_d = {(m, g, k): P[m, g][k][3] for m, g, k in P_conf}
-    P_r = {(m, g, k): P[m, g][k][4] for m, g, k in P_conf}
+    P = as_profile_table(P, M, G)
+    P_conf = gp.tuplelist(P.conf())
+
+    P_b = P.column_dict('batch', P_conf)
+    P_p = P.column_dict('parallel', P_conf)
+    P_l = P.column_dict('latency', P_conf)
+    P_d = P.column_dict('duration', P_conf)
+    P_r = P.column_dict('throughput', P_conf)
 
     R_upper = {(m, g, k): R[m] for m, g, k in P_conf}
 
@@ -33,6 +37,7 @@ def lp_scheduler3(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
 
     # Gurobi Parameters
     model.Params.Threads = 1
+    as_solver_options(options).major.apply(model)
     model.update()
 
     # Objective Function
@@ -190,6 +195,7 @@ def lp_scheduler3(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
     # Gurobi Parameters
     model.Params.Threads = 1
     model.Params.NonConvex = 2
+    as_solver_options(options).partial.apply(model)
     model.update()
 
     # Objective Function
@@ -292,7 +298,7 @@ def lp_scheduler3(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
     print("L_MAX = {}".format(critical_lat.x))
 
 
-def lp_scheduler2(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
+def lp_scheduler2(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, options=None):
 
     # print("M_SRC Source Nodes:")
     # print(M_SRC)
@@ -301,13 +307,14 @@ def lp_scheduler2(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
     # print("DAG:")
     # print(DAG)
 
-    P_conf = gp.tuplelist([(m, g, k) for m in M for g in G for k in range(len(P[m, g]))])
+    P = as_profile_table(P, M, G)
+    P_conf = gp.tuplelist(P.conf())
 
-    P_b = {(m, g, k): P[m, g][k][0] for m, g, k in P_conf}
-    P_p = {(m, g, k): P[m, g][k][1] for m, g, k in P_conf}
-    P_l = {(m, g, k): P[m, g][k][2] for m, g, k in P_conf}
-    P_d = {(m, g, k): P[m, g][k][3] for m, g, k in P_conf}
-    P_r = {(m, g, k): P[m, g][k][4] for m, g, k in P_conf}
+    P_b = P.column_dict('batch', P_conf)
+    P_p = P.column_dict('parallel', P_conf)
+    P_l = P.column_dict('latency', P_conf)
+    P_d = P.column_dict('duration', P_conf)
+    P_r = P.column_dict('throughput', P_conf)
 
     # print("P_conf PROFILE CONF:")
     # print(P_conf)
@@ -350,6 +357,7 @@ def lp_scheduler2(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
     # Gurobi Parameters
     model.Params.Threads = 5
     model.Params.NonConvex = 2
+    as_solver_options(options).major.apply(model)
     model.update()
 
     # print("VARIABLE: X")
@@ -504,7 +512,7 @@ def lp_scheduler2(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
 
     model.write('Resource_Allocation_GPU_Type.lp')
 
-def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
+def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, options=None):
 
     # print("M_SRC Source Nodes:")
     # print(M_SRC)
@@ -513,13 +521,14 @@ def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
     # print("DAG:")
     # print(DAG)
 
-    P_conf = gp.tuplelist([(m, g, k) for m in M for g in G for k in range(len(P[m, g]))])
+    P = as_profile_table(P, M, G)
+    P_conf = gp.tuplelist(P.conf())
 
-    P_b = {(m, g, k): P[m, g][k][0] for m, g, k in P_conf}
-    P_p = {(m, g, k): P[m, g][k][1] for m, g, k in P_conf}
-    P_l = {(m, g, k): P[m, g][k][2] for m, g, k in P_conf}
-    P_d = {(m, g, k): P[m, g][k][3] for m, g, k in P_conf}
-    P_r = {(m, g, k): P[m, g][k][4] for m, g, k in P_conf}
+    P_b = P.column_dict('batch', P_conf)
+    P_p = P.column_dict('parallel', P_conf)
+    P_l = P.column_dict('latency', P_conf)
+    P_d = P.column_dict('duration', P_conf)
+    P_r = P.column_dict('throughput', P_conf)
 
     # print("P_conf PROFILE CONF:")
     # print(P_conf)
@@ -557,6 +566,7 @@ def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
 
     # Gurobi Parameters
     model.Params.Threads = 1
+    as_solver_options(options).major.apply(model)
     model.update()
 
     # print("VARIABLE: X")
@@ -1,4 +1,4 @@
-from d2_chain_alloc import lp_scheduler
+from LP_Backup.d2_chain_alloc import lp_scheduler
 
 def DAG1():
     '''
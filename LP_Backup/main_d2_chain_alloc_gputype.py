@@ -1,4 +1,4 @@
-from d2_chain_alloc_gputype import *
+from LP_Backup.d2_chain_alloc_gputype import *
 
 def DAG1():
     '''
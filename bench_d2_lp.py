@@ -0,0 +1,817 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from main_d2_lp import *
+from d2_batch import schedule_many
+from d2_cache import SolutionCache
+from d2_scenarios import lp_scheduler_scenarios
+from d2_frontier import slo_frontier
+from d2_greedy import greedy_scheduler
+from d2_integrated import paired_options
+from d2_options import PhaseOptions, SolverOptions
+from d2_scheduler import D2Scheduler
+from d2_sweep import capacity_curve
+from d2_tables import CostTables, compile_tables, table_scheduler
+
+def bench_build(num_module, num_gpu):
+    """
+    Time model construction (no solve) for both phases on a synthetic DAG.
+    """
+    input = DAG_synthetic(num_module, num_gpu)
+    M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO = (input[key] for key in
+        ("M", "DAG", "M_SRC", "M_SNK", "G", "P", "C", "R", "L_SLO"))
+
+    t0 = time.perf_counter()
+    P = as_profile_table(P, M, G)
+    P_conf = gp.tuplelist(P.conf())
+    M_conf = conf_index(M, P_conf)
+    P_b = P.column_dict('batch', P_conf)
+    P_l = P.column_dict('latency', P_conf)
+    P_d = P.column_dict('duration', P_conf)
+    P_r = P.column_dict('throughput', P_conf)
+
+    t1 = time.perf_counter()
+    model, *_ = build_major_model(M, DAG, M_SRC, M_SNK, G, C, R, L_SLO, P_conf, M_conf, P_l, P_r)
+    model.update()
+    t2 = time.perf_counter()
+    model.dispose()
+
+    # Pretend the major phase picked config 0 on the first GPU type everywhere
+    alloc_conf = {(m, g, k): int(g == G[0] and k == 0) for m, g, k in P_conf}
+    alloc_gpu = {(m, g): int(g == G[0]) for m in M for g in G}
+    rate_res = {m: R[m] % P_r[m, G[0], 0] or P_r[m, G[0], 0] for m in M}
+    util_res = {m: rate_res[m] / P_r[m, G[0], 0] for m in M}
+
+    t3 = time.perf_counter()
+    model, x, r, u, *_ = build_partial_model(M, DAG, M_SRC, M_SNK, G, C, L_SLO, P_conf, M_conf, P_b, P_l, P_d, P_r)
+    fix_partial_model(model, x, r, u, P_conf, P_r, alloc_conf, alloc_gpu, rate_res, util_res)
+    model.update()
+    t4 = time.perf_counter()
+    model.dispose()
+
+    return dict(conf=len(P_conf), edge=len(DAG), input=t1 - t0, major=t2 - t1, partial=t4 - t3)
+
+def main_build(args):
+    print("{:>8} {:>6} {:>9} {:>7} {:>10} {:>10} {:>12}".format(
+        "modules", "gpus", "configs", "edges", "major (s)", "partial (s)", "us / config"))
+    for num_module in args.modules:
+        res = bench_build(num_module, args.gpus)
+        print("{:>8} {:>6} {:>9} {:>7} {:>10.2f} {:>10.2f} {:>12.2f}".format(
+            num_module, args.gpus, res["conf"], res["edge"], res["major"], res["partial"],
+            (res["major"] + res["partial"]) / res["conf"] * 1e6))
+
+def bench_builder(num_module, num_gpu, builder, trace):
+    """
+    Time and Python peak allocation of the major model build, from raw P to
+    model.update(), for the expression or matrix builder. tracemalloc slows
+    both builders down several times, so time and memory are separate runs.
+    """
+    input = DAG_synthetic(num_module, num_gpu)
+    M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO = (input[key] for key in
+        ("M", "DAG", "M_SRC", "M_SNK", "G", "P", "C", "R", "L_SLO"))
+
+    if trace:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    if builder == "matrix":
+        model, *_ = build_major_model_matrix(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO)
+    else:
+        P = as_profile_table(P, M, G)
+        P_conf = gp.tuplelist(P.conf())
+        M_conf = conf_index(M, P_conf)
+        P_l = P.column_dict('latency', P_conf)
+        P_r = P.column_dict('throughput', P_conf)
+        model, *_ = build_major_model(M, DAG, M_SRC, M_SNK, G, C, R, L_SLO, P_conf, M_conf, P_l, P_r)
+    model.update()
+    t1 = time.perf_counter()
+    peak = 0
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    res = dict(time=t1 - t0, peak=peak, var=model.NumVars, constr=model.NumConstrs + model.NumQConstrs)
+    model.dispose()
+    return res
+
+def main_builder(args):
+    print("{:>8} {:>6} {:>8} {:>9} {:>10} {:>10} {:>12}".format(
+        "modules", "gpus", "builder", "vars", "constrs", "build (s)", "py peak (MB)"))
+    for num_module in args.modules:
+        for builder in ("expr", "matrix"):
+            res = bench_builder(num_module, args.gpus, builder, trace=False)
+            res["peak"] = bench_builder(num_module, args.gpus, builder, trace=True)["peak"]
+            print("{:>8} {:>6} {:>8} {:>9} {:>10} {:>10.2f} {:>12.1f}".format(
+                num_module, args.gpus, builder, res["var"], res["constr"], res["time"], res["peak"] / 2**20))
+
+def drift_rates(R, steps, scale=0.05, seed=0):
+    """Random walk of the rate vector, a few percent per control tick."""
+    rng = random.Random(seed)
+    R = dict(R)
+    for _ in range(steps):
+        R = {m: max(1, int(round(v * (1 + rng.uniform(-scale, scale))))) for m, v in R.items()}
+        yield R
+
+def main_resolve(args):
+    """
+    Rebuild-per-tick (lp_scheduler) vs. one persistent D2Scheduler patched
+    with update_rates, on a drifting rate vector.
+    """
+    input = DAG_synthetic(args.modules, args.gpus) if args.modules else DAG1()
+    ticks = list(drift_rates(input["R"], args.ticks))
+
+    wall = solver = 0.0
+    for R in ticks:
+        t0 = time.perf_counter()
+        res = lp_scheduler(**dict(input, R=R), builder=args.builder, verbose=False, engine="mip")
+        wall += time.perf_counter() - t0
+        solver += res["major"]["runtime"] + (res["partial"]["runtime"] if res["partial"] else 0.0)
+    print("rebuild    : {:8.1f} ms / tick, solver {:8.1f} ms / tick".format(
+        wall / len(ticks) * 1e3, solver / len(ticks) * 1e3))
+
+    for warm_start in (False, True):
+        t0 = time.perf_counter()
+        scheduler = D2Scheduler(**input, builder=args.builder, warm_start=warm_start)
+        build = time.perf_counter() - t0
+        wall = solver = major = 0.0
+        for R in ticks:
+            t0 = time.perf_counter()
+            scheduler.update_rates(R)
+            res = scheduler.solve()
+            wall += time.perf_counter() - t0
+            major += res["major"]["runtime"]
+            solver += res["major"]["runtime"] + (res["partial"]["runtime"] if res["partial"] else 0.0)
+        print("{:11s}: {:8.1f} ms / tick, solver {:8.1f} ms / tick, major {:8.1f} ms / tick (one-off build {:.1f} ms)".format(
+            "warm start" if warm_start else "persistent", wall / len(ticks) * 1e3, solver / len(ticks) * 1e3,
+            major / len(ticks) * 1e3, build * 1e3))
+
+def bench_instances(args):
+    """DAG1, DAG2 and DAG_synthetic(n, args.gpus) for n in args.modules."""
+    yield "DAG1", DAG1()
+    yield "DAG2", DAG2()
+    for num_module in args.modules:
+        yield "syn{}x{}".format(num_module, args.gpus), DAG_synthetic(num_module, args.gpus, seed=args.seed)
+
+def solve_major_only(input, time_limit=None, **kw):
+    """Build and solve only the major model; returns (build s, solve s, objective, status)."""
+    M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO = (input[key] for key in
+        ("M", "DAG", "M_SRC", "M_SNK", "G", "P", "C", "R", "L_SLO"))
+    t0 = time.perf_counter()
+    P = as_profile_table(P, M, G)
+    P_conf = gp.tuplelist(P.conf())
+    M_conf = conf_index(M, P_conf)
+    model, *_ = build_major_model(M, DAG, M_SRC, M_SNK, G, C, R, L_SLO, P_conf, M_conf,
+                                  P.column_dict('latency', P_conf), P.column_dict('throughput', P_conf), **kw)
+    model.Params.OutputFlag = 0
+    if time_limit:
+        model.Params.TimeLimit = time_limit
+    model.update()
+    build = time.perf_counter() - t0
+    model.optimize(getattr(model, "_solve_callback", None))
+    res = (build, model.Runtime, model.ObjVal if model.SolCount else None, model.Status)
+    model.dispose()
+    return res
+
+def main_link(args):
+    """Constr3 encodings of the major model: bilinear vs. big-M vs. indicator."""
+    print("{:>12} {:>10} {:>10} {:>10} {:>14} {:>7}".format(
+        "instance", "link", "build (s)", "solve (s)", "objective", "status"))
+    for name, input in bench_instances(args):
+        for link in ("bilinear", "bigm", "indicator"):
+            try:
+                build, solve, obj, status = solve_major_only(input, args.time_limit, link=link)
+            except gp.GurobiError as e:
+                print("{:>12} {:>10} {}".format(name, link, e))
+                continue
+            print("{:>12} {:>10} {:>10.3f} {:>10.3f} {:>14} {:>7}".format(
+                name, link, build, solve, "-" if obj is None else "{:.6f}".format(obj), status))
+
+def main_partial(args):
+    """Partial phase as a nonconvex MIQCP vs. the lookup MILP (major phase with the bigm link)."""
+    print("{:>12} {:>10} {:>10} {:>14} {:>7}".format("instance", "partial", "solve (s)", "objective", "status"))
+    for name, input in bench_instances(args):
+        for mode in ("nonconvex", "lookup"):
+            try:
+                res = lp_scheduler(**input, verbose=False, link="bigm", partial_mode=mode, engine="mip")
+            except gp.GurobiError as e:
+                print("{:>12} {:>10} {}".format(name, mode, e))
+                continue
+            partial = res["partial"]
+            if partial is None:
+                print("{:>12} {:>10} {:>10} {:>14} {:>7}".format(name, mode, "-", "no remainder", "-"))
+                continue
+            print("{:>12} {:>10} {:>10.3f} {:>14} {:>7}".format(
+                name, mode, partial["runtime"],
+                "-" if partial["objective"] is None else "{:.6f}".format(partial["objective"]), partial["status"]))
+
+def main_dp(args):
+    """
+    d2_dp against the MIP (bigm link, lookup partial model) on DAG1 / DAG2 and
+    synthetic out-trees, over a range of SLOs: both phases must reach the same
+    objective.
+    """
+    instances = [("DAG1", DAG1()), ("DAG2", DAG2())]
+    instances += [("tree{}x{}".format(n, args.gpus), DAG_synthetic(n, args.gpus, extra_edge=0.0, seed=args.seed))
+                  for n in args.modules]
+
+    print("{:>12} {:>6} {:>8} {:>14} {:>14} {:>10} {:>10} {:>6}".format(
+        "instance", "SLO", "phase", "mip", "dp", "mip (ms)", "dp (ms)", "match"))
+    for name, input in instances:
+        for scale in args.slo:
+            input_slo = dict(input, L_SLO=input["L_SLO"] * scale)
+            try:
+                mip = lp_scheduler(**input_slo, verbose=False, link="bigm", partial_mode="lookup", engine="mip")
+            except gp.GurobiError as e:
+                print("{:>12} {:>6.2f} {}".format(name, input_slo["L_SLO"], e))
+                continue
+            dp = lp_scheduler(**input_slo, verbose=False, engine="dp")
+            for phase in ("major", "partial"):
+                a, b = mip[phase], dp[phase]
+                obj_a = None if a is None else a["objective"]
+                obj_b = None if b is None else b["objective"]
+                match = obj_a == obj_b if obj_a is None or obj_b is None else abs(obj_a - obj_b) <= 1e-6 * max(1.0, abs(obj_a))
+                print("{:>12} {:>6.2f} {:>8} {:>14} {:>14} {:>10} {:>10} {:>6}".format(
+                    name, input_slo["L_SLO"], phase,
+                    "-" if obj_a is None else "{:.6f}".format(obj_a), "-" if obj_b is None else "{:.6f}".format(obj_b),
+                    "-" if a is None else "{:.2f}".format(a["runtime"] * 1e3),
+                    "-" if b is None else "{:.2f}".format(b["runtime"] * 1e3), "ok" if match else "DIFF"))
+
+def replicate_gpus(input, copies):
+    """Every GPU type of `input` plus `copies` - 1 interchangeable duplicates."""
+    G = [g if i == 0 else "{}_{}".format(g, i) for g in input["G"] for i in range(copies)]
+    base = {g if i == 0 else "{}_{}".format(g, i): g for g in input["G"] for i in range(copies)}
+    P = {(m, g): input["P"][m, base[g]] for m in input["M"] for g in G if (m, base[g]) in input["P"]}
+    return dict(input, G=G, P=P, C={g: input["C"][base[g]] for g in G})
+
+def main_aggregate(args):
+    """Model size and wall time with and without the GPU-class presolve (d2_presolve)."""
+    instances = [("DAG2", DAG2())]
+    instances += [("syn{}x{}x{}".format(n, args.gpus, args.copies),
+                   replicate_gpus(DAG_synthetic(n, args.gpus, seed=args.seed), args.copies)) for n in args.modules]
+
+    print("{:>14} {:>10} {:>8} {:>10} {:>14} {:>14}".format(
+        "instance", "aggregate", "gpus", "wall (s)", "major", "partial"))
+    for name, input in instances:
+        for aggregate in (False, True):
+            G = aggregate_gpus(input["P"], input["M"], input["G"], input["C"])[1] if aggregate else input["G"]
+            t0 = time.perf_counter()
+            try:
+                res = lp_scheduler(**input, verbose=False, link="bigm", partial_mode="lookup", engine="mip",
+                                   aggregate=aggregate)
+            except gp.GurobiError as e:
+                print("{:>14} {:>10} {:>8} {}".format(name, str(aggregate), len(G), e))
+                continue
+            wall = time.perf_counter() - t0
+            obj = [res[phase] and res[phase]["objective"] for phase in ("major", "partial")]
+            print("{:>14} {:>10} {:>8} {:>10.3f} {:>14} {:>14}".format(
+                name, str(aggregate), len(G), wall, *("-" if v is None else "{:.6f}".format(v) for v in obj)))
+
+def main_prune(args):
+    """Rows removed by the dominance presolve per phase, and the objectives with and without it."""
+    print("{:>12} {:>6} {:>8} {:>8} {:>8} {:>10} {:>14} {:>14}".format(
+        "instance", "prune", "rows", "major", "partial", "wall (s)", "major obj", "partial obj"))
+    for name, input in bench_instances(args):
+        rows = len(as_profile_table(input["P"], input["M"], input["G"]))
+        for prune in (False, True):
+            t0 = time.perf_counter()
+            try:
+                res = lp_scheduler(**input, verbose=False, link="bigm", partial_mode="lookup", engine=args.engine,
+                                   prune=prune)
+            except gp.GurobiError as e:
+                print("{:>12} {:>6} {}".format(name, str(prune), e))
+                continue
+            wall = time.perf_counter() - t0
+            major, partial = res["major"], res["partial"]
+            print("{:>12} {:>6} {:>8} {:>8} {:>8} {:>10.3f} {:>14} {:>14}".format(
+                name, str(prune), rows, major.get("pruned", "-"), partial["pruned"] if partial else "-", wall,
+                *("-" if d is None or d["objective"] is None else "{:.6f}".format(d["objective"]) for d in (major, partial))))
+
+def main_precedence(args):
+    """
+    Per-(edge, config) vs. per-edge vs. lazy (callback) precedence rows of
+    the major model (bigm link, no pruning); "lazy" counts the edge rows the
+    callback added.
+    """
+    print("{:>12} {:>11} {:>8} {:>8} {:>6} {:>10} {:>10} {:>14} {:>7}".format(
+        "instance", "precedence", "rows", "nonzeros", "lazy", "build (s)", "solve (s)", "objective", "status"))
+    for name, input in bench_instances(args):
+        for precedence in ("per_config", "aggregated", "lazy"):
+            M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO = (input[key] for key in
+                ("M", "DAG", "M_SRC", "M_SNK", "G", "P", "C", "R", "L_SLO"))
+            t0 = time.perf_counter()
+            model, *_ = build_major_model_matrix(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, link="bigm",
+                                                 precedence=precedence)
+            model.Params.OutputFlag = 0
+            model.Params.TimeLimit = args.time_limit
+            model.update()
+            build = time.perf_counter() - t0
+            try:
+                model.optimize(getattr(model, "_solve_callback", None))
+            except gp.GurobiError as e:
+                print("{:>12} {:>11} {}".format(name, precedence, e))
+                continue
+            print("{:>12} {:>11} {:>8} {:>8} {:>6} {:>10.3f} {:>10.3f} {:>14} {:>7}".format(
+                name, precedence, model.NumConstrs, model.NumNZs, getattr(model, "_lazy_added", "-"), build,
+                model.Runtime,
+                "{:.6f}".format(model.ObjVal) if model.SolCount else "-", model.Status))
+            model.dispose()
+
+def main_backend(args):
+    """Native Gurobi models vs. the LinearModel formulation on each Backend (bigm / lookup, MIP engine)."""
+    print("{:>12} {:>8} {:>10} {:>14} {:>14}".format("instance", "backend", "wall (s)", "major", "partial"))
+    for name, input in bench_instances(args):
+        for backend in (None, "gurobi", "highs"):
+            t0 = time.perf_counter()
+            try:
+                res = lp_scheduler(**input, verbose=False, link="bigm", partial_mode="lookup", engine="mip",
+                                   backend=backend, options=SolverOptions(PhaseOptions(time_limit=args.time_limit),
+                                                                          PhaseOptions(time_limit=args.time_limit)))
+            except gp.GurobiError as e:
+                print("{:>12} {:>8} {}".format(name, backend or "native", e))
+                continue
+            wall = time.perf_counter() - t0
+            major, partial = res["major"]["objective"], res["partial"] and res["partial"]["objective"]
+            print("{:>12} {:>8} {:>10.3f} {:>14} {:>14}".format(
+                name, backend or "native", wall, "-" if major is None else "{:.6f}".format(major),
+                "-" if partial is None else "{:.6f}".format(partial)))
+
+def main_greedy(args):
+    """greedy_scheduler vs. the optimum (HiGHS backend, so no instance is too large for the license)."""
+    def cost(res):
+        if res["major"]["objective"] is None or (res["partial"] and res["partial"]["objective"] is None):
+            return None
+        return res["major"]["objective"] + (res["partial"]["objective"] if res["partial"] else 0.0)
+
+    print("{:>12} {:>12} {:>12} {:>12} {:>12} {:>8}".format(
+        "instance", "greedy (ms)", "greedy", "solve (s)", "optimum", "gap"))
+    for name, input in bench_instances(args):
+        input = dict(input, P=as_profile_table(input["P"], input["M"], input["G"]))
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            greedy = cost(greedy_scheduler(**input))
+        t_greedy = (time.perf_counter() - t0) / args.repeat
+        t0 = time.perf_counter()
+        optimum = cost(lp_scheduler(**input, verbose=False, link="bigm", partial_mode="lookup", engine="mip",
+                                    backend="highs"))
+        t_solve = time.perf_counter() - t0
+        print("{:>12} {:>12.3f} {:>12} {:>12.3f} {:>12} {:>8}".format(
+            name, t_greedy * 1e3, "-" if greedy is None else "{:.4f}".format(greedy), t_solve,
+            "-" if optimum is None else "{:.4f}".format(optimum),
+            "-" if greedy is None or not optimum else "{:.1%}".format(greedy / optimum - 1.0)))
+
+def main_decomp(args):
+    """
+    Major phase by decomp_major (bound and gap) vs. greedy_major and the
+    optimum (HiGHS backend, --time-limit; 0 skips it on large instances).
+    """
+    print("{:>12} {:>12} {:>10} {:>12} {:>12} {:>8} {:>6} {:>10} {:>12}".format(
+        "instance", "greedy", "decomp (s)", "decomp", "bound", "gap", "iter", "solve (s)", "optimum"))
+    for name, input in bench_instances(args):
+        M, DAG, M_SNK, G, C, R, L_SLO = (input[key] for key in ("M", "DAG", "M_SNK", "G", "C", "R", "L_SLO"))
+        P = as_profile_table(input["P"], M, G)
+        greedy = greedy_major(M, DAG, M_SNK, G, P, C, R, L_SLO)["objective"]
+        t0 = time.perf_counter()
+        decomp = decomp_major(M, DAG, M_SNK, G, P, C, R, L_SLO, max_iter=args.max_iter, tol=args.tol,
+                              workers=args.workers or None)
+        t_decomp = time.perf_counter() - t0
+
+        optimum, t_solve = None, None
+        if args.time_limit:
+            t0 = time.perf_counter()
+            model, cols = linear_major(M, input["DAG"], input["M_SRC"], M_SNK, G, P, C, R, L_SLO)
+            optimum = as_backend("highs").decision(model, cols, P.conf(), M,
+                                                   options=PhaseOptions(time_limit=args.time_limit))["objective"]
+            t_solve = time.perf_counter() - t0
+
+        number = lambda v: "-" if v is None else "{:.4f}".format(v)
+        print("{:>12} {:>12} {:>10.3f} {:>12} {:>12} {:>8} {:>6} {:>10} {:>12}".format(
+            name, number(greedy), t_decomp, number(decomp["objective"]), number(decomp["bound"]),
+            "{:.2%}".format(decomp["gap"]), decomp["iterations"], "-" if t_solve is None else "{:.3f}".format(t_solve),
+            number(optimum)))
+
+def main_tables(args):
+    """
+    compile_tables (offline, saved and memory-mapped back) and
+    table_scheduler vs. greedy_scheduler and the optimum (HiGHS backend,
+    --time-limit; 0 skips it), on the rates 0 .. max R[m].
+    """
+    def cost(res):
+        if res["major"]["objective"] is None or (res["partial"] and res["partial"]["objective"] is None):
+            return None
+        return res["major"]["objective"] + (res["partial"]["objective"] if res["partial"] else 0.0)
+
+    number = lambda v: "-" if v is None else "{:.4f}".format(v)
+    print("{:>12} {:>11} {:>9} {:>9} {:>10} {:>12} {:>12} {:>12}".format(
+        "instance", "compile (s)", "size (MB)", "load (ms)", "table (ms)", "table", "greedy", "optimum"))
+    for name, input in bench_instances(args):
+        input = dict(input, P=as_profile_table(input["P"], input["M"], input["G"]))
+        t0 = time.perf_counter()
+        tables = compile_tables(input["M"], input["G"], input["P"], input["C"],
+                                np.arange(0, max(input["R"].values()) + 1), n_latency=args.latency)
+        t_compile = time.perf_counter() - t0
+
+        with tempfile.TemporaryDirectory() as path:
+            tables.save(path)
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 2**20
+            t0 = time.perf_counter()
+            tables = CostTables.load(path)
+            t_load = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                table = cost(table_scheduler(**input, tables=tables, check=False))
+            t_table = (time.perf_counter() - t0) / args.repeat
+            del tables
+
+        greedy = cost(greedy_scheduler(**input))
+        optimum = None
+        if args.time_limit:
+            optimum = cost(lp_scheduler(**input, verbose=False, link="bigm", partial_mode="lookup", engine="mip",
+                                        backend="highs", options=SolverOptions(PhaseOptions(time_limit=args.time_limit),
+                                                                               PhaseOptions(time_limit=args.time_limit))))
+        print("{:>12} {:>11.3f} {:>9.1f} {:>9.3f} {:>10.3f} {:>12} {:>12} {:>12}".format(
+            name, t_compile, size, t_load * 1e3, t_table * 1e3, number(table), number(greedy), number(optimum)))
+
+def main_integrated(args):
+    """
+    lp_scheduler end to end (wall time, both phases) in the two-phase and
+    the integrated mode on one backend, and the cost the two-phase split
+    gives up against the integrated optimum.
+
+    Both costs are major + partial as lp_scheduler reports them, so they
+    include the one instance the partial phase re-counts for every full
+    module whenever some module has a remainder. "gap" compares those
+    totals; "recount" is that artifact in the two-phase / integrated cost
+    and "gap w/o" the gap once it is taken out of both.
+
+    With --check, the integrated optimum is cross-checked at a zero MIP gap:
+    pruned vs. unpruned pairs on HiGHS, and HiGHS vs. Gurobi on the pruned
+    model ("-" where the Gurobi license is too small). Both columns should
+    be 0.
+    """
+    def cost(res):
+        if res["major"]["objective"] is None or (res["partial"] and res["partial"]["objective"] is None):
+            return None
+        return res["major"]["objective"] + (res["partial"]["objective"] if res["partial"] else 0.0)
+
+    def recount(res, C):
+        if res["partial"] is None or res["partial"]["objective"] is None:
+            return 0.0
+        util_res = res["major"]["util_res"]
+        return sum(C[g] for (m, g, k), v in res["partial"]["alloc_conf"].items() if v > 0.5 and util_res[m] == 1.0)
+
+    def gap(two, one):
+        return "-" if two is None or not one else "{:.2%}".format(two / one - 1.0)
+
+    kw = dict(verbose=False, aggregate=False, backend=args.backend,
+              options=SolverOptions(PhaseOptions(time_limit=args.time_limit), PhaseOptions(time_limit=args.time_limit)))
+    number = lambda v: "-" if v is None else "{:.4f}".format(v)
+    print("{:>12} {:>14} {:>12} {:>15} {:>12} {:>8} {:>17} {:>8} {:>8}".format(
+        "instance", "two-phase (s)", "two-phase", "integrated (s)", "integrated", "gap", "recount", "gap w/o",
+        "pairs"))
+    for name, input in bench_instances(args):
+        input = dict(input, P=as_profile_table(input["P"], input["M"], input["G"]))
+        t0 = time.perf_counter()
+        two = lp_scheduler(**input, link="bigm", partial_mode="lookup", engine="mip", **kw)
+        t_two = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        one = lp_scheduler(**input, mode="integrated", **kw)
+        t_one = time.perf_counter() - t0
+        c_two, c_one = cost(two), cost(one)
+        pairs = len(paired_options(input["M"], input["G"], input["P"], input["C"], input["R"])["mod"])
+        r_two, r_one = recount(two, input["C"]), recount(one, input["C"])
+        print("{:>12} {:>14.3f} {:>12} {:>15.3f} {:>12} {:>8} {:>17} {:>8} {:>8}".format(
+            name, t_two, number(c_two), t_one, number(c_one), gap(c_two, c_one),
+            "{} / {}".format(number(r_two), number(r_one)),
+            gap(None if c_two is None else c_two - r_two, None if c_one is None else c_one - r_one),
+            "{}/{}".format(pairs - one["major"].get("pruned", 0), pairs)))
+
+    if not args.check:
+        return
+    exact = dict(verbose=False, aggregate=False, mode="integrated",
+                 options=SolverOptions(PhaseOptions(mip_gap=0.0), PhaseOptions(mip_gap=0.0)))
+    diff = lambda a, b: "-" if a is None or b is None else "{:.2e}".format(abs(a - b))
+    print("\n{:>12} {:>12} {:>14} {:>14}".format("instance", "pruned", "unpruned diff", "gurobi diff"))
+    for name, input in bench_instances(args):
+        pruned = cost(lp_scheduler(**input, backend="highs", **exact))
+        unpruned = cost(lp_scheduler(**input, backend="highs", prune=False, **exact))
+        try:
+            gurobi = cost(lp_scheduler(**input, backend="gurobi", **exact))
+        except gp.GurobiError:
+            gurobi = None
+        print("{:>12} {:>12} {:>14} {:>14}".format(name, number(pruned), diff(pruned, unpruned), diff(pruned, gurobi)))
+
+def main_batch(args):
+    """lp_scheduler in a loop vs. schedule_many over worker processes, on rate-scaled copies of one instance."""
+    base = DAG_synthetic(args.modules, args.gpus, seed=args.seed) if args.modules else DAG2()
+    instances = [dict(base, R={m: v * (1 + 0.1 * i) for m, v in base["R"].items()}) for i in range(args.instances)]
+    kw = dict(engine=args.engine, link="bigm", partial_mode="lookup")
+
+    t0 = time.perf_counter()
+    serial = [lp_scheduler(**instance, verbose=False, **kw)["major"]["objective"] for instance in instances]
+    t_serial = time.perf_counter() - t0
+
+    print("{:>8} {:>10} {:>10} {:>8} {:>7}".format("workers", "wall (s)", "speedup", "errors", "match"))
+    print("{:>8} {:>10.3f} {:>10.2f} {:>8} {:>7}".format("loop", t_serial, 1.0, 0, "-"))
+    for workers in args.workers:
+        t0 = time.perf_counter()
+        records = list(schedule_many(instances, workers=workers, **kw))
+        wall = time.perf_counter() - t0
+        errors = sum(rec["error"] is not None for rec in records)
+        match = all(rec["result"]["major"]["objective"] == serial[rec["index"]] for rec in records if rec["error"] is None)
+        print("{:>8} {:>10.3f} {:>10.2f} {:>8} {:>7}".format(workers, wall, t_serial / wall, errors, str(match)))
+
+def main_scenarios(args):
+    """One multi-scenario major model vs. one lp_scheduler call per traffic forecast."""
+    base = DAG_synthetic(args.modules, args.gpus, seed=args.seed) if args.modules else DAG2()
+    rng = np.random.default_rng(args.seed)
+    scenarios = [{m: int(v * f) for m, v in base["R"].items()}
+                 for f in rng.uniform(args.low, args.high, size=args.scenarios)]
+    kw = dict(link="bigm", partial_mode="lookup", engine=args.engine)
+
+    t0 = time.perf_counter()
+    multi = lp_scheduler_scenarios(base, scenarios, **kw)
+    t_multi = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    loop = [lp_scheduler(**dict(base, R=dict(base["R"], **R_s)), verbose=False, **kw) for R_s in scenarios]
+    t_loop = time.perf_counter() - t0
+
+    def objectives(res):
+        return [None if d is None or d["objective"] is None else round(d["objective"], 6)
+                for d in (res["major"], res["partial"])]
+    match = sum(objectives(a) == objectives(b) for a, b in zip(multi, loop))
+    print("{:>10} {:>12} {:>10} {:>8}".format("scenarios", "multi (s)", "loop (s)", "match"))
+    print("{:>10} {:>12.3f} {:>10.3f} {:>8}".format(len(scenarios), t_multi, t_loop, "{}/{}".format(match, len(scenarios))))
+
+def main_sweep(args):
+    """Capacity curve of one source rate: warm-started D2Scheduler sweep vs. one lp_scheduler call per point."""
+    base = DAG_synthetic(args.modules, args.gpus, seed=args.seed) if args.modules else DAG2()
+    src = base["M_SRC"][0]
+    if args.scale:
+        rates = None
+        point_rates = lambda value: {m: int(round(base["R"][m] * value / base["R"][src])) for m in base["R"]}
+    else:
+        rates = point_rates = lambda value: dict(base["R"], **{src: value})
+    kw = dict(link="bigm", partial_mode="lookup")
+
+    t0 = time.perf_counter()
+    curve = capacity_curve(base, src, args.lo, args.hi, points=args.points, key=args.key, rel_tol=args.rel_tol,
+                           rates=rates, **kw)
+    t_sweep = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for point in curve["points"]:
+        lp_scheduler(**dict(base, R=point_rates(point["rate"])), verbose=False, engine="mip", **kw)
+    t_loop = time.perf_counter() - t0
+
+    print("{:>8} {:>10} {:>10} {:>10}".format("points", "segments", "sweep (s)", "loop (s)"))
+    print("{:>8} {:>10} {:>10.3f} {:>10.3f}".format(len(curve["points"]), len(curve["segments"]), t_sweep, t_loop))
+    print("\n{:>8} {:>8} {:>12} {:>12} {:>12}".format("lo", "hi", "slope", "cost lo", "cost hi"))
+    for seg in curve["segments"]:
+        print("{:>8} {:>8} {:>12} {:>12} {:>12}".format(
+            seg["lo"], seg["hi"], *("-" if v is None else "{:.6f}".format(v)
+                                    for v in (seg["slope"], seg["cost_lo"], seg["cost_hi"]))))
+
+def main_frontier(args):
+    """Cost vs. SLO frontier (epsilon constraint on one D2Scheduler), plain and lexicographic."""
+    base = DAG_synthetic(args.modules, args.gpus, seed=args.seed) if args.modules else DAG2()
+    base = dict(base, L_SLO=base["L_SLO"] * args.slo)
+    for lexicographic in (False, True):
+        t0 = time.perf_counter()
+        frontier = slo_frontier(base, eps=args.eps, lexicographic=lexicographic, link="bigm", partial_mode="lookup")
+        print("\nlexicographic={}: {} points in {:.3f} s".format(lexicographic, len(frontier), time.perf_counter() - t0))
+        print("{:>10} {:>12} {:>12} {:>12}".format("L_SLO", "critical", "cost", "major"))
+        for point in frontier:
+            print("{:>10.4f} {:>12.4f} {:>12.6f} {:>12.6f}".format(
+                point["L_SLO"], point["critical_lat"], point["cost"], point["major"]))
+
+def main_cache(args):
+    """lp_scheduler vs. SolutionCache.schedule on control ticks that revisit a few rate vectors."""
+    base = DAG_synthetic(args.modules, args.gpus, seed=args.seed) if args.modules else DAG2()
+    distinct = list(drift_rates(base["R"], args.distinct, seed=args.seed))
+    rng = random.Random(args.seed)
+    ticks = [rng.choice(distinct) for _ in range(args.ticks)]
+    kw = dict(link="bigm", partial_mode="lookup")
+
+    t0 = time.perf_counter()
+    for R in ticks:
+        lp_scheduler(**dict(base, R=R), verbose=False, **kw)
+    t_plain = time.perf_counter() - t0
+
+    cache = SolutionCache(maxsize=args.maxsize, path=args.path)
+    t0 = time.perf_counter()
+    for R in ticks:
+        cache.schedule(**dict(base, R=R), **kw)
+    t_cache = time.perf_counter() - t0
+
+    hit = [None] * 1000
+    t0 = time.perf_counter()
+    for i in range(len(hit)):
+        hit[i] = cache.schedule(**dict(base, R=ticks[-1]), **kw)
+    t_hit = (time.perf_counter() - t0) / len(hit)
+
+    print("plain : {:8.2f} ms / tick".format(t_plain / len(ticks) * 1e3))
+    print("cached: {:8.2f} ms / tick, {:.1f} us / hit, {}".format(t_cache / len(ticks) * 1e3, t_hit * 1e6, cache.stats()))
+
+def main_near(args):
+    """
+    lp_scheduler vs. SolutionCache.schedule_near on drifting rates: time per
+    tick, how the ticks were served, and the cost of reused allocations
+    relative to the optimum. --backend runs both, including the partial
+    re-solves of schedule_near, on that backend.
+    """
+    base = DAG_synthetic(args.modules, args.gpus, seed=args.seed) if args.modules else DAG2()
+    ticks = list(drift_rates(base["R"], args.ticks, scale=args.drift, seed=args.seed))
+    kw = dict(link="bigm", partial_mode="lookup", backend=args.backend)
+
+    def cost(res):
+        if res["major"]["objective"] is None or (res["partial"] and res["partial"]["objective"] is None):
+            return None
+        return res["major"]["objective"] + (res["partial"]["objective"] if res["partial"] else 0.0)
+
+    t0 = time.perf_counter()
+    optimal = [cost(lp_scheduler(**dict(base, R=R), verbose=False, **kw)) for R in ticks]
+    t_plain = time.perf_counter() - t0
+
+    cache = SolutionCache(maxsize=args.maxsize)
+    t0 = time.perf_counter()
+    near = [cost(cache.schedule_near(**dict(base, R=R), max_distance=args.distance,
+                                     reuse=args.reuse, **kw)) for R in ticks]
+    t_near = time.perf_counter() - t0
+
+    gap = [n / o - 1.0 for n, o in zip(near, optimal) if n is not None and o]
+    print("plain: {:8.2f} ms / tick".format(t_plain / len(ticks) * 1e3))
+    print("near : {:8.2f} ms / tick, {}".format(t_near / len(ticks) * 1e3, cache.stats()))
+    print("cost over optimum: mean {:.2%}, max {:.2%}; unserved {} / {}".format(
+        sum(gap) / max(len(gap), 1), max(gap, default=0.0), sum(n is None for n in near), len(ticks)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="D2 LP scheduler benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("build", help="model build time vs. instance size")
+    p.add_argument("--modules", type=int, nargs="+", default=[125, 250, 500, 1000])
+    p.add_argument("--gpus", type=int, default=50)
+    p.set_defaults(func=main_build)
+
+    p = sub.add_parser("builder", help="expression vs. matrix builder for the major model")
+    p.add_argument("--modules", type=int, nargs="+", default=[100, 500, 1000])
+    p.add_argument("--gpus", type=int, default=50)
+    p.set_defaults(func=main_builder)
+
+    p = sub.add_parser("resolve", help="rebuild per tick vs. persistent D2Scheduler")
+    p.add_argument("--modules", type=int, default=0, help="synthetic DAG size (0: DAG1)")
+    p.add_argument("--gpus", type=int, default=5)
+    p.add_argument("--ticks", type=int, default=20)
+    p.add_argument("--builder", default="expr", choices=["expr", "matrix"])
+    p.set_defaults(func=main_resolve)
+
+    p = sub.add_parser("link", help="major-model Constr3 encodings on DAG1 / DAG2 / synthetic DAGs")
+    p.add_argument("--modules", type=int, nargs="*", default=[20, 50, 100])
+    p.add_argument("--gpus", type=int, default=10)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--time-limit", type=float, default=600)
+    p.set_defaults(func=main_link)
+
+    p = sub.add_parser("partial", help="nonconvex vs. lookup partial model on DAG1 / DAG2 / synthetic DAGs")
+    p.add_argument("--modules", type=int, nargs="*", default=[20, 50, 100])
+    p.add_argument("--gpus", type=int, default=10)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=main_partial)
+
+    p = sub.add_parser("dp", help="cross-check the d2_dp engine against the MIP on chains / out-trees")
+    p.add_argument("--modules", type=int, nargs="*", default=[20, 100])
+    p.add_argument("--gpus", type=int, default=10)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--slo", type=float, nargs="+", default=[0.5, 1.0, 2.0], help="multiples of the instance SLO")
+    p.set_defaults(func=main_dp)
+
+    p = sub.add_parser("aggregate", help="GPU-class aggregation presolve on DAG2 / synthetic DAGs with duplicated GPU types")
+    p.add_argument("--modules", type=int, nargs="*", default=[20, 50])
+    p.add_argument("--gpus", type=int, default=5)
+    p.add_argument("--copies", type=int, default=4, help="interchangeable copies of every synthetic GPU type")
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=main_aggregate)
+
+    p = sub.add_parser("prune", help="dominated-configuration pruning on DAG1 / DAG2 / synthetic DAGs")
+    p.add_argument("--modules", type=int, nargs="*", default=[20, 50, 100])
+    p.add_argument("--gpus", type=int, default=10)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--engine", default="auto", choices=["auto", "mip", "dp"])
+    p.set_defaults(func=main_prune)
+
+    p = sub.add_parser("precedence", help="per-config vs. aggregated precedence rows of the major model")
+    p.add_argument("--modules", type=int, nargs="*", default=[20, 50, 100])
+    p.add_argument("--gpus", type=int, default=10)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--time-limit", type=float, default=600)
+    p.set_defaults(func=main_precedence)
+
+    p = sub.add_parser("backend", help="native Gurobi models vs. Gurobi / HiGHS backends")
+    p.add_argument("--modules", type=int, nargs="*", default=[20, 50, 100])
+    p.add_argument("--gpus", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--time-limit", type=float, default=600)
+    p.set_defaults(func=main_backend)
+
+    p = sub.add_parser("greedy", help="greedy heuristic vs. the optimum")
+    p.add_argument("--modules", type=int, nargs="*", default=[20, 50, 100])
+    p.add_argument("--gpus", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=100)
+    p.set_defaults(func=main_greedy)
+
+    p = sub.add_parser("decomp", help="Lagrangian decomposition vs. greedy heuristic and optimum, major phase")
+    p.add_argument("--modules", type=int, nargs="*", default=[100, 1000, 3000])
+    p.add_argument("--gpus", type=int, default=10)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--max-iter", type=int, default=200)
+    p.add_argument("--tol", type=float, default=1e-3)
+    p.add_argument("--workers", type=int, default=0, help="subproblem worker processes (0: in-process)")
+    p.add_argument("--time-limit", type=float, default=600, help="of the optimum (0: skip it)")
+    p.set_defaults(func=main_decomp)
+
+    p = sub.add_parser("tables", help="offline CostTables lookups vs. greedy heuristic and optimum")
+    p.add_argument("--modules", type=int, nargs="*", default=[20, 100, 1000])
+    p.add_argument("--gpus", type=int, default=10)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--latency", type=int, default=32, help="latency levels of the tables")
+    p.add_argument("--repeat", type=int, default=10)
+    p.add_argument("--time-limit", type=float, default=600, help="of the optimum (0: skip it)")
+    p.set_defaults(func=main_tables)
+
+    p = sub.add_parser("integrated", help="two-phase vs. integrated single-model lp_scheduler, time and cost gap")
+    p.add_argument("--modules", type=int, nargs="*", default=[20, 50, 100])
+    p.add_argument("--gpus", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--backend", default="highs", choices=["gurobi", "highs"])
+    p.add_argument("--time-limit", type=float, default=600, help="per solve")
+    p.add_argument("--check", action="store_true", help="cross-check pruned / unpruned and HiGHS / Gurobi optima")
+    p.set_defaults(func=main_integrated)
+
+    p = sub.add_parser("batch", help="lp_scheduler loop vs. schedule_many process pool")
+    p.add_argument("--modules", type=int, default=0, help="synthetic DAG size (0: DAG2)")
+    p.add_argument("--gpus", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--instances", type=int, default=64)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--engine", default="mip", choices=["auto", "mip", "dp"])
+    p.set_defaults(func=main_batch)
+
+    p = sub.add_parser("scenarios", help="multi-scenario major model vs. one lp_scheduler call per rate vector")
+    p.add_argument("--modules", type=int, default=0, help="synthetic DAG size (0: DAG2)")
+    p.add_argument("--gpus", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--scenarios", type=int, default=50)
+    p.add_argument("--low", type=float, default=0.5, help="smallest rate multiplier")
+    p.add_argument("--high", type=float, default=2.0, help="largest rate multiplier")
+    p.add_argument("--engine", default="auto", choices=["auto", "mip"])
+    p.set_defaults(func=main_scenarios)
+
+    p = sub.add_parser("sweep", help="capacity curve over one source rate with breakpoint detection")
+    p.add_argument("--modules", type=int, default=0, help="synthetic DAG size (0: DAG2)")
+    p.add_argument("--gpus", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--lo", type=int, default=10)
+    p.add_argument("--hi", type=int, default=10000)
+    p.add_argument("--points", type=int, default=50)
+    p.add_argument("--key", default="cost", choices=["cost", "all", "major"])
+    p.add_argument("--rel-tol", type=float, default=0.01, help="linearity tolerance of key=cost")
+    p.add_argument("--scale", action="store_true", help="scale every rate along (default: only the source rate moves)")
+    p.set_defaults(func=main_sweep)
+
+    p = sub.add_parser("frontier", help="cost vs. SLO frontier by the epsilon-constraint method")
+    p.add_argument("--modules", type=int, default=0, help="synthetic DAG size (0: DAG2)")
+    p.add_argument("--gpus", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--slo", type=float, default=2.0, help="loosest SLO, as a multiple of the instance SLO")
+    p.add_argument("--eps", type=float, default=1e-3)
+    p.set_defaults(func=main_frontier)
+
+    p = sub.add_parser("cache", help="lp_scheduler vs. SolutionCache on recurring rate vectors")
+    p.add_argument("--modules", type=int, default=0, help="synthetic DAG size (0: DAG2)")
+    p.add_argument("--gpus", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--ticks", type=int, default=200)
+    p.add_argument("--distinct", type=int, default=20, help="distinct rate vectors among the ticks")
+    p.add_argument("--maxsize", type=int, default=1024)
+    p.add_argument("--path", default=None, help="on-disk store")
+    p.set_defaults(func=main_cache)
+
+    p = sub.add_parser("near", help="lp_scheduler vs. SolutionCache.schedule_near on drifting rates")
+    p.add_argument("--modules", type=int, default=0, help="synthetic DAG size (0: DAG2)")
+    p.add_argument("--gpus", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--ticks", type=int, default=100)
+    p.add_argument("--drift", type=float, default=0.02, help="relative rate change per tick")
+    p.add_argument("--distance", type=float, default=0.1, help="max_distance of schedule_near")
+    p.add_argument("--reuse", choices=["solve", "reuse"], default="solve", help="partial decision of a reuse")
+    p.add_argument("--backend", default=None, choices=["gurobi", "highs"], help="default: the native Gurobi models")
+    p.add_argument("--maxsize", type=int, default=1024)
+    p.set_defaults(func=main_near)
+
+    args = parser.parse_args()
+    args.func(args)
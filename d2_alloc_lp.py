@@ -1,25 +1,95 @@
 import gurobipy as gp
 from gurobipy import GRB
+import numpy as np
+
+from d2_alloc_matrix import build_major_model_matrix
+from d2_backend import as_backend, bound_start_columns, linear_major, linear_partial
+from d2_dag import is_out_forest, start_times
+from d2_decomp import decomp_major, decomp_partial
+from d2_dp import dp_major, dp_partial
+from d2_greedy import greedy_major, greedy_partial
+from d2_integrated import integrated_scheduler
+from d2_lazy import lazy_precedence, lazy_schedule
+from d2_options import as_solver_options
+from d2_presolve import (aggregate_gpus, expand_result, fill_rows, major_dominated, partial_dominated,
+                         partial_latency_range, slo_infeasible)
+from d2_profile import as_profile_table, partial_latency, residual_decision
+
+def conf_index(M, P_conf):
+    """
+    Module -> [(g, k)] index over P_conf.
+
+    Built once per instance and shared by both phases, so that constraints
+    touching one module's configurations do not scan the whole P_conf.
+    """
+    M_conf = {m: [] for m in M}
+    for m, g, k in P_conf:
+        M_conf[m].append((g, k))
+    return M_conf
+
+def var_values(model, var, keys):
+    """
+    Solution values of `var` as a plain dict over `keys` (picklable, unlike a
+    tupledict), for both tupledict (expression builder) and MVar (matrix
+    builder) variables.
+    """
+    if isinstance(var, gp.MVar):
+        return dict(zip(keys, var.X.tolist()))
+    return dict(model.getAttr('x', var))
+
+def set_attr(model, attr, handle, keys, values):
+    """
+    Set `attr` (e.g. 'UB', 'RHS') of the variables / constraints `handle[k]`
+    for k in keys, from a dict or a scalar, for tupledict and matrix handles.
+    """
+    vals = [values[k] for k in keys] if isinstance(values, dict) else [values] * len(keys)
+    if isinstance(handle, (gp.MVar, gp.MConstr)):
+        setattr(handle, attr, vals)
+    else:
+        model.setAttr(attr, [handle[k] for k in keys], vals)
 
-def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
-
-    # ----------- Major Decision ----------
-
-    # Step 1: Tranform Input to gurobi format
-
-    P_conf = gp.tuplelist([(m, g, k) for m in M for g in G for k in range(len(P[m, g]))])
-
-    P_b = {(m, g, k): P[m, g][k][0] for m, g, k in P_conf}
-    P_p = {(m, g, k): P[m, g][k][1] for m, g, k in P_conf}
-    P_l = {(m, g, k): P[m, g][k][2] for m, g, k in P_conf}
-    P_d = {(m, g, k): P[m, g][k][3] for m, g, k in P_conf}
-    P_r = {(m, g, k): P[m, g][k][4] for m, g, k in P_conf}
+def update_bigm(model, x, P_conf, P_r, R):
+    """
+    Re-scale the bigm Constr3 rows (u <= R[m] / P_r * x) after R changes.
+    """
+    if model._link != "bigm":
+        return
+    constr3 = model._constr3
+    if isinstance(constr3, gp.MConstr):
+        constr3 = constr3.tolist()
+        x = x.tolist()
+        for i, (m, g, k) in enumerate(P_conf):
+            model.chgCoeff(constr3[i], x[i], -R[m] / P_r[m, g, k])
+    else:
+        for c in P_conf:
+            model.chgCoeff(constr3[c], x[c], -R[c[0]] / P_r[c])
+
+def build_major_model(M, DAG, M_SRC, M_SNK, G, C, R, L_SLO, P_conf, M_conf, P_l, P_r, link="bilinear",
+                      precedence="aggregated", env=None):
+    """
+    link: how Constr3 ties x (config selected) to u (machines used)
+        "bilinear"  (u - IntFeasTol) * (x - 0.5) >= 0, a quadratic constraint
+        "bigm"      x / P_r <= u <= R[m] / P_r * x, valid because r is an
+                    integer in [0, R[m]]
+        "indicator" x = 0 -> r <= 0 and x = 1 -> r >= 1
+    All three admit the same (x, r, u) for integer r.
+
+    precedence: how Constr6 / Constr7 see a module's latency
+        "aggregated" one Lat[m] = sum_{g, k} P_l * x per module (Constr4 lets
+                     at most one x be 1) and one row per edge / sink
+        "per_config" one row per (edge, config) and (sink, config)
+        "lazy"       as "aggregated", but the Constr6 edge rows are left out
+                     and added by a MIPSOL callback where a candidate breaks
+                     them (d2_lazy); solve_decision runs it
+
+    env: gp.Env to build the model in (None: the default environment).
+    """
 
     # Input rate upper bound
     R_upper = {(m, g, k): R[m] for m, g, k in P_conf}
 
     # Model Initialization
-    model = gp.Model("Resource_Allocation_Major")
+    model = gp.Model("Resource_Allocation_Major", env=env)
 
     # Step 2: Gurobi Decision Variables
     r = model.addVars(P_conf, vtype=GRB.INTEGER, ub=R_upper, name='R')
@@ -44,11 +114,10 @@ def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
     model.setObjective(obj, GRB.MINIMIZE)
 
     # Step 4: Constraints
-    model.addConstrs(
-        (gp.quicksum(r[m, g, k] 
-        for g in G 
-        for k in range(len(P[m, g]))) == R[m]
-        for m in M), 
+    model._constr1 = model.addConstrs(
+        (gp.quicksum(r[m, g, k]
+        for g, k in M_conf[m]) == R[m]
+        for m in M),
         name="Constr1")
 
     model.addConstrs(
@@ -56,16 +125,37 @@ def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
         for m, g, k in P_conf),
         name="Constr2")
 
-    model.addConstrs(
-        ((u[m, g, k] - model.Params.IntFeasTol) * (x[m, g, k] - 0.5) >= 0.0
-        for m, g, k in P_conf),
-        name="Constr3")
+    if link == "bigm":
+        model._constr3 = model.addConstrs(
+            (u[m, g, k] <= (R[m] / P_r[m, g, k]) * x[m, g, k]
+            for m, g, k in P_conf),
+            name="Constr3_ub")
+
+        model.addConstrs(
+            (u[m, g, k] >= x[m, g, k] / P_r[m, g, k]
+            for m, g, k in P_conf),
+            name="Constr3_lb")
+    elif link == "indicator":
+        model.addConstrs(
+            ((x[m, g, k] == 0) >> (r[m, g, k] <= 0)
+            for m, g, k in P_conf),
+            name="Constr3_off")
+
+        model.addConstrs(
+            ((x[m, g, k] == 1) >> (r[m, g, k] >= 1)
+            for m, g, k in P_conf),
+            name="Constr3_on")
+    else:
+        model.addConstrs(
+            ((u[m, g, k] - model.Params.IntFeasTol) * (x[m, g, k] - 0.5) >= 0.0
+            for m, g, k in P_conf),
+            name="Constr3")
+    model._link = link
 
     model.addConstrs(
-        (gp.quicksum(x[m, g, k] 
-        for g in G
-        for k in range(len(P[m, g]))) <= 1 
-        for m in M), 
+        (gp.quicksum(x[m, g, k]
+        for g, k in M_conf[m]) <= 1
+        for m in M),
         name="Constr4")
 
     model.addConstrs(
@@ -73,131 +163,80 @@ def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
         for m in M_SRC),
         name="Const5")
 
-    model.addConstrs(
-        (st[m] >= st[l] + (x[l, g, k] * P_l[l, g, k])
-        for l, m in DAG
-        for temp, g, k in P_conf
-        if temp == l),  
-        name='Constr6')
-
-    model.addConstrs(
-        (l_max >= st[m] + (x[m, g, k] * P_l[m, g, k])
-        for m in M_SNK
-        for temp, g, k in P_conf
-        if temp == m),  
-        name='Constr7')
-
-    model.addConstr(
-        (l_max <= L_SLO),
-        name="Const8")
-
-    # Run Optimization
-    model.optimize()
-
-    print('Runtime (in ms): ', model.Runtime*1000)
-    # model.write('Resource_Allocation_GPU_Type.lp')
+    if precedence in ("aggregated", "lazy"):
+        lat = model.addVars(M, vtype=GRB.CONTINUOUS, name='Lat')
 
-    if model.status != GRB.OPTIMAL:
-        print("WARNING: Solution is suboptimal")
-
-    # Step 5: Print Major Decision
-    alloc_conf = model.getAttr('x', x)
-    rate = model.getAttr('x', r)
-    util = model.getAttr('x', u)
-    start_time = model.getAttr('x', st)
-    critical_lat = l_max
+        model.addConstrs(
+            (lat[m] == gp.quicksum(x[m, g, k] * P_l[m, g, k]
+            for g, k in M_conf[m])
+            for m in M),
+            name='ConstrLat')
 
-    print("\n\n-------- MAJOR DECISION -----------")
-    for m, g, k in P_conf:
-        if alloc_conf[m, g, k] and rate[m, g, k] > 0:
-            # print("X[{}, {}, {}] = {}".format(m, g, k, alloc_conf[m, g, k]))
-            print("Input Rate R[{}, {}, {}] = {}".format(m, g, k, rate[m, g, k]))
-            print("Number of Machines U[{}, {}, {}] = {}".format(m, g, k, util[m, g, k]))
-
-    # for m in M:
-    #     print("ST[{}] = {}".format(m, start_time[m]))
-    print("Critical Latency L_MAX = {}\n\n".format(critical_lat.x))
-
-    print("Partial Decision Variables")
-    rate_res = {}
-    util_res = {}
-    alloc_gpu = {}
-    partial_flag = False
-    for m, g, k in P_conf:
-        if alloc_conf[m, g, k] and rate[m, g, k] > 0:
-            alloc_gpu[m, g] = 1
-            rate_res[m] = int(rate[m, g, k] % P_r[m, g, k])
-            if rate_res[m] == 0:
-                # major
-                rate_res[m] = P_r[m, g, k]
-                util_res[m] = 1.0
-            else:
-                # partial
-                partial_flag = True
-                util_res[m] = rate_res[m] / P_r[m, g, k]
-                print("Partial Rate R[{}, {}, {}] = {}".format(m, g, k, rate_res[m]))
-                print("Residual Capacity U[{}, {}, {}] = {}".format(m, g, k, util_res[m]))
+        if precedence == "lazy":
+            lazy_precedence(model, M, DAG, M_SNK, st, lat, l_max)
         else:
-            if (m, g) not in alloc_gpu:
-                alloc_gpu[m, g] = 0
-
-    # Check if we need to make a partial decision
-    if not partial_flag:
-        print("None")
-        return
+            model.addConstrs(
+                (st[m] >= st[l] + lat[l]
+                for l, m in DAG),
+                name='Constr6')
+
+        model.addConstrs(
+            (l_max >= st[m] + lat[m]
+            for m in M_SNK),
+            name='Constr7')
     else:
-        print("\nRunning Partial Decision Model:")
+        model.addConstrs(
+            (st[m] >= st[l] + (x[l, g, k] * P_l[l, g, k])
+            for l, m in DAG
+            for g, k in M_conf[l]),
+            name='Constr6')
+
+        model.addConstrs(
+            (l_max >= st[m] + (x[m, g, k] * P_l[m, g, k])
+            for m in M_SNK
+            for g, k in M_conf[m]),
+            name='Constr7')
+
+    model._const8 = model.addConstr(
+        (l_max <= L_SLO),
+        name="Const8")
 
-    # ----------- Partial Decision ----------
+    return model, x, r, u, st, l_max
+
+def build_partial_model(M, DAG, M_SRC, M_SNK, G, C, L_SLO, P_conf, M_conf, P_b, P_l, P_d, P_r, mode="nonconvex",
+                        precedence="aggregated", env=None):
+    """
+    Partial decision model with every configuration free; fix_partial_model
+    then pins the bounds from a major decision. Splitting the two lets a
+    persistent scheduler re-use the same model across major decisions.
+
+    mode: "nonconvex" models the batching latency through temp_inv (MIQCP,
+          NonConvex = 2); "lookup" builds the linear model of
+          build_partial_model_lookup.
+    precedence: as in build_major_model, with aux in place of P_l (here
+          Lat[m] = sum_{g, k} x * aux is a bilinear row per module).
+          "lazy" only applies to the lookup model: the MIPSOL callback
+          misses violated rows of the MIQCP and returns worse decisions
+          labelled OPTIMAL, so the nonconvex model keeps its edge rows eager.
+    env:  as in build_major_model.
+    """
+    if mode == "lookup":
+        return build_partial_model_lookup(M, DAG, M_SRC, M_SNK, G, C, L_SLO, P_conf, M_conf, P_b, P_l, P_d, P_r,
+                                          precedence=precedence, env=env)
 
     # Model Initialization
-    model = gp.Model("Resource_Allocation_Partial")
-
-    x = {}
-    u = {}
-    r = {}
-    u_m = {}
-    u_d = {}
-    u_flag = {}
-    temp_inv = {}
-    aux = {}
-    for m, g, k in P_conf:
-        assert util_res[m] > 0.0
-        aux[m, g, k] = model.addVar(vtype=GRB.CONTINUOUS, ub=L_SLO, name='Aux')
-
-        if util_res[m] == 1.0:
-            x[m, g, k] = model.addVar(vtype=GRB.BINARY, lb=alloc_conf[m, g, k], ub=alloc_conf[m, g, k], name = "x[{},{},{}]".format(m, g, k))
-            if alloc_conf[m, g, k]:
-                u[m, g, k] = model.addVar(vtype=GRB.CONTINUOUS, lb=util_res[m], ub=util_res[m], name = "u[{},{},{}]".format(m, g, k))
-                r[m, g, k] = model.addVar(vtype=GRB.INTEGER, lb=rate_res[m], ub=rate_res[m], name = "r[{},{},{}]".format(m, g, k))
-                u_m[m, g, k] = model.addVar(vtype=GRB.INTEGER, lb=0, ub=0, name="U_m[{},{},{}]".format(m, g, k))
-                u_d[m, g, k] = model.addVar(vtype=GRB.INTEGER, lb=1, ub=1, name="U_d[{},{},{}]".format(m, g, k))
-                u_flag[m, g, k] = model.addVar(vtype=GRB.BINARY, lb=0, ub=0, name="U_flag[{},{},{}]".format(m, g, k))
-                temp_inv[m, g, k] = model.addVar(vtype=GRB.CONTINUOUS, lb=1000.0, ub=1000.0, name="temp_inv[{},{},{}]".format(m, g, k))
-            else:
-                u[m, g, k] = model.addVar(vtype=GRB.CONTINUOUS, lb=0.0, ub=0.0, name = "u[{},{},{}]".format(m, g, k))
-                r[m, g, k] = model.addVar(vtype=GRB.INTEGER, lb=0, ub=0, name = "r[{},{},{}]".format(m, g, k))
-                u_m[m, g, k] = model.addVar(vtype=GRB.INTEGER, lb=0, ub=0, name="U_m[{},{},{}]".format(m, g, k))
-                u_d[m, g, k] = model.addVar(vtype=GRB.INTEGER, lb=0, ub=0, name="U_d[{},{},{}]".format(m, g, k))
-                u_flag[m, g, k] = model.addVar(vtype=GRB.BINARY, lb=0, ub=0, name="U_flag[{},{},{}]".format(m, g, k))
-                temp_inv[m, g, k] = model.addVar(vtype=GRB.CONTINUOUS, lb=1000.0, ub=1000.0, name="temp_inv[{},{},{}]".format(m, g, k))
-        else:
-            if alloc_gpu[m, g] == 0:
-                x[m, g, k] = model.addVar(vtype=GRB.BINARY, lb=alloc_conf[m, g, k], ub=alloc_conf[m, g, k], name = "x[{},{},{}]".format(m, g, k))
-                u[m, g, k] = model.addVar(vtype=GRB.CONTINUOUS, lb=0.0, ub=0.0, name = "u[{},{},{}]".format(m, g, k))
-                r[m, g, k] = model.addVar(vtype=GRB.INTEGER, lb=0, ub=0, name = "r[{},{},{}]".format(m, g, k))
-                u_m[m, g, k] = model.addVar(vtype=GRB.INTEGER, lb=0, ub=0, name="U_m[{},{},{}]".format(m, g, k))
-                u_d[m, g, k] = model.addVar(vtype=GRB.INTEGER, lb=0, ub=0, name="U_d[{},{},{}]".format(m, g, k))
-                u_flag[m, g, k] = model.addVar(vtype=GRB.BINARY, lb=0, ub=0, name="U_flag[{},{},{}]".format(m, g, k))
-                temp_inv[m, g, k] = model.addVar(vtype=GRB.CONTINUOUS, lb=1000.0, ub=1000.0, name="temp_inv[{},{},{}]".format(m, g, k))
-            else:
-                x[m, g, k] = model.addVar(vtype=GRB.BINARY, name = "x[{},{},{}]".format(m, g, k))
-                u[m, g, k] = model.addVar(vtype=GRB.CONTINUOUS, name = "u[{},{},{}]".format(m, g, k))
-                r[m, g, k] = model.addVar(vtype=GRB.INTEGER, name = "r[{},{},{}]".format(m, g, k))
-                u_m[m, g, k] = model.addVar(vtype=GRB.INTEGER, ub=P_r[m, g, k] - 1, name="U_m[{},{},{}]".format(m, g, k))
-                u_d[m, g, k] = model.addVar(vtype=GRB.INTEGER, name="U_d[{},{},{}]".format(m, g, k))
-                u_flag[m, g, k] = model.addVar(vtype=GRB.BINARY, name="U_flag[{},{},{}]".format(m, g, k))
-                temp_inv[m, g, k] = model.addVar(vtype=GRB.CONTINUOUS, lb=1.0/1000.0, ub=1000.0, name="temp_inv[{},{},{}]".format(m, g, k))
+    model = gp.Model("Resource_Allocation_Partial", env=env)
+
+    # Aux is the latency of every configuration, chosen or not, and only
+    # enters the schedule as x * aux, so it is not bounded by L_SLO.
+    aux = model.addVars(P_conf, vtype=GRB.CONTINUOUS, name='Aux')
+    x = model.addVars(P_conf, vtype=GRB.BINARY, name="x")
+    u = model.addVars(P_conf, vtype=GRB.CONTINUOUS, name="u")
+    r = model.addVars(P_conf, vtype=GRB.INTEGER, name="r")
+    u_m = model.addVars(P_conf, vtype=GRB.INTEGER, ub={c: P_r[c] - 1 for c in P_conf}, name="U_m")
+    u_d = model.addVars(P_conf, vtype=GRB.INTEGER, name="U_d")
+    u_flag = model.addVars(P_conf, vtype=GRB.BINARY, name="U_flag")
+    temp_inv = model.addVars(P_conf, vtype=GRB.CONTINUOUS, lb=1.0/1000.0, ub=1000.0, name="temp_inv")
 
     st = model.addVars(M, vtype=GRB.CONTINUOUS, ub=L_SLO, name='ST')
     l_max = model.addVar(vtype=GRB.CONTINUOUS, ub=L_SLO, name='L_max')
@@ -214,12 +253,11 @@ def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
 
     model.setObjective(obj, GRB.MINIMIZE)
 
-    # Constraints
-    model.addConstrs(
-        (gp.quicksum(r[m, g, k] 
-        for g in G 
-        for k in range(len(P[m, g]))) == rate_res[m]
-        for m in M), 
+    # Constraints (Constr1 right-hand sides are set by fix_partial_model)
+    model._constr1 = model.addConstrs(
+        (gp.quicksum(r[m, g, k]
+        for g, k in M_conf[m]) == 0
+        for m in M),
         name="Constr1")
 
     model.addConstrs(
@@ -233,7 +271,7 @@ def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
         name="ConstrAux1")
 
     model.addConstrs(
-        (r[m, g, k] == (P_r[m, g, k] * u_d[m, g, k] + u_m[m, g, k]) 
+        (r[m, g, k] == (P_r[m, g, k] * u_d[m, g, k] + u_m[m, g, k])
         for m, g, k in P_conf),
         name="ConstrAux2")
 
@@ -245,15 +283,13 @@ def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
 
     model.addConstrs(
         (temp_inv[m, g, k] * (u_m[m, g, k] + 1.0/1000.0) == 1.0
-        for m, g, k in P_conf
-        if u_flag[m, g, k]),
+        for m, g, k in P_conf),
         name="ConstrAux4")
 
     model.addConstrs(
-        (gp.quicksum(x[m, g, k] 
-        for g in G
-        for k in range(len(P[m, g]))) <= 1 
-        for m in M), 
+        (gp.quicksum(x[m, g, k]
+        for g, k in M_conf[m]) <= 1
+        for m in M),
         name="Constr3")
 
     model.addConstrs(
@@ -264,45 +300,362 @@ def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
     model.addConstrs(
         (aux[l, g, k] == ((1 - u_flag[l, g, k]) * P_l[l, g, k]) + (u_flag[l, g, k] * (P_d[l, g, k] + P_b[l, g, k] * temp_inv[l, g, k]))
         for l, g, k in P_conf
-        if P_b[l, g, k] > 1),  
+        if P_b[l, g, k] > 1),
         name='Constr5_6_Aux1')
 
     # When batch size = 1
     model.addConstrs(
         (aux[l, g, k] == P_l[l, g, k]
         for l, g, k in P_conf
-        if P_b[l, g, k] == 1),  
+        if P_b[l, g, k] == 1),
         name='Constr5_6_Aux2')
 
+    if precedence in ("aggregated", "lazy"):
+        lat = model.addVars(M, vtype=GRB.CONTINUOUS, name='Lat')
+
+        model.addConstrs(
+            (lat[m] == gp.quicksum(x[m, g, k] * aux[m, g, k]
+            for g, k in M_conf[m])
+            for m in M),
+            name='ConstrLat')
+
+        model.addConstrs(
+            (st[m] >= st[l] + lat[l]
+            for l, m in DAG),
+            name='Constr5')
+
+        model.addConstrs(
+            (l_max >= st[m] + lat[m]
+            for m in M_SNK),
+            name='Constr6')
+    else:
+        model.addConstrs(
+            (st[m] >= st[l] + (x[l, g, k] * aux[l, g, k])
+            for l, m in DAG
+            for g, k in M_conf[l]),
+            name='Constr5')
+
+        model.addConstrs(
+            (l_max >= st[m] + (x[m, g, k] * aux[m, g, k])
+            for m in M_SNK
+            for g, k in M_conf[m]),
+            name='Constr6')
+
+    model._const7 = model.addConstr(
+        (l_max <= L_SLO),
+        name="Const7")
+
+    model._aux, model._u_m, model._u_d, model._u_flag, model._temp_inv = aux, u_m, u_d, u_flag, temp_inv
+    model._partial_mode = "nonconvex"
+
+    return model, x, r, u, st, l_max
+
+def build_partial_model_lookup(M, DAG, M_SRC, M_SNK, G, C, L_SLO, P_conf, M_conf, P_b, P_l, P_d, P_r,
+                               precedence="aggregated", env=None):
+    """
+    Pure MILP twin of the nonconvex partial model.
+
+    Constr1 and Constr3 put a module's whole residual rate on one
+    configuration, so u_m = rate_res[m] % P_r is known once the major
+    decision is, and the batching latency is one entry of the partial_latency
+    table. fix_partial_model writes that entry into the right-hand side of
+    ConstrLookup, aux - L_hi * x >= lat - L_hi, and into the upper bound of
+    aux, where L_hi is the largest entry of the configuration's table. With
+    ConstrLookup_ub, aux <= L_hi * x, aux is lat when x = 1 and 0 when x = 0,
+    so the precedence rows need no x * aux product.
+    """
+
+    # Largest residual rate of a module, and largest table entry of a config (at u_m = 1)
+    R_hi = {m: max([P_r[m, g, k] for g, k in M_conf[m]], default=0) for m in M}
+    L_hi = {c: max(P_l[c], partial_latency(P_b[c], P_l[c], P_d[c], 1)) for c in P_conf}
+
+    # Model Initialization
+    model = gp.Model("Resource_Allocation_Partial", env=env)
+
+    aux = model.addVars(P_conf, vtype=GRB.CONTINUOUS, ub=L_SLO, name='Aux')
+    x = model.addVars(P_conf, vtype=GRB.BINARY, name="x")
+    u = model.addVars(P_conf, vtype=GRB.CONTINUOUS, name="u")
+    r = model.addVars(P_conf, vtype=GRB.INTEGER, name="r")
+
+    st = model.addVars(M, vtype=GRB.CONTINUOUS, ub=L_SLO, name='ST')
+    l_max = model.addVar(vtype=GRB.CONTINUOUS, ub=L_SLO, name='L_max')
+
+    # Gurobi Parameters
+    model.Params.Threads = 1
+    model.update()
+
+    # Objective Function
+    obj = gp.quicksum(
+        (C[g] * u[m, g, k])
+            for m, g, k in P_conf)
+
+    model.setObjective(obj, GRB.MINIMIZE)
+
+    # Constraints (Constr1 / ConstrLookup right-hand sides are set by fix_partial_model)
+    model._constr1 = model.addConstrs(
+        (gp.quicksum(r[m, g, k]
+        for g, k in M_conf[m]) == 0
+        for m in M),
+        name="Constr1")
+
+    model.addConstrs(
+        (u[m, g, k] == (r[m, g, k] / P_r[m, g, k])
+        for m, g, k in P_conf),
+        name="Constr2")
+
+    # x = 0 -> r = 0 and x = 1 -> r >= 1; a residual rate never exceeds R_hi[m]
+    model.addConstrs(
+        (r[m, g, k] <= R_hi[m] * x[m, g, k]
+        for m, g, k in P_conf),
+        name="ConstrAux1_ub")
+
+    model.addConstrs(
+        (r[m, g, k] >= x[m, g, k]
+        for m, g, k in P_conf),
+        name="ConstrAux1_lb")
+
+    model._lookup = model.addConstrs(
+        (aux[m, g, k] - L_hi[m, g, k] * x[m, g, k] >= -L_hi[m, g, k]
+        for m, g, k in P_conf),
+        name="ConstrLookup")
+
+    model.addConstrs(
+        (aux[m, g, k] <= L_hi[m, g, k] * x[m, g, k]
+        for m, g, k in P_conf),
+        name="ConstrLookup_ub")
+
     model.addConstrs(
-        (st[m] >= st[l] + (x[l, g, k] * aux[l, g, k])
-        for l, m in DAG
-        for temp, g, k in P_conf
-        if temp == l),  
-        name='Constr5')
+        (gp.quicksum(x[m, g, k]
+        for g, k in M_conf[m]) <= 1
+        for m in M),
+        name="Constr3")
 
     model.addConstrs(
-        (l_max >= st[m] + (x[m, g, k] * aux[m, g, k])
-        for m in M_SNK
-        for temp, g, k in P_conf
-        if temp == m),  
-        name='Constr6')
+        (st[m] == 0.0
+        for m in M_SRC),
+        name="Const4")
+
+    if precedence in ("aggregated", "lazy"):
+        # aux is already 0 off the chosen configuration, so Lat[m] is linear
+        lat = model.addVars(M, vtype=GRB.CONTINUOUS, name='Lat')
 
-    model.addConstr(
+        model.addConstrs(
+            (lat[m] == gp.quicksum(aux[m, g, k]
+            for g, k in M_conf[m])
+            for m in M),
+            name='ConstrLat')
+
+        if precedence == "lazy":
+            lazy_precedence(model, M, DAG, M_SNK, st, lat, l_max)
+        else:
+            model.addConstrs(
+                (st[m] >= st[l] + lat[l]
+                for l, m in DAG),
+                name='Constr5')
+
+        model.addConstrs(
+            (l_max >= st[m] + lat[m]
+            for m in M_SNK),
+            name='Constr6')
+    else:
+        model.addConstrs(
+            (st[m] >= st[l] + aux[l, g, k]
+            for l, m in DAG
+            for g, k in M_conf[l]),
+            name='Constr5')
+
+        model.addConstrs(
+            (l_max >= st[m] + aux[m, g, k]
+            for m in M_SNK
+            for g, k in M_conf[m]),
+            name='Constr6')
+
+    model._const7 = model.addConstr(
         (l_max <= L_SLO),
         name="Const7")
 
-    # Run Optimization
-    model.optimize()
+    model._aux, model._L_hi = aux, L_hi
+    model._partial_mode = "lookup"
 
-    print('Runtime (in ms): ', model.Runtime*1000)
-    # model.printAttr('X')
+    return model, x, r, u, st, l_max
 
-    alloc_conf = model.getAttr('x', x)
-    rate = model.getAttr('x', r)
-    util = model.getAttr('x', u)
-    start_time = model.getAttr('x', st)
-    critical_lat = l_max
+def fix_partial_model(model, x, r, u, P_conf, P_r, alloc_conf, alloc_gpu, rate_res, util_res,
+                      P_b=None, P_l=None, P_d=None):
+    """
+    Pin the partial model to a major decision. Modules without a remainder
+    keep their major configuration at one full instance; modules with a
+    remainder may pick any configuration on the GPU type the major decision
+    used, and every other configuration is fixed to zero, as are all
+    configurations of a module without a rate (R[m] == 0, not in util_res).
+
+    A lookup model also needs P_b / P_l / P_d to fill in its latency entries.
+    """
+    if model._partial_mode == "lookup":
+        u_m = u_d = u_flag = temp_inv = None
+    else:
+        u_m, u_d, u_flag, temp_inv = model._u_m, model._u_d, model._u_flag, model._temp_inv
+
+    # lower / upper bounds per variable family: x, u, r, u_m, u_d, u_flag, temp_inv
+    bounds = {name: ({}, {}) for name in ("x", "u", "r", "u_m", "u_d", "u_flag", "temp_inv")}
+
+    def fix(c, **vals):
+        for name, (lb, ub) in vals.items():
+            bounds[name][0][c] = lb
+            bounds[name][1][c] = ub
+
+    for m, g, k in P_conf:
+        c = (m, g, k)
+        if m not in util_res:
+            # R[m] == 0: nothing to serve
+            fix(c, x=(0, 0), u=(0.0, 0.0), r=(0, 0),
+                u_m=(0, 0), u_d=(0, 0), u_flag=(0, 0), temp_inv=(1000.0, 1000.0))
+        elif util_res[m] == 1.0:
+            if alloc_conf[c]:
+                fix(c, x=(alloc_conf[c], alloc_conf[c]), u=(util_res[m], util_res[m]), r=(rate_res[m], rate_res[m]),
+                    u_m=(0, 0), u_d=(1, 1), u_flag=(0, 0), temp_inv=(1000.0, 1000.0))
+            else:
+                fix(c, x=(alloc_conf[c], alloc_conf[c]), u=(0.0, 0.0), r=(0, 0),
+                    u_m=(0, 0), u_d=(0, 0), u_flag=(0, 0), temp_inv=(1000.0, 1000.0))
+        else:
+            if alloc_gpu[m, g] == 0:
+                fix(c, x=(alloc_conf[c], alloc_conf[c]), u=(0.0, 0.0), r=(0, 0),
+                    u_m=(0, 0), u_d=(0, 0), u_flag=(0, 0), temp_inv=(1000.0, 1000.0))
+            else:
+                fix(c, x=(0, 1), u=(0.0, GRB.INFINITY), r=(0, GRB.INFINITY),
+                    u_m=(0, P_r[c] - 1), u_d=(0, GRB.INFINITY), u_flag=(0, 1), temp_inv=(1.0/1000.0, 1000.0))
+
+    handles = dict(x=x, u=u, r=r, u_m=u_m, u_d=u_d, u_flag=u_flag, temp_inv=temp_inv)
+    for name, (lb, ub) in bounds.items():
+        if handles[name] is not None:
+            set_attr(model, 'LB', handles[name], P_conf, lb)
+            set_attr(model, 'UB', handles[name], P_conf, ub)
+
+    # Every module's row, so a module whose rate dropped to 0 since the last pin serves nothing
+    set_attr(model, 'RHS', model._constr1, list(model._constr1), {m: rate_res.get(m, 0) for m in model._constr1})
+
+    if model._partial_mode == "lookup":
+        # Rows of modules without a rate keep the entries of the build; their x is fixed to 0
+        rows = [c for c in P_conf if c[0] in rate_res]
+        lat = {c: partial_latency(P_b[c], P_l[c], P_d[c], int(rate_res[c[0]] % P_r[c])) for c in rows}
+        set_attr(model, 'RHS', model._lookup, rows, {c: lat[c] - model._L_hi[c] for c in rows})
+        set_attr(model, 'UB', model._aux, rows, lat)
+
+def warm_start_major(model, x, r, u, st, M, DAG, M_SNK, P_conf, M_conf, P_l, P_r, R, previous):
+    """
+    MIP start for the major model from a previous major decision: keep each
+    module's configuration, move the whole new rate R[m] onto it, and
+    recompute U and ST. Modules without a previous configuration are left
+    undefined for Gurobi to complete.
+    """
+    prev_conf, prev_rate = previous["alloc_conf"], previous["rate"]
+
+    chosen = {}
+    for m in M:
+        for g, k in M_conf[m]:
+            c = (m, g, k)
+            if prev_conf.get(c, 0) > 0.5 and prev_rate.get(c, 0) > 0:
+                chosen[m] = c
+                break
+
+    x_start, r_start, u_start = {}, {}, {}
+    for m in M:
+        for g, k in M_conf[m]:
+            c = (m, g, k)
+            if m not in chosen:
+                x_start[c] = r_start[c] = u_start[c] = GRB.UNDEFINED
+            elif c == chosen[m]:
+                x_start[c], r_start[c], u_start[c] = 1, R[m], R[m] / P_r[c]
+            else:
+                x_start[c], r_start[c], u_start[c] = 0, 0, 0.0
+
+    set_attr(model, 'Start', x, P_conf, x_start)
+    set_attr(model, 'Start', r, P_conf, r_start)
+    set_attr(model, 'Start', u, P_conf, u_start)
+
+    if len(chosen) == len(M):
+        st_start, _ = start_times(M, DAG, M_SNK, {m: P_l[chosen[m]] for m in M})
+        set_attr(model, 'Start', st, M, st_start)
+
+def start_decision(model, x, r, u, P_conf, decision):
+    """
+    MIP start for x / r / u from a decision keyed by (at least) P_conf, e.g.
+    greedy_partial; Gurobi completes the remaining variables.
+    """
+    set_attr(model, 'Start', x, P_conf, {c: decision["alloc_conf"].get(c, 0.0) for c in P_conf})
+    set_attr(model, 'Start', r, P_conf, {c: decision["rate"].get(c, 0.0) for c in P_conf})
+    set_attr(model, 'Start', u, P_conf, {c: decision["util"].get(c, 0.0) for c in P_conf})
+
+def fallback_decision(decision, seed):
+    """
+    The greedy `seed` in place of a solve that ended without a solution
+    (e.g. at its time limit), marked with the solver status as "fallback";
+    `decision` itself when it has a solution or there is no seed.
+    """
+    if decision["objective"] is not None or seed is None or seed["objective"] is None:
+        return decision
+    return dict(seed, fallback=decision["status"])
+
+def bound_start_times(model, st, M, L_SLO, st_lb, st_ub):
+    """
+    Tighten ST from [0, L_SLO] to the earliest / latest starts of
+    slo_infeasible, clipped to [0, L_SLO].
+    """
+    set_attr(model, 'LB', st, M, {m: min(max(st_lb[m], 0.0), L_SLO) for m in M})
+    set_attr(model, 'UB', st, M, {m: min(max(st_ub[m], 0.0), L_SLO) for m in M})
+
+def solve_decision(model, x, r, u, st, l_max, P_conf, M):
+    """
+    Optimize and collect the decision as plain values. Without a feasible
+    solution only status / runtime are returned and objective is None.
+    """
+    model.optimize(getattr(model, "_solve_callback", None))
+
+    if model.SolCount == 0:
+        return dict(status=model.status, runtime=model.Runtime, objective=None)
+
+    if hasattr(model, "_lazy"):
+        # ST only respects the precedence rows the callback added
+        start, critical_lat = lazy_schedule(model)
+        start_time = dict(zip(M, start))
+    else:
+        start_time, critical_lat = var_values(model, st, M), l_max.X
+    return dict(
+        status=model.status,
+        runtime=model.Runtime,
+        objective=model.ObjVal,
+        alloc_conf=var_values(model, x, P_conf),
+        rate=var_values(model, r, P_conf),
+        util=var_values(model, u, P_conf),
+        start_time=start_time,
+        critical_lat=critical_lat)
+
+def print_major(P_conf, major):
+    print('Runtime (in ms): ', major["runtime"]*1000)
+
+    if major["status"] != GRB.OPTIMAL:
+        print("WARNING: Solution is suboptimal")
+
+    alloc_conf, rate, util = major["alloc_conf"], major["rate"], major["util"]
+
+    print("\n\n-------- MAJOR DECISION -----------")
+    for m, g, k in P_conf:
+        if alloc_conf[m, g, k] and rate[m, g, k] > 0:
+            # print("X[{}, {}, {}] = {}".format(m, g, k, alloc_conf[m, g, k]))
+            print("Input Rate R[{}, {}, {}] = {}".format(m, g, k, rate[m, g, k]))
+            print("Number of Machines U[{}, {}, {}] = {}".format(m, g, k, util[m, g, k]))
+
+    print("Critical Latency L_MAX = {}\n\n".format(major["critical_lat"]))
+
+    print("Partial Decision Variables")
+    for m, g, k in P_conf:
+        if alloc_conf[m, g, k] and rate[m, g, k] > 0 and major["util_res"][m] < 1.0:
+            print("Partial Rate R[{}, {}, {}] = {}".format(m, g, k, major["rate_res"][m]))
+            print("Residual Capacity U[{}, {}, {}] = {}".format(m, g, k, major["util_res"][m]))
+
+def print_partial(P_conf, partial, util_res):
+    print('Runtime (in ms): ', partial["runtime"]*1000)
+
+    alloc_conf, rate, util = partial["alloc_conf"], partial["rate"], partial["util"]
 
     print("\n\n-------- PARTIAL DECISION -----------")
     for m, g, k in P_conf:
@@ -311,6 +664,265 @@ def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
             print("Input Rate R[{}, {}, {}] = {}".format(m, g, k, rate[m, g, k]))
             print("Number of Machines U[{}, {}, {}] = {}".format(m, g, k, util[m, g, k]))
 
-    # for m in M:
-    #     print("ST[{}] = {}".format(m, start_time[m]))
-    print("Critical Latency L_MAX = {}".format(critical_lat.x))
+    print("Critical Latency L_MAX = {}".format(partial["critical_lat"]))
+
+def partial_phase(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, major, engine="mip", partial_mode="nonconvex",
+                  prune=True, precedence="aggregated", options=None, env=None, verbose=False, backend=None,
+                  greedy=False):
+    """
+    Partial decision of lp_scheduler for a major decision that leaves a
+    remainder. P is the full profile table and `major` is keyed by its rows
+    (fill_rows after pruning) and carries rate_res / util_res / alloc_gpu.
+    engine is "mip", "dp" or "decomp"; the other arguments are lp_scheduler's.
+    """
+    options = as_solver_options(options)
+    backend = as_backend(backend)
+    P_all = P
+    P_all_conf = P_all.conf()
+    alloc_conf, alloc_gpu = major["alloc_conf"], major["alloc_gpu"]
+    rate_res, util_res = major["rate_res"], major["util_res"]
+
+    if prune:
+        slo_drop, st_lb, st_ub = slo_infeasible(P_all, DAG, M_SNK, L_SLO, partial_latency_range(P_all)[0], R)
+        drop = (partial_dominated(P_all) | slo_drop) & np.array([not alloc_conf[c] > 0.5 for c in P_all_conf])
+        P = P_all.take(~drop)
+        if verbose:
+            print("Pruned {} of {} configurations for the partial decision".format(len(P_all) - len(P), len(P_all)))
+
+    P_conf = gp.tuplelist(P.conf())
+    M_conf = conf_index(M, P_conf)
+    P_b = P.column_dict('batch', P_conf)
+    P_l = P.column_dict('latency', P_conf)
+    P_d = P.column_dict('duration', P_conf)
+    P_r = P.column_dict('throughput', P_conf)
+
+    seed = None
+    if greedy and engine == "mip":
+        seed = greedy_partial(M, DAG, M_SNK, G, P, C, L_SLO, alloc_conf, alloc_gpu, rate_res, util_res)
+
+    if engine == "dp":
+        partial = dp_partial(M, DAG, M_SNK, G, P, C, L_SLO, alloc_conf, alloc_gpu, rate_res, util_res)
+    elif engine == "decomp":
+        partial = decomp_partial(M, DAG, M_SNK, G, P, C, L_SLO, alloc_conf, alloc_gpu, rate_res, util_res)
+    elif backend is not None:
+        model, cols = linear_partial(M, DAG, M_SRC, M_SNK, G, P, C, L_SLO, major, precedence=precedence)
+        if prune:
+            bound_start_columns(model, cols, M, L_SLO, st_lb, st_ub)
+        partial = backend.decision(model, cols, P_conf, M, options=options.partial, env=env, verbose=verbose)
+    else:
+        model, x, r, u, st, l_max = build_partial_model(
+            M, DAG, M_SRC, M_SNK, G, C, L_SLO, P_conf, M_conf, P_b, P_l, P_d, P_r, mode=partial_mode,
+            precedence=precedence, env=env)
+        model.Params.OutputFlag = int(verbose)
+        options.partial.apply(model)
+        fix_partial_model(model, x, r, u, P_conf, P_r, alloc_conf, alloc_gpu, rate_res, util_res,
+                          P_b, P_l, P_d)
+        if prune:
+            bound_start_times(model, st, M, L_SLO, st_lb, st_ub)
+        if seed is not None and seed["objective"] is not None:
+            start_decision(model, x, r, u, P_conf, seed)
+
+        # Run Optimization
+        partial = solve_decision(model, x, r, u, st, l_max, P_conf, M)
+        # model.printAttr('X')
+    partial = fallback_decision(partial, seed)
+
+    if verbose:
+        if partial["objective"] is None:
+            print("WARNING: No feasible partial decision (status {})".format(partial["status"]))
+        else:
+            print_partial(P_conf, partial, util_res)
+
+    partial["pruned"] = len(P_all) - len(P)
+    if prune:
+        partial = fill_rows(partial, P_all_conf, [(m, g) for m in M for g in G])
+    return partial
+
+def lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, builder="expr", verbose=True,
+                 previous_solution=None, link="bilinear", partial_mode="nonconvex", engine="auto",
+                 aggregate=True, prune=True, precedence="aggregated", options=None, env=None, backend=None,
+                 greedy=False, mode="two_phase"):
+    """
+    P: ProfileTable, or the legacy {(m, g): [[batch, parallel, latency, duration, throughput], ...]} dict.
+    builder: "expr" builds the major model with addVars/addConstrs generators,
+             "matrix" emits it as sparse blocks (see d2_alloc_matrix).
+    link:    major-model Constr3 encoding, "bilinear", "bigm" or "indicator"
+             (see build_major_model).
+    precedence: "aggregated" (one Lat[m] per module), "per_config" or
+             "lazy" (edge rows added by a callback as candidates violate
+             them; not with backend) precedence rows in both models (see
+             build_major_model). With partial_mode="nonconvex", "lazy" only
+             applies to the major model (see build_partial_model).
+    partial_mode: "nonconvex" (MIQCP) or "lookup" (MILP with the batching
+             latency read from partial_latency, see build_partial_model_lookup).
+    previous_solution: result (or major decision) of an earlier call; its
+             configurations seed the major model as a MIP start.
+    engine:  "mip" solves both phases with Gurobi, "dp" with the exact
+             dynamic program of d2_dp (chain / out-tree DAGs only),
+             "decomp" with the Lagrangian decomposition of d2_decomp (any
+             DAG, no solver, status OPTIMAL only once its gap closes; meant
+             for thousands of modules), and "auto" uses "dp" whenever the
+             DAG qualifies. builder, link, partial_mode, previous_solution
+             and backend only apply to "mip".
+    aggregate: solve on one representative per class of interchangeable GPU
+             types (same C[g] and profile rows, see d2_presolve) and expand
+             the result back to every GPU type.
+    prune:   drop the profile rows each phase can never need (major_dominated
+             / partial_dominated, and slo_infeasible for rows that cannot
+             fit L_SLO, in d2_presolve) and bound each ST by its earliest /
+             latest start; each decision reports the number of removed rows
+             as "pruned".
+    options: Gurobi parameters per phase, a SolverOptions or a preset name
+             ("fast", "balanced", "exhaustive", see d2_options); None keeps
+             the builders' single-threaded defaults.
+    env:     gp.Env both models are built in (None: the default environment).
+    backend: None builds the native Gurobi models above. "gurobi", "highs"
+             (scipy.optimize.milp, no license) or a d2_backend.Backend solve
+             the solver-neutral LinearModel twins of the bigm major and
+             lookup partial models instead (linear_major / linear_partial),
+             so it needs link="bigm" and partial_mode="lookup"; builder and
+             previous_solution are then ignored, and options apply as far as
+             the solver has an equivalent.
+    greedy:  run the d2_greedy heuristic before each MIP (milliseconds,
+             under a second at 1000 modules): its allocation is the MIP start of the major
+             model (unless previous_solution gives one) and of the partial
+             model, and a phase whose solve ends without a solution, e.g.
+             at options' time limit, returns the greedy decision instead,
+             with status SUBOPTIMAL and "fallback" set to the solver status.
+    mode:    "two_phase" solves the major decision, then the partial one
+             pinned to it; "integrated" decides both at once in one MILP
+             over (major, partial) configuration pairs (see d2_integrated),
+             so it never costs more, on Gurobi or with backend. Only
+             aggregate, prune, options, env and backend apply to it.
+
+    Returns {"major": decision, "partial": decision or None}, where a decision
+    holds alloc_conf / rate / util keyed by (m, g, k), start_time keyed by m,
+    critical_lat, objective, status and runtime. The major decision also
+    carries rate_res / util_res / alloc_gpu for the partial phase.
+    """
+
+    # ----------- Major Decision ----------
+
+    # Step 1: Tranform Input to gurobi format
+
+    P = as_profile_table(P, M, G)
+    options = as_solver_options(options)
+    backend = as_backend(backend)
+    if backend is not None and mode == "two_phase" and (link != "bigm" or partial_mode != "lookup"):
+        raise ValueError("backend={!r} needs link='bigm' and partial_mode='lookup'".format(backend))
+
+    if aggregate:
+        P, G_rep, C_rep, classes = aggregate_gpus(P, M, G, C)
+        if len(G_rep) < len(G):
+            if verbose:
+                print("Aggregated {} GPU types into {} classes".format(len(G), len(G_rep)))
+            result = lp_scheduler(M, DAG, M_SRC, M_SNK, G_rep, P, C_rep, R, L_SLO, builder=builder, verbose=verbose,
+                                  previous_solution=previous_solution, link=link, partial_mode=partial_mode,
+                                  engine=engine, aggregate=False, prune=prune, precedence=precedence,
+                                  options=options, env=env, backend=backend, greedy=greedy, mode=mode)
+            return expand_result(result, classes)
+
+    if mode == "integrated":
+        if engine not in ("auto", "mip"):
+            raise ValueError("mode='integrated' is a MILP, it does not run engine={!r}".format(engine))
+        result = integrated_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, prune=prune, options=options,
+                                      env=env, backend=backend, verbose=verbose)
+        if verbose and result["major"]["objective"] is not None:
+            print_major(P.conf(), result["major"])
+            if result["partial"] is not None:
+                print_partial(P.conf(), result["partial"], result["major"]["util_res"])
+        return result
+    elif mode != "two_phase":
+        raise ValueError("Unknown mode '{}' (one of two_phase, integrated)".format(mode))
+
+    P_all = P
+    if prune:
+        slo_drop, st_lb, st_ub = slo_infeasible(P_all, DAG, M_SNK, L_SLO, P_all.latency, R)
+        P = P_all.take(~(major_dominated(P_all, C) | slo_drop))
+        if verbose:
+            print("Pruned {} of {} configurations for the major decision".format(len(P_all) - len(P), len(P_all)))
+
+    P_conf = gp.tuplelist(P.conf())
+    M_conf = conf_index(M, P_conf)
+
+    P_b = P.column_dict('batch', P_conf)
+    P_p = P.column_dict('parallel', P_conf)
+    P_l = P.column_dict('latency', P_conf)
+    P_d = P.column_dict('duration', P_conf)
+    P_r = P.column_dict('throughput', P_conf)
+
+    if engine == "auto":
+        engine = "dp" if is_out_forest(M, DAG) else "mip"
+    elif engine == "dp" and not is_out_forest(M, DAG):
+        raise ValueError("engine='dp' needs a DAG where every module has at most one predecessor")
+
+    seed = None
+    if greedy and engine == "mip":
+        seed = greedy_major(M, DAG, M_SNK, G, P, C, R, L_SLO)
+
+    if engine == "dp":
+        major = dp_major(M, DAG, M_SNK, G, P, C, R, L_SLO)
+    elif engine == "decomp":
+        major = decomp_major(M, DAG, M_SNK, G, P, C, R, L_SLO)
+    elif backend is not None:
+        model, cols = linear_major(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, precedence=precedence)
+        if prune:
+            bound_start_columns(model, cols, M, L_SLO, st_lb, st_ub)
+        major = backend.decision(model, cols, P_conf, M, options=options.major, env=env, verbose=verbose)
+    else:
+        if builder == "matrix":
+            model, x, r, u, st, l_max = build_major_model_matrix(
+                M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, link=link, precedence=precedence, env=env)
+        else:
+            model, x, r, u, st, l_max = build_major_model(
+                M, DAG, M_SRC, M_SNK, G, C, R, L_SLO, P_conf, M_conf, P_l, P_r, link=link, precedence=precedence,
+                env=env)
+        model.Params.OutputFlag = int(verbose)
+        options.major.apply(model)
+        if prune:
+            bound_start_times(model, st, M, L_SLO, st_lb, st_ub)
+
+        previous = seed
+        if previous_solution is not None:
+            previous = previous_solution.get("major", previous_solution)
+        if previous is not None and previous.get("objective") is not None:
+            warm_start_major(model, x, r, u, st, M, DAG, M_SNK, P_conf, M_conf, P_l, P_r, R, previous)
+
+        # Run Optimization
+        major = solve_decision(model, x, r, u, st, l_max, P_conf, M)
+        # model.write('Resource_Allocation_GPU_Type.lp')
+    major = fallback_decision(major, seed)
+
+    major["pruned"] = len(P_all) - len(P)
+
+    if major["objective"] is None:
+        if verbose:
+            print("WARNING: No feasible major decision (status {})".format(major["status"]))
+        return dict(major=major, partial=None)
+
+    # Step 5: Residual (partial) rate per module
+    rate_res, util_res, alloc_gpu = residual_decision(P_conf, P_r, major["alloc_conf"], major["rate"])
+    major.update(rate_res=rate_res, util_res=util_res, alloc_gpu=alloc_gpu)
+
+    if verbose:
+        print_major(P_conf, major)
+
+    if prune:
+        # Back to the full table for the result; the partial phase re-prunes it on its own terms
+        major = fill_rows(major, P_all.conf(), [(m, g) for m in M for g in G])
+
+    # Check if we need to make a partial decision
+    if all(util_res[m] == 1.0 for m in util_res):
+        if verbose:
+            print("None")
+        return dict(major=major, partial=None)
+    elif verbose:
+        print("\nRunning Partial Decision Model:")
+
+    # ----------- Partial Decision ----------
+
+    partial = partial_phase(M, DAG, M_SRC, M_SNK, G, P_all, C, R, L_SLO, major, engine=engine,
+                            partial_mode=partial_mode, prune=prune, precedence=precedence, options=options,
+                            env=env, verbose=verbose, backend=backend, greedy=greedy)
+
+    return dict(major=major, partial=partial)
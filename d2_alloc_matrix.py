@@ -0,0 +1,157 @@
+import gurobipy as gp
+from gurobipy import GRB
+import numpy as np
+import scipy.sparse as sp
+
+from d2_lazy import lazy_precedence
+from d2_profile import as_profile_table, config_rows
+
+def build_major_model_matrix(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, link="bilinear", precedence="aggregated",
+                             env=None):
+    """
+    Matrix-API twin of build_major_model (same `link`, `precedence` and `env`).
+
+    Same variables and constraints, but every linear family is emitted as one
+    sparse block through addMConstr. Variables are added in the order
+    X, R, U, ST, L_max, Lat, so columns of the blocks index model.getVars()
+    directly. Rows follow the P.conf() order.
+    """
+
+    # Step 1: Profile table to dense columns
+    P = as_profile_table(P, M, G)
+    mod, gpu = P.mod, P.gpu
+    n = len(mod)
+    n_m = len(M)
+    m_id = {m: i for i, m in enumerate(M)}
+
+    P_l = P.latency
+    P_r = P.throughput
+    R_vec = np.array([R[m] for m in M], dtype=float)
+    C_vec = np.array([C[g] for g in G], dtype=float)
+
+    mod_start = P.offsets[:-1:len(G)]
+    mod_size = P.offsets[len(G)::len(G)] - mod_start
+
+    # Column offsets (Lat only with the aggregated precedence rows)
+    X0, R0, U0, ST0, L0, LAT0 = 0, n, 2 * n, 3 * n, 3 * n + n_m, 3 * n + n_m + 1
+    n_var = 3 * n + n_m + 1 + (n_m if precedence in ("aggregated", "lazy") else 0)
+
+    # Model Initialization
+    model = gp.Model("Resource_Allocation_Major", env=env)
+
+    # Step 2: Gurobi Decision Variables
+    x = model.addMVar(n, vtype=GRB.BINARY, name='X')
+    r = model.addMVar(n, vtype=GRB.INTEGER, ub=R_vec[mod], name='R')
+    u = model.addMVar(n, vtype=GRB.CONTINUOUS, name='U')
+    st = model.addMVar(n_m, vtype=GRB.CONTINUOUS, ub=L_SLO, name='ST')
+    l_max = model.addMVar(1, vtype=GRB.CONTINUOUS, ub=L_SLO, name='L_max')
+    if precedence in ("aggregated", "lazy"):
+        lat = model.addMVar(n_m, vtype=GRB.CONTINUOUS, name='Lat')
+
+    # Gurobi Parameters
+    model.Params.Threads = 1
+    model.update()
+
+    # Objective Function
+    u.Obj = C_vec[gpu]
+    model.ModelSense = GRB.MINIMIZE
+
+    def block(row, col, val, n_row):
+        return sp.csr_matrix((val, (row, col)), shape=(n_row, n_var))
+
+    ones = np.ones(n)
+    conf = np.arange(n)
+
+    # Step 3: Constraints
+
+    # Constr1: sum_{g, k} r[m, g, k] == R[m]
+    model._constr1 = model.addMConstr(block(mod, R0 + conf, ones, n_m), None, '=', R_vec, name="Constr1")
+
+    # Constr2: u[m, g, k] - r[m, g, k] / P_r[m, g, k] == 0
+    model.addMConstr(
+        block(np.concatenate([conf, conf]), np.concatenate([U0 + conf, R0 + conf]),
+              np.concatenate([ones, -1.0 / P_r]), n),
+        None, '=', np.zeros(n), name="Constr2")
+
+    # Constr3: link between u and x
+    if link == "bigm":
+        # u - R[m] / P_r * x <= 0 and u - x / P_r >= 0
+        model._constr3 = model.addMConstr(
+            block(np.concatenate([conf, conf]), np.concatenate([U0 + conf, X0 + conf]),
+                  np.concatenate([ones, -R_vec[mod] / P_r]), n),
+            None, '<', np.zeros(n), name="Constr3_ub")
+        model.addMConstr(
+            block(np.concatenate([conf, conf]), np.concatenate([U0 + conf, X0 + conf]),
+                  np.concatenate([ones, -1.0 / P_r]), n),
+            None, '>', np.zeros(n), name="Constr3_lb")
+    elif link == "indicator":
+        model.addGenConstrIndicator(x, False, r, '<', np.zeros(n), name="Constr3_off")
+        model.addGenConstrIndicator(x, True, r, '>', np.ones(n), name="Constr3_on")
+    else:
+        # There is no block API for quadratic rows, and a per-row loop beats
+        # element-wise MVar products.
+        tol = model.Params.IntFeasTol
+        for i, (u_i, x_i) in enumerate(zip(u.tolist(), x.tolist())):
+            model.addQConstr((u_i - tol) * (x_i - 0.5) >= 0.0, name="Constr3[{}]".format(i))
+    model._link = link
+
+    # Constr4: sum_{g, k} x[m, g, k] <= 1
+    model.addMConstr(block(mod, X0 + conf, ones, n_m), None, '<', np.ones(n_m), name="Constr4")
+
+    # Const5: st[m] == 0 for sources
+    src = np.array([m_id[m] for m in M_SRC], dtype=np.int64)
+    model.addMConstr(block(np.arange(len(src)), ST0 + src, np.ones(len(src)), len(src)),
+                     None, '=', np.zeros(len(src)), name="Const5")
+
+    edge = np.array([(m_id[l], m_id[m]) for l, m in DAG], dtype=np.int64).reshape(-1, 2)
+    snk = np.array([m_id[m] for m in M_SNK], dtype=np.int64)
+
+    if precedence in ("aggregated", "lazy"):
+        # ConstrLat: lat[m] - sum_{g, k} P_l[m, g, k] * x[m, g, k] == 0
+        model.addMConstr(
+            block(np.concatenate([np.arange(n_m), mod]), np.concatenate([LAT0 + np.arange(n_m), X0 + conf]),
+                  np.concatenate([np.ones(n_m), -P_l]), n_m),
+            None, '=', np.zeros(n_m), name="ConstrLat")
+
+        if precedence == "lazy":
+            lazy_precedence(model, range(n_m), [tuple(e) for e in edge.tolist()], snk.tolist(), st.tolist(),
+                            lat.tolist(), l_max.tolist()[0])
+        else:
+            # Constr6: st[m] - st[l] - lat[l] >= 0, one row per edge
+            n_row = len(edge)
+            model.addMConstr(
+                block(np.concatenate([np.arange(n_row)] * 3),
+                      np.concatenate([ST0 + edge[:, 1], ST0 + edge[:, 0], LAT0 + edge[:, 0]]),
+                      np.concatenate([np.ones(n_row), -np.ones(n_row), -np.ones(n_row)]), n_row),
+                None, '>', np.zeros(n_row), name="Constr6")
+
+        # Constr7: l_max - st[m] - lat[m] >= 0, one row per sink
+        n_row = len(snk)
+        model.addMConstr(
+            block(np.concatenate([np.arange(n_row)] * 3),
+                  np.concatenate([np.full(n_row, L0), ST0 + snk, LAT0 + snk]),
+                  np.concatenate([np.ones(n_row), -np.ones(n_row), -np.ones(n_row)]), n_row),
+            None, '>', np.zeros(n_row), name="Constr7")
+    else:
+        # Constr6: st[m] - st[l] - P_l[l, g, k] * x[l, g, k] >= 0, one row per (edge, config of l)
+        row, cfg = config_rows(mod_start, mod_size, edge[:, 0])
+        n_row = len(row)
+        model.addMConstr(
+            block(np.concatenate([np.arange(n_row)] * 3),
+                  np.concatenate([ST0 + edge[row, 1], ST0 + edge[row, 0], X0 + cfg]),
+                  np.concatenate([np.ones(n_row), -np.ones(n_row), -P_l[cfg]]), n_row),
+            None, '>', np.zeros(n_row), name="Constr6")
+
+        # Constr7: l_max - st[m] - P_l[m, g, k] * x[m, g, k] >= 0, one row per (sink, config)
+        row, cfg = config_rows(mod_start, mod_size, snk)
+        n_row = len(row)
+        model.addMConstr(
+            block(np.concatenate([np.arange(n_row)] * 3),
+                  np.concatenate([np.full(n_row, L0), ST0 + snk[row], X0 + cfg]),
+                  np.concatenate([np.ones(n_row), -np.ones(n_row), -P_l[cfg]]), n_row),
+            None, '>', np.zeros(n_row), name="Constr7")
+
+    # Const8
+    model._const8 = model.addMConstr(block([0], [L0], [1.0], 1), None, '<', [L_SLO], name="Const8")
+
+    return model, x, r, u, st, l_max.tolist()[0]
@@ -0,0 +1,365 @@
+import time
+import warnings
+
+import numpy as np
+import scipy.sparse as sp
+
+from d2_profile import as_profile_table, config_rows, partial_latency
+
+# Gurobi status codes, so backend decisions read like solve_decision results
+OPTIMAL = 2
+INFEASIBLE = 3
+UNBOUNDED = 5
+TIME_LIMIT = 9
+NUMERIC = 12
+
+class LinearModel:
+    """
+    Solver-neutral MILP in matrix form: minimize obj @ v subject to
+    A v (sense) rhs and lb <= v <= ub, with the `integer` columns integral.
+
+    Columns are added in blocks (add_vars returns the first column of the
+    block), then rows as sparse (row, col, val) triplets over all columns, so
+    every column has to exist before the first row is added. lb / ub stay
+    writable numpy arrays until a backend solves the model.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.obj = np.zeros(0)
+        self.lb = np.zeros(0)
+        self.ub = np.zeros(0)
+        self.integer = np.zeros(0, dtype=bool)
+        self._blocks = []
+        self._sense = []
+        self._rhs = []
+        self.n_row = 0
+
+    @property
+    def n_var(self):
+        return len(self.obj)
+
+    def add_vars(self, n, lb=0.0, ub=np.inf, integer=False, obj=0.0):
+        """n columns; lb / ub / obj are scalars or length-n arrays. Returns the first column."""
+        start = self.n_var
+        self.obj = np.concatenate([self.obj, np.broadcast_to(np.asarray(obj, dtype=float), n)])
+        self.lb = np.concatenate([self.lb, np.broadcast_to(np.asarray(lb, dtype=float), n)])
+        self.ub = np.concatenate([self.ub, np.broadcast_to(np.asarray(ub, dtype=float), n)])
+        self.integer = np.concatenate([self.integer, np.full(n, integer)])
+        return start
+
+    def add_constrs(self, row, col, val, n_row, sense, rhs):
+        """n_row rows from (row, col, val) triplets; sense is '<', '>' or '=' and rhs a scalar or array."""
+        self._blocks.append(sp.csr_matrix((val, (row, col)), shape=(n_row, self.n_var)))
+        self._sense.append(np.full(n_row, sense))
+        self._rhs.append(np.broadcast_to(np.asarray(rhs, dtype=float), n_row))
+        self.n_row += n_row
+
+    def matrix(self):
+        """(A, sense, rhs) of all rows."""
+        if not self._blocks:
+            return sp.csr_matrix((0, self.n_var)), np.zeros(0, dtype='<U1'), np.zeros(0)
+        return sp.vstack(self._blocks, format="csr"), np.concatenate(self._sense), np.concatenate(self._rhs)
+
+class Backend:
+    """
+    A MILP solver for LinearModel. solve(model, options, env, verbose)
+    returns {status (Gurobi code), runtime, objective (None without a
+    feasible solution), x (column values or None)}; options is the
+    PhaseOptions of the phase, applied as far as the solver has an
+    equivalent. needs_env: whether solve builds in a (licensed) gp.Env.
+    """
+
+    name = None
+    needs_env = False
+
+    def solve(self, model, options=None, env=None, verbose=False):
+        raise NotImplementedError
+
+    def decision(self, model, cols, P_conf, M, options=None, env=None, verbose=False):
+        """solve, then the decision dict of solve_decision (see linear_decision)."""
+        return linear_decision(self.solve(model, options=options, env=env, verbose=verbose), cols, P_conf, M)
+
+    def __repr__(self):
+        return "{}()".format(type(self).__name__)
+
+class GurobiBackend(Backend):
+    """LinearModel through one addMVar / addMConstr call each; env is the gp.Env to build in."""
+
+    name = "gurobi"
+    needs_env = True
+
+    def solve(self, model, options=None, env=None, verbose=False):
+        import gurobipy as gp
+        from gurobipy import GRB
+
+        A, sense, rhs = model.matrix()
+        grb = gp.Model(model.name, env=env)
+        v = grb.addMVar(model.n_var, lb=model.lb, ub=model.ub, obj=model.obj,
+                        vtype=np.where(model.integer, GRB.INTEGER, GRB.CONTINUOUS))
+        if model.n_row:
+            grb.addMConstr(A, v, sense, rhs)
+        grb.ModelSense = GRB.MINIMIZE
+        grb.Params.Threads = 1
+        grb.Params.OutputFlag = int(verbose)
+        if options is not None:
+            options.apply(grb)
+        grb.optimize()
+
+        if grb.SolCount == 0:
+            return dict(status=grb.status, runtime=grb.Runtime, objective=None, x=None)
+        return dict(status=grb.status, runtime=grb.Runtime, objective=grb.ObjVal, x=v.X)
+
+class HighsBackend(Backend):
+    """
+    LinearModel through scipy.optimize.milp (HiGHS), which needs no license.
+    Of PhaseOptions only time_limit and mip_gap apply; HiGHS runs
+    single-threaded here. The absolute gap and the feasibility tolerances
+    are set to Gurobi's defaults (TOLERANCES), so both backends stop on the
+    same terms.
+    """
+
+    # HiGHS option -> value: Gurobi's MIPGapAbs, IntFeasTol and FeasibilityTol
+    TOLERANCES = dict(mip_abs_gap=1e-10, mip_feasibility_tolerance=1e-5, primal_feasibility_tolerance=1e-6)
+
+    name = "highs"
+
+    # scipy.optimize.milp status -> Gurobi status
+    STATUS = {0: OPTIMAL, 1: TIME_LIMIT, 2: INFEASIBLE, 3: UNBOUNDED, 4: NUMERIC}
+
+    def solve(self, model, options=None, env=None, verbose=False):
+        from scipy.optimize import Bounds, LinearConstraint, milp
+
+        A, sense, rhs = model.matrix()
+        lo = np.where(sense == '<', -np.inf, rhs)
+        hi = np.where(sense == '>', np.inf, rhs)
+
+        highs = dict(disp=bool(verbose), **self.TOLERANCES)
+        if options is not None:
+            if options.time_limit is not None:
+                highs["time_limit"] = float(options.time_limit)
+            if options.mip_gap is not None:
+                highs["mip_rel_gap"] = float(options.mip_gap)
+
+        t0 = time.perf_counter()
+        with warnings.catch_warnings():
+            # milp passes the tolerances to HiGHS verbatim, with a warning
+            warnings.filterwarnings("ignore", "Unrecognized options", RuntimeWarning)
+            res = milp(model.obj, integrality=model.integer.astype(int), bounds=Bounds(model.lb, model.ub),
+                       constraints=[LinearConstraint(A, lo, hi)] if model.n_row else None, options=highs)
+        runtime = time.perf_counter() - t0
+
+        if res.x is None:
+            return dict(status=self.STATUS.get(res.status, NUMERIC), runtime=runtime, objective=None, x=None)
+        return dict(status=self.STATUS.get(res.status, NUMERIC), runtime=runtime, objective=float(res.fun),
+                    x=res.x)
+
+BACKENDS = {"gurobi": GurobiBackend, "highs": HighsBackend}
+
+def as_backend(backend):
+    """None (the native Gurobi models), a backend name or a Backend -> None or Backend."""
+    if backend is None or isinstance(backend, Backend):
+        return backend
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError("Unknown backend '{}' (one of {})".format(backend, ", ".join(BACKENDS)))
+        return BACKENDS[backend]()
+    raise TypeError("backend must be None, a backend name or a Backend, got {!r}".format(type(backend)))
+
+def linear_decision(solution, cols, P_conf, M):
+    """
+    Decision dict of solve_decision from a Backend.solve result. cols maps
+    x / r / u / st to column slices in P_conf / M order and l_max to a
+    column. Solvers return integer columns within their integrality
+    tolerance, which residual_decision's rate % P_r would not survive, so x
+    and r are rounded.
+    """
+    if solution["x"] is None:
+        return dict(status=solution["status"], runtime=solution["runtime"], objective=None)
+
+    v = solution["x"]
+    return dict(
+        status=solution["status"],
+        runtime=solution["runtime"],
+        objective=solution["objective"],
+        alloc_conf=dict(zip(P_conf, np.round(v[cols["x"]]).tolist())),
+        rate=dict(zip(P_conf, np.round(v[cols["r"]]).tolist())),
+        util=dict(zip(P_conf, v[cols["u"]].tolist())),
+        start_time=dict(zip(M, v[cols["st"]].tolist())),
+        critical_lat=float(v[cols["l_max"]]))
+
+def bound_start_columns(model, cols, M, L_SLO, st_lb, st_ub):
+    """bound_start_times for a LinearModel."""
+    st = cols["st"]
+    model.lb[st] = [min(max(st_lb[m], 0.0), L_SLO) for m in M]
+    model.ub[st] = [min(max(st_ub[m], 0.0), L_SLO) for m in M]
+
+def path_rows(model, edge, snk, ST0, L0, LAT0):
+    """
+    st[m] - st[l] - lat[l] >= 0 per edge (l, m) and l_max - st[m] - lat[m]
+    >= 0 per sink, on module indices: edge is an (n, 2) array, snk an array.
+    """
+    n_row = len(edge)
+    model.add_constrs(np.concatenate([np.arange(n_row)] * 3),
+                      np.concatenate([ST0 + edge[:, 1], ST0 + edge[:, 0], LAT0 + edge[:, 0]]),
+                      np.concatenate([np.ones(n_row), -np.ones(n_row), -np.ones(n_row)]), n_row, '>', 0.0)
+    n_row = len(snk)
+    model.add_constrs(np.concatenate([np.arange(n_row)] * 3),
+                      np.concatenate([np.full(n_row, L0), ST0 + snk, LAT0 + snk]),
+                      np.concatenate([np.ones(n_row), -np.ones(n_row), -np.ones(n_row)]), n_row, '>', 0.0)
+
+def _precedence(model, M, DAG, M_SRC, M_SNK, P, lat_col, ST0, L0, LAT0, precedence):
+    """
+    Const5 / Constr6 / Constr7 of either phase, with lat_col[i] the column
+    holding row i's latency (P_l * x in the major model, Aux in the partial
+    one): one Lat[m] per module, or one row per (edge, config).
+    """
+    if precedence == "lazy":
+        raise ValueError("precedence='lazy' needs a Gurobi callback, use the native models (backend=None)")
+    n_m = len(M)
+    m_id = {m: i for i, m in enumerate(M)}
+    mod = P.mod
+    mod_start = P.offsets[:-1:len(P.gpus)]
+    mod_size = P.offsets[len(P.gpus)::len(P.gpus)] - mod_start
+
+    src = np.array([m_id[m] for m in M_SRC], dtype=np.int64)
+    model.add_constrs(np.arange(len(src)), ST0 + src, np.ones(len(src)), len(src), '=', 0.0)
+
+    edge = np.array([(m_id[l], m_id[m]) for l, m in DAG], dtype=np.int64).reshape(-1, 2)
+    snk = np.array([m_id[m] for m in M_SNK], dtype=np.int64)
+
+    if precedence == "aggregated":
+        # ConstrLat: lat[m] - sum_{g, k} lat_col == 0
+        col, val = lat_col
+        model.add_constrs(np.concatenate([np.arange(n_m), mod]), np.concatenate([LAT0 + np.arange(n_m), col]),
+                          np.concatenate([np.ones(n_m), -val]), n_m, '=', 0.0)
+
+        path_rows(model, edge, snk, ST0, L0, LAT0)
+    else:
+        col, val = lat_col
+        row, cfg = config_rows(mod_start, mod_size, edge[:, 0])
+        n_row = len(row)
+        model.add_constrs(np.concatenate([np.arange(n_row)] * 3),
+                          np.concatenate([ST0 + edge[row, 1], ST0 + edge[row, 0], col[cfg]]),
+                          np.concatenate([np.ones(n_row), -np.ones(n_row), -val[cfg]]), n_row, '>', 0.0)
+        row, cfg = config_rows(mod_start, mod_size, snk)
+        n_row = len(row)
+        model.add_constrs(np.concatenate([np.arange(n_row)] * 3),
+                          np.concatenate([np.full(n_row, L0), ST0 + snk[row], col[cfg]]),
+                          np.concatenate([np.ones(n_row), -np.ones(n_row), -val[cfg]]), n_row, '>', 0.0)
+
+def linear_major(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, precedence="aggregated"):
+    """
+    The major model of build_major_model with link="bigm", as a LinearModel.
+    Columns X, R, U, ST, L_max (and Lat with the aggregated precedence rows),
+    rows in P.conf() order; L_max <= L_SLO is its upper bound. Returns
+    (model, cols).
+    """
+    P = as_profile_table(P, M, G)
+    mod, gpu = P.mod, P.gpu
+    n, n_m = len(mod), len(M)
+    P_l, P_r = P.latency, P.throughput
+    R_vec = np.array([R[m] for m in M], dtype=float)
+    C_vec = np.array([C[g] for g in G], dtype=float)
+
+    model = LinearModel("Resource_Allocation_Major")
+    X0 = model.add_vars(n, ub=1.0, integer=True)
+    R0 = model.add_vars(n, ub=R_vec[mod], integer=True)
+    U0 = model.add_vars(n, obj=C_vec[gpu])
+    ST0 = model.add_vars(n_m, ub=L_SLO)
+    L0 = model.add_vars(1, ub=L_SLO)
+    LAT0 = model.add_vars(n_m) if precedence == "aggregated" else None
+
+    ones = np.ones(n)
+    conf = np.arange(n)
+
+    # Constr1: sum_{g, k} r == R[m]; Constr2: u - r / P_r == 0
+    model.add_constrs(mod, R0 + conf, ones, n_m, '=', R_vec)
+    model.add_constrs(np.concatenate([conf, conf]), np.concatenate([U0 + conf, R0 + conf]),
+                      np.concatenate([ones, -1.0 / P_r]), n, '=', 0.0)
+
+    # Constr3 (bigm): u - R[m] / P_r * x <= 0 and u - x / P_r >= 0
+    model.add_constrs(np.concatenate([conf, conf]), np.concatenate([U0 + conf, X0 + conf]),
+                      np.concatenate([ones, -R_vec[mod] / P_r]), n, '<', 0.0)
+    model.add_constrs(np.concatenate([conf, conf]), np.concatenate([U0 + conf, X0 + conf]),
+                      np.concatenate([ones, -1.0 / P_r]), n, '>', 0.0)
+
+    # Constr4: sum_{g, k} x <= 1
+    model.add_constrs(mod, X0 + conf, ones, n_m, '<', 1.0)
+
+    _precedence(model, M, DAG, M_SRC, M_SNK, P, (X0 + conf, P_l), ST0, L0, LAT0, precedence)
+
+    cols = dict(x=slice(X0, X0 + n), r=slice(R0, R0 + n), u=slice(U0, U0 + n), st=slice(ST0, ST0 + n_m), l_max=L0)
+    return model, cols
+
+def linear_partial(M, DAG, M_SRC, M_SNK, G, P, C, L_SLO, major, precedence="aggregated"):
+    """
+    The partial model of build_partial_model_lookup, already pinned to
+    `major` (a major decision carrying rate_res / util_res / alloc_gpu, keyed
+    by at least the rows of P) as fix_partial_model would, as a LinearModel.
+    Columns X, R, U, Aux, ST, L_max (and Lat). Returns (model, cols).
+    """
+    P = as_profile_table(P, M, G)
+    P_conf = P.conf()
+    mod, gpu = P.mod, P.gpu
+    n, n_m = len(mod), len(M)
+    P_r = P.throughput
+    C_vec = np.array([C[g] for g in G], dtype=float)
+    alloc_conf, alloc_gpu = major["alloc_conf"], major["alloc_gpu"]
+    rate_res, util_res = major["rate_res"], major["util_res"]
+
+    # Latency entry of every row at its module's residual, and the largest entry (at u_m = 1)
+    lat = np.array([partial_latency(b, l, d, int(rate_res[m] % p_r) if m in rate_res else 0)
+                    for (m, g, k), b, l, d, p_r in zip(P_conf, P.batch.tolist(), P.latency.tolist(),
+                                                       P.duration.tolist(), P_r.tolist())])
+    L_hi = np.maximum(P.latency, [partial_latency(b, l, d, 1) for b, l, d in
+                                  zip(P.batch.tolist(), P.latency.tolist(), P.duration.tolist())])
+    R_hi = np.zeros(n_m)
+    np.maximum.at(R_hi, mod, P_r)
+
+    # fix_partial_model's bounds: full modules keep their major configuration at one instance, modules
+    # with a remainder are free on their major GPU type, every other row is fixed to its major x and 0
+    chosen = np.array([alloc_conf[c] for c in P_conf], dtype=float)
+    full = np.array([util_res.get(m) == 1.0 for m, g, k in P_conf])
+    free = np.array([m in util_res and util_res[m] < 1.0 and alloc_gpu[m, g] == 1 for m, g, k in P_conf])
+    res = np.array([rate_res.get(m, 0.0) for m, g, k in P_conf], dtype=float)
+
+    x_lb = np.where(free, 0.0, chosen)
+    x_ub = np.where(free, 1.0, chosen)
+    on = full & (chosen > 0.5)
+    u_fix = np.where(on, 1.0, 0.0)
+    r_fix = np.where(on, res, 0.0)
+
+    model = LinearModel("Resource_Allocation_Partial")
+    X0 = model.add_vars(n, lb=x_lb, ub=x_ub, integer=True)
+    R0 = model.add_vars(n, lb=r_fix, ub=np.where(free, np.inf, r_fix), integer=True)
+    U0 = model.add_vars(n, lb=u_fix, ub=np.where(free, np.inf, u_fix), obj=C_vec[gpu])
+    A0 = model.add_vars(n, ub=np.minimum(lat, L_SLO))
+    ST0 = model.add_vars(n_m, ub=L_SLO)
+    L0 = model.add_vars(1, ub=L_SLO)
+    LAT0 = model.add_vars(n_m) if precedence == "aggregated" else None
+
+    ones = np.ones(n)
+    conf = np.arange(n)
+    pair = np.concatenate([conf, conf])
+
+    # Constr1: sum_{g, k} r == rate_res[m]; Constr2: u - r / P_r == 0
+    model.add_constrs(mod, R0 + conf, ones, n_m, '=', [rate_res.get(m, 0.0) for m in M])
+    model.add_constrs(pair, np.concatenate([U0 + conf, R0 + conf]), np.concatenate([ones, -1.0 / P_r]), n, '=', 0.0)
+
+    # ConstrAux1: x <= r <= R_hi[m] * x
+    model.add_constrs(pair, np.concatenate([R0 + conf, X0 + conf]), np.concatenate([ones, -R_hi[mod]]), n, '<', 0.0)
+    model.add_constrs(pair, np.concatenate([R0 + conf, X0 + conf]), np.concatenate([ones, -ones]), n, '>', 0.0)
+
+    # ConstrLookup: aux - L_hi * x >= lat - L_hi and aux <= L_hi * x
+    model.add_constrs(pair, np.concatenate([A0 + conf, X0 + conf]), np.concatenate([ones, -L_hi]), n, '>',
+                      lat - L_hi)
+    model.add_constrs(pair, np.concatenate([A0 + conf, X0 + conf]), np.concatenate([ones, -L_hi]), n, '<', 0.0)
+
+    # Constr3: sum_{g, k} x <= 1
+    model.add_constrs(mod, X0 + conf, ones, n_m, '<', 1.0)
+
+    _precedence(model, M, DAG, M_SRC, M_SNK, P, (A0 + conf, ones), ST0, L0, LAT0, precedence)
+
+    cols = dict(x=slice(X0, X0 + n), r=slice(R0, R0 + n), u=slice(U0, U0 + n), st=slice(ST0, ST0 + n_m), l_max=L0)
+    return model, cols
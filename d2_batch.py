@@ -0,0 +1,79 @@
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import gurobipy as gp
+
+from d2_alloc_lp import lp_scheduler
+from d2_backend import as_backend
+
+# Gurobi environment of a schedule_many worker process
+_env = None
+
+def _init_worker(params, start_env=True):
+    """Start one gp.Env per worker; every instance of that worker is built in it."""
+    global _env
+    if not start_env:
+        return
+    _env = gp.Env(empty=True)
+    _env.setParam("OutputFlag", 0)
+    for name, value in params.items():
+        _env.setParam(name, value)
+    _env.start()
+
+def _solve(index, instance, kw):
+    """lp_scheduler on one instance; errors come back as text instead of raising in the pool."""
+    t0 = time.perf_counter()
+    try:
+        result = lp_scheduler(**instance, verbose=False, env=_env, **kw)
+        error = None
+    except Exception as e:
+        result, error = None, "".join(traceback.format_exception_only(type(e), e)).strip()
+    return dict(index=index, result=result, error=error, wall=time.perf_counter() - t0, pid=os.getpid())
+
+def schedule_many(instances, workers=None, env_params=None, **kw):
+    """
+    Solve many lp_scheduler instances on a pool of worker processes.
+
+    instances: iterable of lp_scheduler inputs ({"M": ..., "DAG": ..., ...,
+               "R": ..., "L_SLO": ...}, as returned by main_d2_lp.DAG1).
+    workers:   number of processes (None: os.cpu_count()). Each one starts
+               its own gp.Env (OutputFlag 0, plus env_params) and builds every
+               model of its instances in it; the builders keep Threads = 1
+               unless kw["options"] says otherwise, so N workers use N cores.
+               With a backend that needs no gp.Env (kw["backend"]="highs")
+               no Gurobi environment, hence no license, is started.
+    kw:        passed to every lp_scheduler call (engine, link, options, ...).
+
+    Yields one record per instance as soon as it finishes, in completion
+    order: {"index": position in `instances`, "result": lp_scheduler result or
+    None, "error": None or the exception text, "wall": seconds, "pid": worker}.
+    A failing instance only fails its own record.
+    """
+    workers = workers or os.cpu_count()
+    backend = as_backend(kw.get("backend"))
+    start_env = backend is None or backend.needs_env
+    instances = iter(instances)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(dict(env_params or {}), start_env)) as pool:
+        # Keep a bounded number of instances in flight so a long generator is not pickled up front
+        pending = {}
+        for index, instance in enumerate(instances):
+            pending[pool.submit(_solve, index, instance, kw)] = index
+            if len(pending) >= 2 * workers:
+                yield from _collect(pending)
+        while pending:
+            yield from _collect(pending)
+
+def _collect(pending):
+    """Records of the futures of `pending` ({future: index}) that finish next."""
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        index = pending.pop(future)
+        try:
+            yield future.result()
+        except Exception as e:
+            # The worker itself died (e.g. BrokenProcessPool); report it on the instance
+            yield dict(index=index, result=None, error="".join(traceback.format_exception_only(type(e), e)).strip(),
+                       wall=None, pid=None)
@@ -0,0 +1,332 @@
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from d2_alloc_lp import lp_scheduler, partial_phase
+from d2_dag import is_out_forest, start_times
+from d2_greedy import fixed_decision
+from d2_options import as_solver_options
+from d2_profile import as_profile_table, partial_latency, profile_digest, residual_decision
+
+# lp_scheduler arguments that do not change the result, so they stay out of the key
+IGNORED = ("verbose", "env", "previous_solution")
+
+def instance_key(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, profile=None, **kw):
+    """
+    Canonical sha256 (hex) of lp_scheduler inputs.
+
+    P is hashed as its ProfileTable columns, so a legacy dict and the
+    equivalent table give the same key. Edges, sources, sinks, costs and
+    rates are sorted and numbers taken as float64, so their order and int /
+    float spelling do not matter; the order of M and G does (it sets the row
+    order of the models, hence which of several optima is returned). The
+    remaining lp_scheduler options are part of the key, except verbose, env
+    and previous_solution. profile: profile_digest(P, M, G), when the caller
+    already has it. R=None gives the structure key: every input but the
+    rates.
+    """
+    h = hashlib.sha256()
+
+    def add(*parts):
+        for part in parts:
+            h.update(repr(part).encode())
+            h.update(b"\0")
+
+    add(list(M), list(G), sorted(DAG), sorted(M_SRC), sorted(M_SNK))
+    add(sorted((g, float(C[g])) for g in G), float(L_SLO))
+    add(None if R is None else sorted((m, float(R[m])) for m in M))
+
+    h.update(profile if profile is not None else profile_digest(P, M, G))
+
+    options = {name: value for name, value in kw.items() if name not in IGNORED}
+    if "options" in options:
+        options["options"] = repr(as_solver_options(options["options"]))
+    add(sorted(options.items()))
+    return h.hexdigest()
+
+def reuse_major(M, DAG, M_SNK, C, R, L_SLO, P, previous):
+    """
+    Major decision at rates R on the configurations of `previous` (a major
+    decision keyed by the rows of the ProfileTable P), in closed form: each
+    module puts R[m] on its configuration at cost C[g] * R[m] / P_r. None when
+    a module with R[m] > 0 had no configuration or the SLO no longer holds.
+    """
+    t0 = time.perf_counter()
+    P_conf = P.conf()
+    P_l = dict(zip(P_conf, P.latency.tolist()))
+    P_r = dict(zip(P_conf, P.throughput.tolist()))
+
+    pick = {c[0]: c for c, v in previous["alloc_conf"].items() if v > 0.5 and R[c[0]] > 0}
+    if any(R[m] > 0 and m not in pick for m in M):
+        return None
+    lat = {m: P_l[pick[m]] if m in pick else 0.0 for m in M}
+    if start_times(M, DAG, M_SNK, lat)[1] > L_SLO + 1e-9:
+        return None
+
+    objective = sum(C[c[1]] * R[m] / P_r[c] for m, c in pick.items())
+    major = fixed_decision(M, DAG, M_SNK, P_conf, P_r, pick, lat, R, objective, t0)
+    rate_res, util_res, alloc_gpu = residual_decision(P_conf, P_r, major["alloc_conf"], major["rate"])
+    major.update(rate_res=rate_res, util_res=util_res, alloc_gpu=alloc_gpu, pruned=0)
+    return major
+
+def reuse_partial(M, DAG, M_SNK, C, L_SLO, P, major, previous):
+    """
+    Partial decision for `major` on the configurations of `previous` (a
+    partial decision), in closed form: a module without remainder keeps its
+    major configuration, and one with a remainder the configuration
+    `previous` gave it on its major GPU type, at the partial_latency of
+    u_m = rate_res % P_r. None when such a module has no configuration there
+    or the SLO no longer holds.
+    """
+    t0 = time.perf_counter()
+    P_conf = P.conf()
+    P_b = dict(zip(P_conf, P.batch.tolist()))
+    P_l = dict(zip(P_conf, P.latency.tolist()))
+    P_d = dict(zip(P_conf, P.duration.tolist()))
+    P_r = dict(zip(P_conf, P.throughput.tolist()))
+    rate_res, util_res, alloc_gpu = major["rate_res"], major["util_res"], major["alloc_gpu"]
+
+    pick, lat = {}, {m: 0.0 for m in M}
+    for c, v in major["alloc_conf"].items():
+        if v > 0.5 and util_res.get(c[0]) == 1.0:
+            pick[c[0]] = c
+            lat[c[0]] = P_l[c]
+    for c, v in previous["alloc_conf"].items():
+        m = c[0]
+        if v > 0.5 and m in util_res and util_res[m] < 1.0 and alloc_gpu[m, c[1]]:
+            pick[m] = c
+            lat[m] = partial_latency(P_b[c], P_l[c], P_d[c], int(rate_res[m] % P_r[c]))
+    if any(m not in pick for m in util_res):
+        return None
+    if start_times(M, DAG, M_SNK, lat)[1] > L_SLO + 1e-9:
+        return None
+
+    objective = sum(C[c[1]] * rate_res[m] / P_r[c] for m, c in pick.items())
+    partial = fixed_decision(M, DAG, M_SNK, P_conf, P_r, pick, lat, rate_res, objective, t0)
+    partial["pruned"] = 0
+    return partial
+
+class SolutionCache:
+    """
+    Results of lp_scheduler keyed by instance_key.
+
+    The newest `maxsize` results are kept in memory (LRU). With `path`, every
+    result is also pickled to path/<key>.pkl, written to a temporary file and
+    renamed into place, so processes sharing the directory never read a
+    partial file; a memory miss then falls back to the disk. Cached results
+    are returned as stored, without a copy: treat them as read-only.
+
+    The profile digest is computed once per P object (the last few are
+    kept), which is what makes a hit cheap: pass a new P rather than editing
+    one in place.
+
+    schedule_near adds a fast path for rates close to a cached instance of
+    the same structure (every input but R): see its docstring.
+
+    Counters: hits (memory), disk_hits, misses (solved), near_hits (closed
+    form reuse), near_partial (reuse with a partial-only solve).
+    """
+
+    PROFILES = 8
+
+    def __init__(self, maxsize=1024, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self._memory = OrderedDict()
+        self._profiles = OrderedDict()
+        self._rates = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.near_hits = 0
+        self.near_partial = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def __len__(self):
+        return len(self._memory)
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".pkl")
+
+    def get(self, key):
+        """Cached result for key, or None."""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+
+        if self.path is not None:
+            try:
+                with open(self._file(key), "rb") as f:
+                    result = pickle.load(f)
+            except FileNotFoundError:
+                return None
+            self.disk_hits += 1
+            self._remember(key, result)
+            return result
+        return None
+
+    def put(self, key, result):
+        """Store a result in memory and, with a path, on disk."""
+        self._remember(key, result)
+        if self.path is not None:
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, self._file(key))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _profile(self, P, M, G):
+        """(ProfileTable, profile_digest) of P, memoized on the P object (held, so its id stays unique)."""
+        key = (id(P), tuple(M), tuple(G))
+        if key not in self._profiles:
+            table = as_profile_table(P, M, G)
+            self._profiles[key] = (P, table, profile_digest(table, M, G))
+            while len(self._profiles) > self.PROFILES:
+                self._profiles.popitem(last=False)
+        self._profiles.move_to_end(key)
+        return self._profiles[key][1:]
+
+    def key(self, M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, **kw):
+        """instance_key with the memoized profile digest (R=None: the structure key)."""
+        return instance_key(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, profile=self._profile(P, M, G)[1], **kw)
+
+    def _index(self, structure, key, M, R):
+        """Remember the rate vector of a cached result for _nearest."""
+        self._rates.setdefault(structure, OrderedDict())[key] = np.array([R[m] for m in M], dtype=float)
+
+    def _nearest(self, structure, M, R):
+        """(relative L1 distance, key) of the closest in-memory rate vector of the same structure, or None."""
+        entries = self._rates.get(structure)
+        if not entries:
+            return None
+        for key in [key for key in entries if key not in self._memory]:
+            del entries[key]
+        if not entries:
+            return None
+
+        keys = list(entries)
+        vec = np.array([R[m] for m in M], dtype=float)
+        dist = np.abs(np.stack([entries[key] for key in keys]) - vec).sum(axis=1) / max(vec.sum(), 1.0)
+        i = int(np.argmin(dist))
+        return float(dist[i]), keys[i]
+
+    def schedule(self, M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, verbose=False, **kw):
+        """lp_scheduler through the cache; the same arguments and result."""
+        key = self.key(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, **kw)
+        result = self.get(key)
+        if result is None:
+            result = self._solve(key, M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, verbose, kw)
+        return result
+
+    def _solve(self, key, M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, verbose, kw):
+        """Miss: lp_scheduler, stored under key and indexed by its rates."""
+        self.misses += 1
+        result = lp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, verbose=verbose, **kw)
+        self.put(key, result)
+        self._index(self.key(M, DAG, M_SRC, M_SNK, G, P, C, None, L_SLO, **kw), key, M, R)
+        return result
+
+    def schedule_near(self, M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, max_distance=0.1, reuse="solve",
+                      verbose=False, **kw):
+        """
+        schedule, with a fast path when R is close to the rates of a cached
+        result of the same structure: within max_distance in relative L1
+        distance (sum |R - R'| / sum R) of the nearest one in memory.
+
+        The neighbour's major configurations are kept and r / u follow in
+        closed form (reuse_major). This is a heuristic: the kept choice is
+        only guaranteed optimal when every rate scales by the same factor;
+        under other drift the best configuration of a module can change.
+        The partial decision depends on R % P_r:
+
+        reuse: "solve" runs only the partial phase (partial_phase) on the
+               fixed major decision. "reuse" first keeps the neighbour's
+               partial configurations in closed form (reuse_partial), which
+               skips both models but can cost noticeably more than the
+               optimal partial decision; it falls back to "solve".
+
+        If the fixed major configurations miss the SLO or leave no feasible
+        partial decision, the instance is solved in full.
+        A reused major decision is feasible but not proven optimal: its
+        status is SUBOPTIMAL and it carries reuse=(distance, neighbour key).
+        Reused results are not stored, so the cache only ever returns
+        exact results from schedule.
+        """
+        key = self.key(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, **kw)
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        near = self._nearest(self.key(M, DAG, M_SRC, M_SNK, G, P, C, None, L_SLO, **kw), M, R)
+        if near is not None and near[0] <= max_distance:
+            result = self._reuse(near, M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, reuse, kw)
+            if result is not None:
+                return result
+        return self._solve(key, M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, verbose, kw)
+
+    def _reuse(self, near, M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, reuse, kw):
+        """Fast path of schedule_near from the cached result near = (distance, key); None to solve in full."""
+        neighbour = self._memory[near[1]]
+        if neighbour["major"]["objective"] is None:
+            return None
+        table = self._profile(P, M, G)[0]
+
+        major = reuse_major(M, DAG, M_SNK, C, R, L_SLO, table, neighbour["major"])
+        if major is None:
+            return None
+        major["reuse"] = near
+        if all(major["util_res"][m] == 1.0 for m in major["util_res"]):
+            self.near_hits += 1
+            return dict(major=major, partial=None)
+
+        partial = None
+        if reuse == "reuse" and neighbour["partial"] is not None and \
+                neighbour["partial"]["objective"] is not None:
+            partial = reuse_partial(M, DAG, M_SNK, C, L_SLO, table, major, neighbour["partial"])
+        if partial is not None:
+            self.near_hits += 1
+            return dict(major=major, partial=partial)
+
+        # lp_scheduler's own defaults for whatever kw leaves out
+        opts = {name: p.default for name, p in inspect.signature(lp_scheduler).parameters.items()
+                if p.default is not inspect.Parameter.empty}
+        opts.update(kw)
+        engine = opts["engine"]
+        if engine == "auto":
+            engine = "dp" if is_out_forest(M, DAG) else "mip"
+        partial = partial_phase(M, DAG, M_SRC, M_SNK, G, table, C, R, L_SLO, major, engine=engine,
+                                partial_mode=opts["partial_mode"], prune=opts["prune"],
+                                precedence=opts["precedence"], options=opts["options"], env=opts["env"],
+                                backend=opts["backend"], greedy=opts["greedy"])
+        if partial["objective"] is None:
+            return None
+        self.near_partial += 1
+        return dict(major=major, partial=partial)
+
+    def stats(self):
+        return dict(hits=self.hits, disk_hits=self.disk_hits, misses=self.misses, near_hits=self.near_hits,
+                    near_partial=self.near_partial, size=len(self._memory))
+
+    def clear(self):
+        """Drop the in-memory entries and reset the counters (the disk store is left alone)."""
+        self._memory.clear()
+        self._profiles.clear()
+        self._rates.clear()
+        self.hits = self.disk_hits = self.misses = self.near_hits = self.near_partial = 0
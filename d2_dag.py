@@ -0,0 +1,79 @@
+def topo_order(M, DAG):
+    """
+    Modules of M in topological order of the DAG edges (Kahn's algorithm).
+    """
+    succ = {m: [] for m in M}
+    indeg = {m: 0 for m in M}
+    for l, m in DAG:
+        succ[l].append(m)
+        indeg[m] += 1
+
+    order = [m for m in M if indeg[m] == 0]
+    for l in order:
+        for m in succ[l]:
+            indeg[m] -= 1
+            if indeg[m] == 0:
+                order.append(m)
+
+    if len(order) != len(M):
+        raise ValueError("DAG has a cycle")
+    return order
+
+def start_times(M, DAG, M_SNK, lat):
+    """
+    Earliest start time of every module and the critical (sink) latency when
+    module m takes lat[m], i.e. the ST / L_max the models would settle on.
+    """
+    pred = {m: [] for m in M}
+    for l, m in DAG:
+        pred[m].append(l)
+
+    st = {}
+    for m in topo_order(M, DAG):
+        st[m] = max([st[l] + lat[l] for l in pred[m]], default=0.0)
+
+    return st, max([st[m] + lat[m] for m in M_SNK], default=0.0)
+
+def is_out_forest(M, DAG):
+    """
+    True when every module has at most one predecessor (chains and out-trees
+    such as DAG1 / DAG2), the DAG shape d2_dp solves exactly.
+    """
+    indeg = {m: 0 for m in M}
+    for l, m in DAG:
+        indeg[m] += 1
+        if indeg[m] > 1:
+            return False
+    return True
+
+def slo_bounds(M, DAG, M_SNK, L_SLO, min_lat):
+    """
+    Longest-path bounds when every module runs at its fastest, min_lat[m]:
+    es[m], the earliest start; after[m], the least time needed between the
+    end of m and L_SLO (None for a leaf that is not a sink, whose finish is
+    not timed); and ls[m], the latest start that still leaves room for m and
+    everything after it. A configuration of m with latency lat fits the SLO
+    only if es[m] + lat + after[m] <= L_SLO.
+    """
+    pred = {m: [] for m in M}
+    succ = {m: [] for m in M}
+    for l, m in DAG:
+        pred[m].append(l)
+        succ[l].append(m)
+    snk = set(M_SNK)
+    order = topo_order(M, DAG)
+
+    es = {}
+    for m in order:
+        es[m] = max([es[l] + min_lat[l] for l in pred[m]], default=0.0)
+
+    after, need = {}, {}
+    for m in reversed(order):
+        if succ[m]:
+            after[m] = max(need[s] for s in succ[m])
+        else:
+            after[m] = 0.0 if m in snk else None
+        need[m] = 0.0 if after[m] is None else min_lat[m] + after[m]
+
+    ls = {m: L_SLO - need[m] for m in M}
+    return es, after, ls
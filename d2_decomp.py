@@ -0,0 +1,315 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from d2_dag import topo_order
+from d2_greedy import (EPS, INFEASIBLE, SUBOPTIMAL, cheapest_rows, greedy_rows, latency_budget, major_rows,
+                       partial_rows, pick_decision)
+from d2_profile import as_profile_table, residual_decision
+
+# Gurobi status code of a decision whose bound closes the gap
+OPTIMAL = 2
+
+# Row blocks of a lagrangian worker process, see _split
+_blocks = None
+
+def _init_worker(blocks):
+    """Hold every row block in the worker (inherited on fork), so a task only carries its prices."""
+    global _blocks
+    _blocks = blocks
+
+def _subproblem(i, price):
+    return solve_block(*_blocks[i], price)
+
+def solve_block(mod, lat, cost, allowed, price):
+    """
+    Per-module subproblems of one block: for every module, the allowed row
+    minimizing cost + price[m] * lat. mod indexes price. Returns (row per
+    module, -1 without an allowed row; its value, inf without one).
+    """
+    value = cost + price[mod] * lat
+    pick = cheapest_rows(mod, value, allowed, len(price))
+    return pick, np.where(pick >= 0, value[np.maximum(pick, 0)], np.inf)
+
+def _split(P, lat, cost, allowed, n_block):
+    """
+    Contiguous module ranges [(first, last)] and their row blocks (mod from
+    first, lat, cost, allowed); rows are grouped by module, so each block is
+    one slice of the table.
+    """
+    n_m, n_g = len(P.modules), len(P.gpus)
+    bounds = np.unique(np.linspace(0, n_m, n_block + 1).astype(int))
+    ranges, blocks = [], []
+    for first, last in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        rows = slice(P.offsets[first * n_g], P.offsets[last * n_g])
+        ranges.append((first, last))
+        blocks.append((P.mod[rows] - first, lat[rows], cost[rows], allowed[rows]))
+    return ranges, blocks
+
+class _Graph:
+    """Index form of (M, DAG, M_SNK) for the master step: topological order, edge and sink arrays."""
+
+    def __init__(self, M, DAG, M_SNK):
+        m_id = {m: i for i, m in enumerate(M)}
+        self.n = len(M)
+        self.order = [m_id[m] for m in topo_order(M, DAG)]
+        self.edge = np.array([(m_id[l], m_id[m]) for l, m in DAG], dtype=np.int64).reshape(-1, 2)
+        self.sink = np.array([m_id[m] for m in M_SNK], dtype=np.int64)
+        self.pred = [[] for _ in M]
+        self.succ = [[] for _ in M]
+        for e, (l, m) in enumerate(self.edge.tolist()):
+            self.pred[m].append(e)
+            self.succ[l].append(e)
+        self.pred_mod = [[int(self.edge[e, 0]) for e in into] for into in self.pred]
+        self.sink_of = {m: s for s, m in enumerate(self.sink.tolist())}
+
+    def arrival(self, lat):
+        """Earliest start of every module (start_times on arrays)."""
+        lat = lat.tolist()
+        a = [0.0] * self.n
+        for m in self.order:
+            if self.pred[m]:
+                a[m] = max(a[l] + lat[l] for l in self.pred_mod[m])
+        return np.array(a)
+
+    def critical(self, lat):
+        a = self.arrival(lat)
+        return a, float((a[self.sink] + lat[self.sink]).max()) if len(self.sink) else 0.0
+
+    def through(self, a, lat):
+        """Longest timed path through every module: a + lat + the longest path after it to a sink (-inf if none)."""
+        lat, tail = lat.tolist(), [-np.inf] * self.n
+        for m in self.sink.tolist():
+            tail[m] = 0.0
+        for m in reversed(self.order):
+            for e in self.succ[m]:
+                l = int(self.edge[e, 1])
+                tail[m] = max(tail[m], lat[l] + tail[l])
+        return a + np.array(lat) + np.array(tail)
+
+    def project(self, lam_e, lam_s, finish):
+        """
+        Make the multipliers a flow, in place: in reverse topological order,
+        scale the edges into every module to sum to its out-flow (its out
+        edges plus its sink arc); when they are all 0, route it on the in
+        edge with the latest finish (a + lat), i.e. along the critical path.
+        Returns the out-flow of every module, the price of its latency.
+        """
+        flow, sink, finish = lam_e.tolist(), lam_s.tolist(), finish.tolist()
+        out = [0.0] * self.n
+        for m in reversed(self.order):
+            out[m] = sum(flow[e] for e in self.succ[m]) + (sink[self.sink_of[m]] if m in self.sink_of else 0.0)
+            into = self.pred[m]
+            if not into:
+                continue
+            total = sum(flow[e] for e in into)
+            if total > 0:
+                for e in into:
+                    flow[e] *= out[m] / total
+            else:
+                critical = max(zip(into, self.pred_mod[m]), key=lambda el: finish[el[1]])[0]
+                flow[critical] = out[m]
+        lam_e[:] = flow
+        return np.array(out)
+
+def lagrangian(M, DAG, M_SNK, L_SLO, P, rows, max_iter=200, tol=1e-3, workers=None, verbose=False):
+    """
+    Pick one row per module (the *_rows terms of d2_greedy) at minimum
+    total cost under the longest-path SLO, by Lagrangian relaxation of the
+    precedence rows (Constr6 / Constr7 and L_max <= L_SLO).
+
+    Every edge and sink row gets a multiplier. Kept as a flow from the
+    sources to the sinks, the ST terms cancel and the relaxation separates
+    into one subproblem per module, min cost + price[m] * lat over its rows,
+    price[m] being the flow through m. Its value minus L_SLO times the total
+    flow is a lower bound. The master step moves the multipliers along the
+    subgradient (slack of every edge and sink row at the earliest start
+    times of the subproblem picks) with a Polyak step, and projects them
+    back onto flows, routing new flow along critical paths. Upper bounds
+    come from the greedy_rows pick and from every subproblem pick, repaired
+    when it misses the SLO by raising the prices of the modules on paths
+    over it, and improved by re-picking within the latency budgets its own
+    latencies leave (see improve). The loop stops at a relative gap of
+    `tol`.
+
+    workers: None solves the subproblems in-process (one vectorized pass);
+    N splits the modules into blocks solved on N worker processes, which
+    pays off once the table has hundreds of thousands of rows.
+
+    Returns (pick or None, report), pick holding one row index per module
+    (-1 for modules without need) and report {objective, bound, gap,
+    iterations, history [(bound, objective)], runtime}.
+    """
+    t0 = time.perf_counter()
+    lat, cost, allowed, need = rows
+    graph = _Graph(M, DAG, M_SNK)
+    n_m = len(M)
+
+    pool = None
+    if workers:
+        ranges, blocks = _split(P, lat, cost, allowed, 4 * workers)
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(blocks,))
+
+    def subproblem(price):
+        if pool is None:
+            return solve_block(P.mod, lat, cost, allowed, price)
+        pick, low = np.full(n_m, -1, dtype=np.int64), np.full(n_m, np.inf)
+        futures = [pool.submit(_subproblem, i, price[first:last]) for i, (first, last) in enumerate(ranges)]
+        for (first, last), future in zip(ranges, futures):
+            block_pick, block_low = future.result()
+            offset = P.offsets[first * len(P.gpus)]
+            pick[first:last] = np.where(block_pick >= 0, block_pick + offset, -1)
+            low[first:last] = block_low
+        return pick, low
+
+    def evaluate(pick):
+        """(latency per module, earliest start times, critical latency, cost) of a pick."""
+        lat_m = np.where(need, lat[np.maximum(pick, 0)], 0.0)
+        a, critical = graph.critical(lat_m)
+        return lat_m, a, critical, float(cost[pick[need]].sum())
+
+    def improve(pick, total):
+        """
+        Spend the slack of a pick that meets the SLO: re-pick within the
+        latency_budget weighted by its own latencies, which every row of
+        the pick fits, so the result meets the SLO and costs no more.
+        """
+        lat_m = np.where(need, lat[np.maximum(pick, 0)], 0.0)
+        budget = latency_budget(M, DAG, M_SNK, L_SLO, dict(zip(M, lat_m.tolist())))
+        better = cheapest_rows(P.mod, cost, allowed & (lat <= budget[P.mod] + EPS), n_m)
+        better = np.where(need, better, pick)
+        _, _, critical, better_total = evaluate(better)
+        if critical <= L_SLO + EPS and better_total < total:
+            return better, better_total
+        return pick, total
+
+    def offer(pick, total):
+        nonlocal upper, best
+        pick, total = improve(pick, total)
+        if total < upper:
+            upper, best = total, pick
+
+    best, upper = None, np.inf
+    start = greedy_rows(M, DAG, M_SNK, L_SLO, P.mod, lat, cost, allowed, need)
+    if start is not None:
+        offer(start, evaluate(start)[3])
+    lower = -np.inf
+    lam_e, lam_s = np.zeros(len(graph.edge)), np.zeros(len(graph.sink))
+    price = np.zeros(n_m)
+    theta, stall, history = 2.0, 0, []
+
+    try:
+        for it in range(max_iter):
+            pick, low = subproblem(price)
+            if (need & (pick < 0)).any():
+                best = None
+                break
+            bound = float(low[need].sum()) - L_SLO * float(lam_s.sum())
+            if bound > lower + EPS:
+                lower, stall = bound, 0
+            else:
+                stall += 1
+                if stall >= 5:
+                    theta, stall = theta / 2, 0
+
+            lat_m, a, critical, total = evaluate(pick)
+            if critical <= L_SLO + EPS:
+                offer(pick, total)
+            else:
+                # Repair: raise the prices on every path over the SLO until the pick fits
+                repair, fix_lat, fix_a = price.copy(), lat_m, a
+                floor = max(float(price.mean()), EPS)
+                for _ in range(100):
+                    late = graph.through(fix_a, fix_lat) > L_SLO + EPS
+                    if not late.any():
+                        offer(pick, total)
+                        break
+                    repair[late] = 1.2 * (repair[late] + floor)
+                    pick = subproblem(repair)[0]
+                    fix_lat, fix_a, _, total = evaluate(pick)
+
+            gap = (upper - lower) / max(abs(upper), EPS) if np.isfinite(upper) else np.inf
+            history.append((lower, upper))
+            if verbose and it % 10 == 0:
+                print("{:>5} bound {:14.6f} objective {:14.6f} gap {:8.3%}".format(it, lower, upper, gap))
+            if gap <= tol:
+                break
+
+            # Subgradient: slack of every edge / sink row at the subproblem's start times
+            src, dst = graph.edge[:, 0], graph.edge[:, 1]
+            g_e = a[src] + lat_m[src] - a[dst]
+            g_s = a[graph.sink] + lat_m[graph.sink] - L_SLO
+            norm = float((g_e ** 2).sum() + (g_s ** 2).sum())
+            if norm <= EPS:
+                break
+            target = upper if np.isfinite(upper) else abs(bound) + 1.0
+            step = theta * max(target - bound, EPS) / norm
+            lam_e = np.maximum(lam_e + step * g_e, 0.0)
+            lam_s = np.maximum(lam_s + step * g_s, 0.0)
+            price = graph.project(lam_e, lam_s, a + lat_m)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    gap = (upper - lower) / max(abs(upper), EPS) if np.isfinite(upper) and np.isfinite(lower) else np.inf
+    report = dict(objective=upper if best is not None else None, bound=lower, gap=gap, iterations=len(history),
+                  history=history, runtime=time.perf_counter() - t0)
+    return best, report
+
+def _decision(M, DAG, M_SNK, P, pick, report, rows, rate, tol, t0):
+    """Decision dict of a lagrangian pick, OPTIMAL when the gap closed, plus bound / gap / iterations / history."""
+    lat, cost, allowed, need = rows
+    if pick is None:
+        decision = dict(status=INFEASIBLE, runtime=time.perf_counter() - t0, objective=None)
+    else:
+        decision = pick_decision(M, DAG, M_SNK, P, pick, lat, cost, need, rate, t0)
+        decision["status"] = OPTIMAL if report["gap"] <= tol else SUBOPTIMAL
+    decision.update(bound=report["bound"], gap=report["gap"], iterations=report["iterations"],
+                    history=report["history"])
+    return decision
+
+def decomp_major(M, DAG, M_SNK, G, P, C, R, L_SLO, max_iter=200, tol=1e-3, workers=None, verbose=False):
+    """Major decision by lagrangian on the major_rows terms (every module puts R[m] on one configuration)."""
+    t0 = time.perf_counter()
+    P = as_profile_table(P, M, G)
+    rows = major_rows(M, G, P, C, R)
+    pick, report = lagrangian(M, DAG, M_SNK, L_SLO, P, rows, max_iter, tol, workers, verbose)
+    return _decision(M, DAG, M_SNK, P, pick, report, rows, R, tol, t0)
+
+def decomp_partial(M, DAG, M_SNK, G, P, C, L_SLO, alloc_conf, alloc_gpu, rate_res, util_res, max_iter=200, tol=1e-3,
+                   workers=None, verbose=False):
+    """Partial decision by lagrangian on the partial_rows terms (the dp_partial rules)."""
+    t0 = time.perf_counter()
+    P = as_profile_table(P, M, G)
+    rows = partial_rows(M, G, P, C, alloc_conf, alloc_gpu, rate_res, util_res)
+    pick, report = lagrangian(M, DAG, M_SNK, L_SLO, P, rows, max_iter, tol, workers, verbose)
+    return _decision(M, DAG, M_SNK, P, pick, report, rows, rate_res, tol, t0)
+
+def decomp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, max_iter=200, tol=1e-3, workers=None,
+                     verbose=False):
+    """
+    lp_scheduler by Lagrangian decomposition (see lagrangian), with the same
+    inputs and {"major": ..., "partial": ...} result, for any DAG and
+    without a MIP solver. Each decision also reports its lower bound, gap,
+    iterations and bound history; status is OPTIMAL when the gap closed to
+    tol and SUBOPTIMAL otherwise. A heuristic with a bound: its cost comes
+    close to the optimum on large DAGs, but small ones can keep a duality
+    gap of several percent that no iteration budget closes (see README).
+    """
+    P = as_profile_table(P, M, G)
+    major = decomp_major(M, DAG, M_SNK, G, P, C, R, L_SLO, max_iter, tol, workers, verbose)
+    if major["objective"] is None:
+        return dict(major=major, partial=None)
+
+    P_conf = P.conf()
+    P_r = dict(zip(P_conf, P.throughput.tolist()))
+    rate_res, util_res, alloc_gpu = residual_decision(P_conf, P_r, major["alloc_conf"], major["rate"])
+    major.update(rate_res=rate_res, util_res=util_res, alloc_gpu=alloc_gpu)
+
+    if all(util_res[m] == 1.0 for m in util_res):
+        return dict(major=major, partial=None)
+
+    partial = decomp_partial(M, DAG, M_SNK, G, P, C, L_SLO, major["alloc_conf"], alloc_gpu, rate_res, util_res,
+                             max_iter, tol, workers, verbose)
+    return dict(major=major, partial=partial)
@@ -0,0 +1,196 @@
+import time
+
+import numpy as np
+
+from d2_dag import is_out_forest, start_times, topo_order
+from d2_profile import as_profile_table, partial_latency, residual_decision
+
+# Gurobi status codes, so DP decisions read like solve_decision results
+OPTIMAL = 2
+INFEASIBLE = 3
+
+EPS = 1e-9
+
+def _pareto(need, cost):
+    """
+    Indices of the points of (need, cost) that no other point beats on both,
+    ordered by increasing need (and so decreasing cost).
+    """
+    order = np.lexsort((cost, need))
+    c = cost[order]
+    keep = np.ones(len(c), dtype=bool)
+    keep[1:] = c[1:] < np.minimum.accumulate(c)[:-1] - EPS
+    return order[keep]
+
+def _merge(fronts):
+    """
+    Min-plus sum of the successors' (need, cost) frontiers: for every budget t
+    at which all successors fit, the cheapest point of each within t.
+    Returns (need, cost, idx), idx holding one point index per frontier.
+    """
+    if not fronts:
+        return np.zeros(1), np.zeros(1), np.zeros((1, 0), dtype=np.int64)
+    t = np.unique(np.concatenate([need for need, _ in fronts]))
+    t = t[t >= max(need[0] for need, _ in fronts)]
+    idx = np.column_stack([np.searchsorted(need, t, side='right') - 1 for need, _ in fronts])
+    cost = sum(cost[idx[:, j]] for j, (_, cost) in enumerate(fronts))
+    keep = _pareto(t, cost)
+    return t[keep], cost[keep], idx[keep]
+
+def solve_tree(M, DAG, M_SNK, L_SLO, choices, resolution=None):
+    """
+    Min-cost pick of one choice per module on an out-forest (see is_out_forest).
+
+    choices: {m: [(latency, cost, key), ...]}. The frontier of module m holds
+    the Pareto (need, cost) pairs of the subtree rooted at m, where need is
+    the time the subtree needs between ST[m] and L_SLO: the module's latency
+    plus the largest need of its successors; a sink without successors needs
+    its own latency, and any other leaf only has to start by L_SLO (the
+    Constr6 / Constr7 / ST <= L_SLO rows of the models).
+
+    resolution: None keeps the frontiers exact. Otherwise needs are rounded up
+    to multiples of it, which bounds a frontier to L_SLO / resolution points;
+    the pick still meets L_SLO but may cost more than the optimum.
+
+    Returns ({m: key}, total cost), or None when no pick meets L_SLO.
+    """
+    succ = {m: [] for m in M}
+    for l, m in DAG:
+        succ[l].append(m)
+    snk = set(M_SNK)
+
+    front, keys, rows = {}, {}, {}
+    for m in reversed(topo_order(M, DAG)):
+        if not choices[m]:
+            return None
+        sub_need, sub_cost, rows[m] = _merge([front[s][:2] for s in succ[m]])
+
+        # A choice slower and dearer than another one never helps
+        lat = np.array([c[0] for c in choices[m]], dtype=float)
+        cost = np.array([c[1] for c in choices[m]], dtype=float)
+        pareto = _pareto(lat, cost)
+        keys[m] = [choices[m][i][2] for i in pareto.tolist()]
+
+        if succ[m] or m in snk:
+            need = (lat[pareto][:, None] + sub_need[None, :]).ravel()
+        else:
+            need = np.zeros(len(pareto) * len(sub_need))
+        if resolution:
+            need = np.ceil(need / resolution - EPS) * resolution
+        total = (cost[pareto][:, None] + sub_cost[None, :]).ravel()
+
+        fit = np.flatnonzero(need <= L_SLO + EPS)
+        if len(fit) == 0:
+            return None
+        keep = fit[_pareto(need[fit], total[fit])]
+        # need, cost, choice (into keys[m]), merged row (into rows[m])
+        front[m] = (need[keep], total[keep], keep // len(sub_need), keep % len(sub_need))
+
+    # Roots start at 0 with the whole SLO; the last frontier point is the cheapest
+    pred = {m for _, m in DAG}
+    stack = [(m, len(front[m][0]) - 1) for m in M if m not in pred]
+    pick, total = {}, sum(float(front[m][1][i]) for m, i in stack)
+    while stack:
+        m, i = stack.pop()
+        _, _, choice, row = front[m]
+        pick[m] = keys[m][choice[i]]
+        stack.extend(zip(succ[m], rows[m][row[i]].tolist()))
+    return pick, total
+
+def _decision(M, DAG, M_SNK, P_conf, P_r, choices, pick, rate, objective, t0):
+    """Decision dict in the solve_decision format from a solve_tree pick."""
+    if pick is None:
+        return dict(status=INFEASIBLE, runtime=time.perf_counter() - t0, objective=None)
+
+    chosen = set(pick.values())
+    alloc_conf = {c: float(c in chosen) for c in P_conf}
+    rate_conf = {c: float(rate[c[0]]) if c in chosen else 0.0 for c in P_conf}
+    util = {c: rate_conf[c] / P_r[c] for c in P_conf}
+
+    lat = {m: next(l for l, _, key in choices[m] if key == pick[m]) for m in M}
+    start_time, critical_lat = start_times(M, DAG, M_SNK, lat)
+
+    return dict(
+        status=OPTIMAL,
+        runtime=time.perf_counter() - t0,
+        objective=objective,
+        alloc_conf=alloc_conf,
+        rate=rate_conf,
+        util=util,
+        start_time=start_time,
+        critical_lat=critical_lat)
+
+def dp_major(M, DAG, M_SNK, G, P, C, R, L_SLO, resolution=None):
+    """
+    Major decision by solve_tree: each module puts its whole rate R[m] on one
+    configuration, at latency P_l and cost C[g] * R[m] / P_r.
+    """
+    t0 = time.perf_counter()
+    P = as_profile_table(P, M, G)
+    P_conf = P.conf()
+    P_r = dict(zip(P_conf, P.throughput.tolist()))
+
+    choices = {m: [] if R[m] > 0 else [(0.0, 0.0, None)] for m in M}
+    for c, lat in zip(P_conf, P.latency.tolist()):
+        m, g, _ = c
+        if R[m] > 0:
+            choices[m].append((lat, C[g] * R[m] / P_r[c], c))
+
+    res = solve_tree(M, DAG, M_SNK, L_SLO, choices, resolution)
+    pick, objective = res if res is not None else (None, None)
+    return _decision(M, DAG, M_SNK, P_conf, P_r, choices, pick, R, objective, t0)
+
+def dp_partial(M, DAG, M_SNK, G, P, C, L_SLO, alloc_conf, alloc_gpu, rate_res, util_res, resolution=None):
+    """
+    Partial decision by solve_tree, on the same terms as fix_partial_model:
+    modules without a remainder keep their major configuration (one full
+    instance, latency P_l); modules with a remainder pick any configuration
+    on their major GPU type, at cost C[g] * rate_res / P_r and the
+    partial_latency of its residual u_m = rate_res % P_r.
+    """
+    t0 = time.perf_counter()
+    P = as_profile_table(P, M, G)
+    P_conf = P.conf()
+    P_r = dict(zip(P_conf, P.throughput.tolist()))
+
+    choices = {m: [] if m in util_res else [(0.0, 0.0, None)] for m in M}
+    for c, b, l, d in zip(P_conf, P.batch.tolist(), P.latency.tolist(), P.duration.tolist()):
+        m, g, _ = c
+        if m not in util_res:
+            continue
+        if util_res[m] == 1.0 and not alloc_conf[c] > 0.5:
+            continue
+        if util_res[m] < 1.0 and not alloc_gpu[m, g]:
+            continue
+        v = int(rate_res[m] % P_r[c])
+        choices[m].append((partial_latency(b, l, d, v), C[g] * rate_res[m] / P_r[c], c))
+
+    res = solve_tree(M, DAG, M_SNK, L_SLO, choices, resolution)
+    pick, objective = res if res is not None else (None, None)
+    return _decision(M, DAG, M_SNK, P_conf, P_r, choices, pick, rate_res, objective, t0)
+
+def dp_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, resolution=None):
+    """
+    Gurobi-free twin of lp_scheduler for chain / out-tree DAGs, with the same
+    inputs and {"major": ..., "partial": ...} result. resolution: see
+    solve_tree.
+    """
+    if not is_out_forest(M, DAG):
+        raise ValueError("dp_scheduler needs a DAG where every module has at most one predecessor")
+
+    P = as_profile_table(P, M, G)
+    major = dp_major(M, DAG, M_SNK, G, P, C, R, L_SLO, resolution)
+    if major["objective"] is None:
+        return dict(major=major, partial=None)
+
+    P_conf = P.conf()
+    P_r = dict(zip(P_conf, P.throughput.tolist()))
+    rate_res, util_res, alloc_gpu = residual_decision(P_conf, P_r, major["alloc_conf"], major["rate"])
+    major.update(rate_res=rate_res, util_res=util_res, alloc_gpu=alloc_gpu)
+
+    if all(util_res[m] == 1.0 for m in util_res):
+        return dict(major=major, partial=None)
+
+    partial = dp_partial(M, DAG, M_SNK, G, P, C, L_SLO, major["alloc_conf"], alloc_gpu, rate_res, util_res,
+                         resolution)
+    return dict(major=major, partial=partial)
@@ -0,0 +1,114 @@
+import gurobipy as gp
+
+from d2_dag import start_times
+from d2_profile import partial_latency
+from d2_scheduler import D2Scheduler
+from d2_sweep import chosen
+
+def allocation_latency(scheduler, major, partial):
+    """
+    Critical latency of a two-phase allocation, from the chosen
+    configurations: major modules take P_l, partial modules the
+    partial_latency of their residual, and the allocation meets an SLO only
+    if both phases do.
+    """
+    M, DAG, M_SNK = scheduler.M, scheduler.DAG, scheduler.M_SNK
+
+    lat = {m: 0.0 for m in M}
+    for c in chosen(major):
+        lat[c[0]] = scheduler.P_l[c]
+    critical = start_times(M, DAG, M_SNK, lat)[1]
+
+    if partial is not None:
+        rate_res, util_res = major["rate_res"], major["util_res"]
+        lat = {m: 0.0 for m in M}
+        for c in chosen(partial):
+            m = c[0]
+            if util_res[m] == 1.0:
+                lat[m] = scheduler.P_l[c]
+            else:
+                lat[m] = partial_latency(scheduler.P_b[c], scheduler.P_l[c], scheduler.P_d[c],
+                                         int(rate_res[m] % scheduler.P_r[c]))
+        critical = max(critical, start_times(M, DAG, M_SNK, lat)[1])
+    return critical
+
+def lexicographic_major(scheduler):
+    """
+    Turn the major model of a D2Scheduler into a hierarchical multi-objective
+    model (see tutorials/examples/multiobj.py): cost first, then L_max, so
+    among the cheapest allocations the fastest one is returned.
+    """
+    model, x, r, u, st, l_max = scheduler.major_model
+    model.update()
+    cost = model.getObjective()
+    model.setObjectiveN(cost, 0, priority=1, name="Cost")
+    model.setObjectiveN(gp.LinExpr(l_max), 1, priority=0, name="Latency")
+
+def non_dominated(points):
+    """Points no other point beats on both cost and critical latency (ties keep the first)."""
+    keep = []
+    for i, p in enumerate(points):
+        if not any((q["cost"] <= p["cost"] and q["critical_lat"] <= p["critical_lat"]) and
+                   (q["cost"] < p["cost"] or q["critical_lat"] < p["critical_lat"] or j < i)
+                   for j, q in enumerate(points) if j != i):
+            keep.append(p)
+    return keep
+
+def slo_frontier(instance, L_hi=None, L_lo=0.0, eps=1e-3, lexicographic=True, max_points=1000, **kw):
+    """
+    Cost vs. SLO frontier by the epsilon-constraint method.
+
+    One D2Scheduler (kw: its options, e.g. link="bigm",
+    partial_mode="lookup") is solved at L_SLO = L_hi (default
+    instance["L_SLO"]); every next step tightens the SLO (update_slo, i.e.
+    Const8 and the ST / L_max bounds of both phases) to the critical latency
+    of the last allocation minus eps, and is warm-started from the last major
+    decision. The sweep stops when the major phase is infeasible (no
+    allocation meets the SLO), the SLO drops below L_lo, or after max_points
+    steps. A step whose partial phase is infeasible adds no point and
+    tightens past the latency of its major decision.
+
+    lexicographic: make the major model cost-then-latency multi-objective
+    (lexicographic_major), so each step returns the fastest of its cheapest
+    allocations. Without it, steps can return allocations that a later step
+    matches in cost at a lower latency; those are dropped from the result
+    either way (non_dominated).
+
+    Returns the frontier from the loosest to the tightest SLO, one point per
+    distinct allocation: {L_SLO (the bound it was found at), cost (major +
+    partial objective), major, partial, critical_lat, configs, result}.
+    """
+    M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO = (instance[key] for key in
+        ("M", "DAG", "M_SRC", "M_SNK", "G", "P", "C", "R", "L_SLO"))
+    L = L_SLO if L_hi is None else L_hi
+
+    scheduler = D2Scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L, **kw)
+    if lexicographic:
+        lexicographic_major(scheduler)
+
+    points = []
+    for _ in range(max_points):
+        if L < L_lo:
+            break
+        scheduler.update_slo(L)
+        result = scheduler.solve()
+        major, partial = result["major"], result["partial"]
+        if major["objective"] is None:
+            break
+        if partial is not None and partial["objective"] is None:
+            # No allocation from this major decision; a tighter one may still have a partial decision
+            L = allocation_latency(scheduler, major, None) - eps
+            continue
+
+        critical = allocation_latency(scheduler, major, partial)
+        points.append(dict(
+            L_SLO=L,
+            cost=major["objective"] + (partial["objective"] if partial else 0.0),
+            major=major["objective"],
+            partial=partial["objective"] if partial else None,
+            critical_lat=critical,
+            configs=(chosen(major), chosen(partial) if partial else ()),
+            result=result))
+        L = critical - eps
+
+    return non_dominated(points)
@@ -0,0 +1,250 @@
+import heapq
+import time
+
+import numpy as np
+
+from d2_dag import slo_bounds, start_times, topo_order
+from d2_profile import as_profile_table, residual_decision
+
+# Gurobi status codes: a greedy decision is feasible but not proven optimal
+INFEASIBLE = 3
+SUBOPTIMAL = 13
+
+EPS = 1e-9
+
+def fixed_decision(M, DAG, M_SNK, P_conf, P_r, pick, lat, rate, objective, t0):
+    """
+    Decision dict in the solve_decision format for one fixed configuration
+    per module: pick {m: (m, g, k)} carries rate[m] at latency lat[m]. P_r
+    only needs the picked rows.
+    """
+    # Zeros for every row, then the picked ones: no per-row Python on tables of thousands of rows
+    alloc_conf = dict.fromkeys(P_conf, 0.0)
+    rate_conf, util = alloc_conf.copy(), alloc_conf.copy()
+    for m, c in pick.items():
+        alloc_conf[c] = 1.0
+        rate_conf[c] = float(rate[m])
+        util[c] = rate_conf[c] / P_r[c]
+    start_time, critical_lat = start_times(M, DAG, M_SNK, lat)
+    return dict(
+        status=SUBOPTIMAL,
+        runtime=time.perf_counter() - t0,
+        objective=objective,
+        alloc_conf=alloc_conf,
+        rate=rate_conf,
+        util=util,
+        start_time=start_time,
+        critical_lat=critical_lat)
+
+def latency_budget(M, DAG, M_SNK, L_SLO, min_lat):
+    """
+    Per-module latency budget: L_SLO split along the longest path through
+    each module in proportion to min_lat, budget[m] = L_SLO * min_lat[m] /
+    path[m] with path[m] = es[m] + min_lat[m] + after[m] (see slo_bounds).
+    Every path through m is at most path[m] long, so the budgets of a path
+    add up to at most L_SLO and any pick with lat[m] <= budget[m] meets the
+    SLO. A leaf that is not a sink has no finish to time and gets an
+    unbounded budget. Returns an array in M order.
+    """
+    es, after, _ = slo_bounds(M, DAG, M_SNK, L_SLO, min_lat)
+    budget = np.full(len(M), np.inf)
+    for i, m in enumerate(M):
+        path = es[m] + min_lat[m] + (after[m] or 0.0)
+        if after[m] is not None and path > 0:
+            budget[i] = L_SLO * min_lat[m] / path
+    return budget
+
+def cheapest_rows(mod, cost, fit, n_m):
+    """Cheapest fitting row of every module (the first one on ties), -1 where none fits."""
+    key = np.where(fit, cost, np.inf)
+    low = np.full(n_m, np.inf)
+    np.minimum.at(low, mod, key)
+    rows = np.flatnonzero(fit & (key <= low[mod]))
+    pick = np.full(n_m, -1, dtype=np.int64)
+    # Rows are grouped by module, so the reversed assignment leaves the first row of each module
+    pick[mod[rows[::-1]]] = rows[::-1]
+    return pick
+
+def major_rows(M, G, P, C, R):
+    """
+    Per-row terms of the major phase on the ProfileTable P: (lat, cost,
+    allowed, need), where a module with need[i] (R[m] > 0) puts its whole
+    rate on one allowed row at latency P_l and cost C[g] * R[m] / P_r.
+    """
+    R_vec = np.array([R[m] for m in M], dtype=float)
+    C_vec = np.array([C[g] for g in G], dtype=float)
+    need = R_vec > 0
+    return P.latency, C_vec[P.gpu] * R_vec[P.mod] / P.throughput, need[P.mod], need
+
+def partial_rows(M, G, P, C, alloc_conf, alloc_gpu, rate_res, util_res):
+    """
+    Per-row terms of the partial phase, on the same terms as dp_partial:
+    modules without a remainder may only keep their major row at P_l, and
+    modules with one may take any row on their major GPU type, at cost
+    C[g] * rate_res / P_r and the partial_latency of u_m = rate_res % P_r.
+    """
+    C_vec = np.array([C[g] for g in G], dtype=float)
+    res = np.array([rate_res.get(m, 0.0) for m in M], dtype=float)
+    util = np.array([util_res.get(m, 0.0) for m in M], dtype=float)
+    need = util > 0
+    full = util[P.mod] == 1.0
+    allowed = np.array([m in util_res and
+                        (alloc_conf[m, g, k] > 0.5 if util_res[m] == 1.0 else alloc_gpu[m, g] == 1)
+                        for m, g, k in P.conf()], dtype=bool)
+
+    # partial_latency, vectorized
+    v = np.floor(np.mod(res[P.mod], P.throughput))
+    batched = ~full & (v > 0) & (P.batch > 1)
+    lat = np.where(batched, P.duration + P.batch / (v + 1.0/1000.0), P.latency)
+    return lat, C_vec[P.gpu] * res[P.mod] / P.throughput, allowed, need
+
+def pick_decision(M, DAG, M_SNK, P, pick, lat, cost, need, rate, t0, P_conf=None):
+    """fixed_decision for one row index per module with need[i] (pick, in M order), from *_rows terms."""
+    P_conf = P.conf() if P_conf is None else P_conf
+    rows = {M[i]: int(row) for i, row in enumerate(pick.tolist()) if need[i]}
+    P_r = {P_conf[row]: float(P.throughput[row]) for row in rows.values()}
+    return fixed_decision(M, DAG, M_SNK, P_conf, P_r, {m: P_conf[row] for m, row in rows.items()},
+                          {m: float(lat[rows[m]]) if m in rows else 0.0 for m in M}, rate,
+                          float(sum(cost[row] for row in rows.values())), t0)
+
+def swap_pass(M, DAG, M_SNK, L_SLO, mod, lat, cost, allowed, need, pick):
+    """
+    One local-improvement pass over a pick that meets L_SLO: module by
+    module, largest possible saving first, swap to the cheapest allowed row
+    that still fits the slack of its longest timed path at the current
+    latencies, L_SLO - es[m] - tail[m] (tail: the longest path after m to a
+    sink). Every swap keeps the SLO and lowers the cost. After a swap only
+    the es of its descendants and the tail of its ancestors are updated,
+    stopping where they do not change.
+    """
+    pick = pick.copy()
+    n_m = len(M)
+    m_id = {m: i for i, m in enumerate(M)}
+    pred, succ = [[] for _ in M], [[] for _ in M]
+    for l, m in DAG:
+        pred[m_id[m]].append(m_id[l])
+        succ[m_id[l]].append(m_id[m])
+    pos = [0] * n_m
+    for p, m in enumerate(topo_order(M, DAG)):
+        pos[m_id[m]] = p
+    order = sorted(range(n_m), key=pos.__getitem__)
+    sink = {m_id[m] for m in M_SNK}
+
+    cur_lat = np.where(need, lat[np.maximum(pick, 0)], 0.0).tolist()
+    cur_cost = np.where(need, cost[np.maximum(pick, 0)], 0.0)
+    es, tail = [0.0] * n_m, [-np.inf] * n_m
+
+    def update_es(m):
+        return max([es[l] + cur_lat[l] for l in pred[m]], default=0.0)
+
+    def update_tail(m):
+        return max([cur_lat[s] + tail[s] for s in succ[m]] + [0.0 if m in sink else -np.inf])
+
+    for m in order:
+        es[m] = update_es(m)
+    for m in reversed(order):
+        tail[m] = update_tail(m)
+
+    def propagate(start, nxt, value, field, sign):
+        # Visit in (reverse) topological order, so each module is recomputed once its inputs are final
+        heap, seen = [(sign * pos[m], m) for m in nxt[start]], set(nxt[start])
+        heapq.heapify(heap)
+        while heap:
+            _, m = heapq.heappop(heap)
+            v = value(m)
+            if v != field[m]:
+                field[m] = v
+                for k in nxt[m]:
+                    if k not in seen:
+                        seen.add(k)
+                        heapq.heappush(heap, (sign * pos[k], k))
+
+    start = np.searchsorted(mod, np.arange(n_m + 1))
+    cheapest = cheapest_rows(mod, cost, allowed, n_m)
+    saving = np.where(need & (cheapest >= 0), cur_cost - cost[np.maximum(cheapest, 0)], 0.0)
+    for i in np.argsort(-saving, kind="stable").tolist():
+        if saving[i] <= EPS:
+            break
+        room = L_SLO - es[i] - tail[i]
+        rows = np.arange(start[i], start[i + 1])
+        fit = rows[allowed[rows] & (lat[rows] <= room + EPS) & (cost[rows] < cur_cost[i] - EPS)]
+        if len(fit):
+            j = fit[np.argmin(cost[fit])]
+            pick[i], cur_lat[i], cur_cost[i] = j, float(lat[j]), cost[j]
+            propagate(i, succ, update_es, es, 1)
+            propagate(i, pred, update_tail, tail, -1)
+    return pick
+
+def greedy_rows(M, DAG, M_SNK, L_SLO, mod, lat, cost, allowed, need):
+    """
+    Cheapest allowed row within latency_budget for every module with
+    need[i], as a row index per module, then one swap_pass to spend the
+    slack the budgets leave; None when some module has no such row, i.e.
+    even its fastest rows miss L_SLO.
+    """
+    n_m = len(M)
+    min_lat = np.full(n_m, np.inf)
+    np.minimum.at(min_lat, mod[allowed], lat[allowed])
+    min_lat[~need] = 0.0
+    if np.isinf(min_lat).any():
+        return None
+
+    budget = latency_budget(M, DAG, M_SNK, L_SLO, dict(zip(M, min_lat.tolist())))
+    pick = cheapest_rows(mod, cost, allowed & (lat <= budget[mod] + EPS), n_m)
+    if (need & (pick < 0)).any():
+        return None
+    return swap_pass(M, DAG, M_SNK, L_SLO, mod, lat, cost, allowed, need, pick)
+
+def _greedy(M, DAG, M_SNK, L_SLO, P, rows, rate, t0):
+    """greedy_rows on the *_rows terms `rows`, as a decision."""
+    lat, cost, allowed, need = rows
+    pick = greedy_rows(M, DAG, M_SNK, L_SLO, P.mod, lat, cost, allowed, need)
+    if pick is None:
+        return dict(status=INFEASIBLE, runtime=time.perf_counter() - t0, objective=None)
+    return pick_decision(M, DAG, M_SNK, P, pick, lat, cost, need, rate, t0)
+
+def greedy_major(M, DAG, M_SNK, G, P, C, R, L_SLO):
+    """
+    Major decision without a solver: every module with R[m] > 0 puts its
+    whole rate on the configuration with the lowest C[g] / P_r whose P_l fits
+    its latency_budget. Feasible whenever the fastest configurations meet
+    L_SLO, but not optimal (status SUBOPTIMAL).
+    """
+    t0 = time.perf_counter()
+    P = as_profile_table(P, M, G)
+    return _greedy(M, DAG, M_SNK, L_SLO, P, major_rows(M, G, P, C, R), R, t0)
+
+def greedy_partial(M, DAG, M_SNK, G, P, C, L_SLO, alloc_conf, alloc_gpu, rate_res, util_res):
+    """
+    Partial decision without a solver (see partial_rows): modules with a
+    remainder take the cheapest configuration on their major GPU type whose
+    partial_latency fits its latency_budget.
+    """
+    t0 = time.perf_counter()
+    P = as_profile_table(P, M, G)
+    rows = partial_rows(M, G, P, C, alloc_conf, alloc_gpu, rate_res, util_res)
+    return _greedy(M, DAG, M_SNK, L_SLO, P, rows, rate_res, t0)
+
+def greedy_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO):
+    """
+    Solver-free twin of lp_scheduler on any DAG, with the same inputs and
+    {"major": ..., "partial": ...} result, from greedy_major and
+    greedy_partial. It only needs the fastest configurations to meet L_SLO
+    to find an allocation, and is meant as a MIP start and as the answer of
+    a solve that runs out of time (lp_scheduler(..., greedy=True)).
+    """
+    P = as_profile_table(P, M, G)
+    major = greedy_major(M, DAG, M_SNK, G, P, C, R, L_SLO)
+    if major["objective"] is None:
+        return dict(major=major, partial=None)
+
+    P_conf = P.conf()
+    P_r = dict(zip(P_conf, P.throughput.tolist()))
+    rate_res, util_res, alloc_gpu = residual_decision(P_conf, P_r, major["alloc_conf"], major["rate"])
+    major.update(rate_res=rate_res, util_res=util_res, alloc_gpu=alloc_gpu)
+
+    if all(util_res[m] == 1.0 for m in util_res):
+        return dict(major=major, partial=None)
+
+    partial = greedy_partial(M, DAG, M_SNK, G, P, C, L_SLO, major["alloc_conf"], alloc_gpu, rate_res, util_res)
+    return dict(major=major, partial=partial)
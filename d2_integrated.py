@@ -0,0 +1,242 @@
+import time
+
+import numpy as np
+
+from d2_backend import GurobiBackend, LinearModel, as_backend, bound_start_columns, path_rows
+from d2_greedy import fixed_decision
+from d2_options import as_solver_options
+from d2_presolve import partial_latency_range, slo_infeasible
+from d2_profile import as_profile_table, residual_decision
+
+def paired_options(M, G, P, C, R):
+    """
+    Every (major row c, partial row c') a module can end up with after
+    lp_scheduler's two phases, as arrays over the pairs (grouped by module):
+    c' is on c's GPU type, and a module whose R[m] fills whole instances of c
+    keeps c' = c. Per pair:
+        mod          module index in M
+        major        c, row of P
+        partial      c', row of P
+        full         no remainder: R[m] % P_r(c) == 0
+        cost_major   C[g] * R[m] / P_r(c), the major objective term
+        cost_partial C[g] * rate_res / P_r(c'), the partial objective term
+                     (rate_res = P_r(c) for a full module, one instance)
+        lat_major    P_l(c)
+        lat_partial  partial_latency of c' at rate_res % P_r(c')
+    Modules with R[m] <= 0 get no pairs.
+    """
+    P = as_profile_table(P, M, G)
+    R_vec = np.array([R[m] for m in M], dtype=float)
+    C_vec = np.array([C[g] for g in G], dtype=float)
+
+    # All (c, c') of each (module, GPU type) group, without a Python loop over the groups
+    size = np.diff(P.offsets)
+    n_pair = size ** 2
+    grp = np.repeat(np.arange(len(size)), n_pair)
+    local = np.arange(n_pair.sum()) - np.repeat(np.cumsum(n_pair) - n_pair, n_pair)
+    pc = P.offsets[grp] + local // size[grp]
+    pp = P.offsets[grp] + local % size[grp]
+
+    mod = P.mod[pc]
+    rem = np.floor(np.mod(R_vec[mod], P.throughput[pc]))
+    full = rem == 0
+    keep = (R_vec[mod] > 0) & (~full | (pc == pp))
+    pc, pp, mod, rem, full = pc[keep], pp[keep], mod[keep], rem[keep], full[keep]
+
+    rate_res = np.where(full, P.throughput[pc], rem)
+    v = np.floor(np.mod(rate_res, P.throughput[pp]))
+    batched = (v > 0) & (P.batch[pp] > 1)
+    unit = C_vec[P.gpu[pc]]
+    return dict(
+        mod=mod, major=pc, partial=pp, full=full,
+        cost_major=unit * R_vec[mod] / P.throughput[pc],
+        cost_partial=unit * rate_res / P.throughput[pp],
+        lat_major=P.latency[pc],
+        lat_partial=np.where(batched, P.duration[pp] + P.batch[pp] / (v + 1.0/1000.0), P.latency[pp]))
+
+def take_pairs(pairs, keep):
+    """The pairs of a mask or index array."""
+    return {name: col[keep] for name, col in pairs.items()}
+
+def pair_dominated(pairs, n_m):
+    """
+    Pairs the integrated model never needs: another pair of the same module
+    costs no more in either phase and is no slower in either phase. A pair
+    with a remainder never replaces a full one, since a remainder anywhere
+    makes every full module pay its partial instance (see
+    linear_integrated); one duplicate is kept. Returns a boolean mask.
+    """
+    drop = np.zeros(len(pairs["mod"]), dtype=bool)
+    bounds = np.searchsorted(pairs["mod"], np.arange(n_m + 1))
+    cost = pairs["cost_major"] + pairs["cost_partial"]
+    for s, e in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        n = e - s
+        if n < 2:
+            continue
+        dom = np.ones((n, n), dtype=bool)  # dom[a, b]: a beats b
+        for col in (pairs["cost_major"][s:e], cost[s:e], pairs["lat_major"][s:e], pairs["lat_partial"][s:e]):
+            dom &= col[:, None] <= col[None, :]
+        full = pairs["full"][s:e]
+        dom &= full[:, None] | ~full[None, :]
+        np.fill_diagonal(dom, False)
+        # Pairs that beat each other are duplicates: only the later one goes
+        dom &= ~(dom.T & (np.arange(n)[:, None] > np.arange(n)[None, :]))
+        drop[s:e] = dom.any(axis=0)
+    return drop
+
+def linear_integrated(M, DAG, M_SRC, M_SNK, pairs, L_SLO):
+    """
+    Both phases of lp_scheduler as one MILP over paired_options, as a
+    LinearModel: a binary Y per pair with sum Y == 1 per module with R[m] > 0,
+    and the two phases' precedence rows side by side, ST / Lat / L_max on
+    lat_major and ST_p / Lat_p / L_max_p on lat_partial, both within L_SLO.
+
+    The objective is the major plus the partial objective. lp_scheduler only
+    runs the partial phase (where a full module pays one more instance) when
+    some module has a remainder, so a full pair's cost_partial sits in a
+    column W[m] >= cost_partial * Y - hi[m] * (1 - Z), with the binary Z >= Y
+    of every pair with a remainder. Returns (model, cols).
+    """
+    n, n_m = len(pairs["mod"]), len(M)
+    m_id = {m: i for i, m in enumerate(M)}
+    mod, full = pairs["mod"], pairs["full"]
+    pair = np.arange(n)
+    need = np.zeros(n_m)
+    need[mod] = 1.0
+    hi = np.zeros(n_m)
+    np.maximum.at(hi, mod[full], pairs["cost_partial"][full])
+
+    model = LinearModel("Resource_Allocation_Integrated")
+    Y0 = model.add_vars(n, ub=1.0, integer=True,
+                        obj=pairs["cost_major"] + np.where(full, 0.0, pairs["cost_partial"]))
+    W0 = model.add_vars(n_m, ub=hi, obj=1.0)
+    Z0 = model.add_vars(1, ub=1.0, integer=True)
+    ST0 = model.add_vars(n_m, ub=L_SLO)
+    L0 = model.add_vars(1, ub=L_SLO)
+    LAT0 = model.add_vars(n_m, ub=L_SLO)
+    STP0 = model.add_vars(n_m, ub=L_SLO)
+    LP0 = model.add_vars(1, ub=L_SLO)
+    LATP0 = model.add_vars(n_m, ub=L_SLO)
+
+    # One pair per module with a rate
+    model.add_constrs(mod, Y0 + pair, np.ones(n), n_m, '=', need)
+
+    # ConstrLat per phase: lat[m] - sum lat * Y == 0
+    for lat0, lat in ((LAT0, pairs["lat_major"]), (LATP0, pairs["lat_partial"])):
+        model.add_constrs(np.concatenate([np.arange(n_m), mod]), np.concatenate([lat0 + np.arange(n_m), Y0 + pair]),
+                          np.concatenate([np.ones(n_m), -lat]), n_m, '=', 0.0)
+
+    # Z >= Y of every pair with a remainder, and W[m] - cost_partial * Y - hi[m] * Z >= -hi[m] on full pairs.
+    # The recount is the two-phase accounting, not a real cost: keeping it makes the two objectives comparable
+    # and the two-phase allocation a feasible point of this model, so the integrated cost is never higher
+    rest = np.flatnonzero(~full)
+    model.add_constrs(np.concatenate([np.arange(len(rest)), np.arange(len(rest))]),
+                      np.concatenate([np.full(len(rest), Z0), Y0 + rest]),
+                      np.concatenate([np.ones(len(rest)), -np.ones(len(rest))]), len(rest), '>', 0.0)
+    whole = np.flatnonzero(full)
+    has = np.flatnonzero(hi > 0)
+    row = np.full(n_m, -1)
+    row[has] = np.arange(len(has))
+    model.add_constrs(np.concatenate([np.arange(len(has)), row[mod[whole]], np.arange(len(has))]),
+                      np.concatenate([W0 + has, Y0 + whole, np.full(len(has), Z0)]),
+                      np.concatenate([np.ones(len(has)), -pairs["cost_partial"][whole], -hi[has]]), len(has), '>',
+                      -hi[has])
+
+    # Const5 and the precedence rows of both phases
+    src = np.array([m_id[m] for m in M_SRC], dtype=np.int64)
+    edge = np.array([(m_id[l], m_id[m]) for l, m in DAG], dtype=np.int64).reshape(-1, 2)
+    snk = np.array([m_id[m] for m in M_SNK], dtype=np.int64)
+    for st0, l0, lat0 in ((ST0, L0, LAT0), (STP0, LP0, LATP0)):
+        model.add_constrs(np.arange(len(src)), st0 + src, np.ones(len(src)), len(src), '=', 0.0)
+        path_rows(model, edge, snk, st0, l0, lat0)
+
+    cols = dict(y=slice(Y0, Y0 + n), z=Z0, st=slice(ST0, ST0 + n_m), l_max=L0, st_partial=slice(STP0, STP0 + n_m),
+                l_max_partial=LP0)
+    return model, cols
+
+def one_phase(options):
+    """
+    PhaseOptions of the integrated solve from a SolverOptions: the major
+    phase's parameters, the smaller MIP gap of the two phases, and the sum
+    of their time limits (no limit if either phase has none).
+    """
+    major, partial = options.major, options.partial
+    gaps = [gap for gap in (major.mip_gap, partial.mip_gap) if gap is not None]
+    time_limit = None
+    if major.time_limit is not None and partial.time_limit is not None:
+        time_limit = major.time_limit + partial.time_limit
+    return major.replace(mip_gap=min(gaps) if gaps else None, time_limit=time_limit)
+
+def integrated_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, prune=True, options=None, env=None,
+                         backend=None, verbose=False):
+    """
+    lp_scheduler(..., mode="integrated"): the full instances and the
+    remainder of every module decided in one MILP (linear_integrated) instead
+    of a major solve followed by a partial solve pinned to it. It minimizes
+    the same major + partial objective under the same two SLO checks, so it
+    is never worse than the two-phase result, at the price of one binary per
+    (c, c') pair.
+
+    prune: drop the pairs that cannot meet L_SLO (slo_infeasible, per phase)
+           or are dominated (pair_dominated). Both ST blocks are bounded by
+           each module's earliest / latest start either way, so pruning
+           only shrinks the model.
+    options: a SolverOptions / preset; the single solve runs with
+           one_phase of it (the tighter gap of the two phases).
+    backend: None or "gurobi" (GurobiBackend, in env), "highs" or a Backend.
+
+    Returns lp_scheduler's {"major": ..., "partial": ...}: both decisions
+    carry the solve's status, the major one its runtime (the partial one
+    0.0) and the number of pruned pairs as "pruned"; partial is None when
+    no module has a remainder.
+    """
+    t0 = time.perf_counter()
+    P = as_profile_table(P, M, G)
+    options = one_phase(as_solver_options(options))
+    backend = as_backend(backend) or GurobiBackend()
+    pairs = paired_options(M, G, P, C, R)
+    n_pair = len(pairs["mod"])
+
+    drop, st_lb, st_ub = slo_infeasible(P, DAG, M_SNK, L_SLO, P.latency, R)
+    drop_p, st_lb_p, st_ub_p = slo_infeasible(P, DAG, M_SNK, L_SLO, partial_latency_range(P)[0], R)
+    if prune:
+        pairs = take_pairs(pairs, ~(drop[pairs["major"]] | drop_p[pairs["partial"]]))
+        pairs = take_pairs(pairs, ~pair_dominated(pairs, len(M)))
+        if verbose:
+            print("Pruned {} of {} configuration pairs".format(n_pair - len(pairs["mod"]), n_pair))
+
+    model, cols = linear_integrated(M, DAG, M_SRC, M_SNK, pairs, L_SLO)
+    bound_start_columns(model, cols, M, L_SLO, st_lb, st_ub)
+    bound_start_columns(model, dict(st=cols["st_partial"]), M, L_SLO, st_lb_p, st_ub_p)
+    solution = backend.solve(model, options=options, env=env, verbose=verbose)
+    runtime = time.perf_counter() - t0
+    if solution["x"] is None:
+        return dict(major=dict(status=solution["status"], runtime=runtime, objective=None), partial=None)
+
+    # One pair per module with a rate; the rounding absorbs the solver's integrality tolerance
+    pick = np.flatnonzero(np.round(solution["x"][cols["y"]]) > 0.5)
+    P_conf = P.conf()
+    P_r = {P_conf[row]: float(P.throughput[row])
+           for row in np.concatenate([pairs["major"][pick], pairs["partial"][pick]]).tolist()}
+    lat_major = dict.fromkeys(M, 0.0)
+    lat_partial = dict.fromkeys(M, 0.0)
+    major_pick, partial_pick = {}, {}
+    for i in pick.tolist():
+        m = M[pairs["mod"][i]]
+        major_pick[m] = P_conf[pairs["major"][i]]
+        partial_pick[m] = P_conf[pairs["partial"][i]]
+        lat_major[m] = float(pairs["lat_major"][i])
+        lat_partial[m] = float(pairs["lat_partial"][i])
+
+    major = fixed_decision(M, DAG, M_SNK, P_conf, P_r, major_pick, lat_major, R,
+                           float(pairs["cost_major"][pick].sum()), t0)
+    major.update(status=solution["status"], runtime=runtime, pruned=n_pair - len(pairs["mod"]))
+    rate_res, util_res, alloc_gpu = residual_decision(P_conf, P_r, major["alloc_conf"], major["rate"])
+    major.update(rate_res=rate_res, util_res=util_res, alloc_gpu=alloc_gpu)
+    if all(util_res[m] == 1.0 for m in util_res):
+        return dict(major=major, partial=None)
+
+    partial = fixed_decision(M, DAG, M_SNK, P_conf, P_r, partial_pick, lat_partial, rate_res,
+                             float(pairs["cost_partial"][pick].sum()), t0)
+    partial.update(status=solution["status"], runtime=0.0, pruned=major["pruned"])
+    return dict(major=major, partial=partial)
@@ -0,0 +1,72 @@
+from gurobipy import GRB
+
+from d2_dag import topo_order
+
+# Violation above which a candidate's precedence row is cut off (Gurobi's default FeasibilityTol)
+TOL = 1e-6
+
+def lazy_precedence(model, M, DAG, M_SNK, st, lat, l_max):
+    """
+    precedence="lazy": leave the edge rows st[m] >= st[l] + lat[l] out of
+    `model` and add them from precedence_callback, only on paths that break
+    the SLO. st / lat: per-module variables, indexable by m.
+
+    Sets LazyConstraints and model._solve_callback, which solve_decision
+    hands to optimize; model._lazy_added counts the rows added. The ST
+    values of a solution need not respect the rows never added, so
+    solve_decision takes start times and critical latency from
+    lazy_schedule instead.
+    """
+    m_id = {m: i for i, m in enumerate(M)}
+    pred = [[] for _ in M]
+    for l, m in DAG:
+        pred[m_id[m]].append(m_id[l])
+    model.Params.LazyConstraints = 1
+    model._lazy = dict(
+        st=[st[m] for m in M], lat=[lat[m] for m in M], l_max=l_max, pred=pred,
+        order=[m_id[m] for m in topo_order(M, DAG)], sink=[m_id[m] for m in M_SNK])
+    model._lazy_added = 0
+    model._solve_callback = precedence_callback
+
+def earliest(lazy, lat):
+    """Earliest start of every module (start_times on index lists) and the latest sink finish."""
+    a = [0.0] * len(lat)
+    for m in lazy["order"]:
+        if lazy["pred"][m]:
+            a[m] = max(a[l] + lat[l] for l in lazy["pred"][m])
+    return a, max((a[s] + lat[s] for s in lazy["sink"]), default=0.0)
+
+def precedence_callback(model, where):
+    """
+    MIPSOL callback of a lazy_precedence model, in the style of the subtour
+    cuts of tutorials/webinar3 tsp2.py. The candidate's latencies fix the
+    earliest start times; every sink that then finishes after the
+    candidate's L_max lies on a path whose rows the candidate breaks, and
+    the broken rows of that critical path become lazy constraints. Paths
+    with slack never get rows.
+    """
+    if where != GRB.Callback.MIPSOL:
+        return
+    lazy = model._lazy
+    st, lat = lazy["st"], lazy["lat"]
+    st_v = model.cbGetSolution(st)
+    lat_v = model.cbGetSolution(lat)
+    l_max = model.cbGetSolution(lazy["l_max"])
+    a, _ = earliest(lazy, lat_v)
+
+    for s in lazy["sink"]:
+        if a[s] + lat_v[s] <= l_max + TOL:
+            continue
+        # Walk the critical path back to its source
+        m = s
+        while lazy["pred"][m]:
+            l = max(lazy["pred"][m], key=lambda l: a[l] + lat_v[l])
+            if st_v[m] < st_v[l] + lat_v[l] - TOL:
+                model.cbLazy(st[m] >= st[l] + lat[l])
+                model._lazy_added += 1
+            m = l
+
+def lazy_schedule(model):
+    """(start time per module index, critical latency) of the solution of a lazy_precedence model."""
+    lazy = model._lazy
+    return earliest(lazy, [v.X for v in lazy["lat"]])
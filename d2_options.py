@@ -0,0 +1,90 @@
+from gurobipy import GRB
+
+class PhaseOptions:
+    """
+    Gurobi parameters for one phase (major or partial) of the scheduler.
+
+    threads, mip_gap, time_limit, mip_focus and method map to the Threads,
+    MIPGap, TimeLimit, MIPFocus and Method parameters. None leaves the
+    parameter as the model builder set it (Threads = 1, Gurobi defaults for
+    the rest).
+    """
+
+    PARAMS = (("threads", "Threads"), ("mip_gap", "MIPGap"), ("time_limit", "TimeLimit"),
+              ("mip_focus", "MIPFocus"), ("method", "Method"))
+
+    def __init__(self, threads=None, mip_gap=None, time_limit=None, mip_focus=None, method=None):
+        self.threads = threads
+        self.mip_gap = mip_gap
+        self.time_limit = time_limit
+        self.mip_focus = mip_focus
+        self.method = method
+
+    def params(self):
+        """{Gurobi parameter name: value} of the parameters that are set."""
+        return {name: getattr(self, attr) for attr, name in self.PARAMS if getattr(self, attr) is not None}
+
+    def apply(self, model):
+        """Set the parameters on a gp.Model."""
+        for name, value in self.params().items():
+            model.setParam(name, value)
+
+    def replace(self, **kw):
+        """Copy with some fields changed."""
+        values = {attr: getattr(self, attr) for attr, _ in self.PARAMS}
+        values.update(kw)
+        return PhaseOptions(**values)
+
+    def __repr__(self):
+        return "PhaseOptions({})".format(", ".join(
+            "{}={!r}".format(attr, getattr(self, attr)) for attr, _ in self.PARAMS if getattr(self, attr) is not None))
+
+class SolverOptions:
+    """
+    Gurobi parameters of both phases: `major` and `partial` are PhaseOptions.
+
+    Named presets (SolverOptions.preset or as_solver_options):
+      fast        all cores, 1% gap, 10 s per phase, focus on feasible
+                  solutions, dual simplex at the root.
+      balanced    all cores, default gap, 60 s per phase, default focus and
+                  root algorithm.
+      exhaustive  all cores, zero gap, no time limit, focus on proving
+                  optimality (the partial MIQCP on the bound), concurrent
+                  root.
+    """
+
+    PRESETS = {
+        "fast": dict(
+            major=dict(threads=0, mip_gap=1e-2, time_limit=10, mip_focus=1, method=1),
+            partial=dict(threads=0, mip_gap=1e-2, time_limit=10, mip_focus=1, method=1)),
+        "balanced": dict(
+            major=dict(threads=0, mip_gap=1e-4, time_limit=60, mip_focus=0, method=-1),
+            partial=dict(threads=0, mip_gap=1e-4, time_limit=60, mip_focus=0, method=-1)),
+        "exhaustive": dict(
+            major=dict(threads=0, mip_gap=0.0, time_limit=GRB.INFINITY, mip_focus=2, method=3),
+            partial=dict(threads=0, mip_gap=0.0, time_limit=GRB.INFINITY, mip_focus=3, method=3)),
+    }
+
+    def __init__(self, major=None, partial=None):
+        self.major = major if major is not None else PhaseOptions()
+        self.partial = partial if partial is not None else PhaseOptions()
+
+    @classmethod
+    def preset(cls, name):
+        if name not in cls.PRESETS:
+            raise ValueError("Unknown solver preset '{}' (one of {})".format(name, ", ".join(cls.PRESETS)))
+        spec = cls.PRESETS[name]
+        return cls(PhaseOptions(**spec["major"]), PhaseOptions(**spec["partial"]))
+
+    def __repr__(self):
+        return "SolverOptions(major={!r}, partial={!r})".format(self.major, self.partial)
+
+def as_solver_options(options):
+    """None (builder defaults), a preset name or SolverOptions -> SolverOptions."""
+    if options is None:
+        return SolverOptions()
+    if isinstance(options, str):
+        return SolverOptions.preset(options)
+    if isinstance(options, SolverOptions):
+        return options
+    raise TypeError("options must be None, a preset name or SolverOptions, got {!r}".format(type(options)))
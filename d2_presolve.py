@@ -0,0 +1,160 @@
+import numpy as np
+
+from d2_dag import slo_bounds
+from d2_profile import as_profile_table
+
+def gpu_classes(P, C):
+    """
+    Group GPU types that are interchangeable: same cost C[g] and the same
+    profile rows for every module. Returns {representative: [members]},
+    the representative being the first member in P.gpus order.
+    """
+    classes = {}
+    for j, g in enumerate(P.gpus):
+        rows = np.flatnonzero(P.gpu == j)
+        key = (float(C[g]), P.mod[rows].tobytes(), P.config[rows].tobytes()) + \
+            tuple(getattr(P, col)[rows].tobytes() for col in P.COLUMNS)
+        classes.setdefault(key, []).append(g)
+    return {members[0]: members for members in classes.values()}
+
+def aggregate_gpus(P, M, G, C):
+    """
+    Collapse each class of gpu_classes to its representative.
+
+    Returns (P, G, C, classes) of the reduced instance. Nothing in the models
+    tells two members of a class apart, so an optimum of the reduced instance
+    is an optimum of the full one (see expand_decision).
+    """
+    P = as_profile_table(P, M, G)
+    classes = gpu_classes(P, C)
+    G_rep = list(classes)
+    if len(G_rep) == len(P.gpus):
+        return P, list(G), C, classes
+
+    return P.reindex(list(M), G_rep), G_rep, {g: C[g] for g in G_rep}, classes
+
+def expand_decision(decision, classes):
+    """
+    Decision on the reduced instance back to concrete GPU names: values keyed
+    by a representative are kept, and every other member of its class gets
+    the same keys with zero allocation.
+    """
+    if decision is None or decision.get("objective") is None:
+        return decision
+
+    decision = dict(decision)
+    for name in ("alloc_conf", "rate", "util", "alloc_gpu"):
+        if name not in decision:
+            continue
+        values = {}
+        for key, v in decision[name].items():
+            values[key] = v
+            zero = type(v)(0)
+            for g in classes[key[1]][1:]:
+                values[(key[0], g) + key[2:]] = zero
+        decision[name] = values
+    return decision
+
+def expand_result(result, classes):
+    """expand_decision on both phases of an lp_scheduler result."""
+    return dict(major=expand_decision(result["major"], classes),
+                partial=expand_decision(result["partial"], classes))
+
+def major_dominated(P, C):
+    """
+    Rows the major phase never needs. A module there puts its whole rate on
+    one configuration at latency P_l and cost C[g] * R[m] / P_r, so a row is
+    dominated when another row of the same module, on any GPU type, has
+    P_l' <= P_l and C[g'] / P_r' <= C[g] / P_r (one exact duplicate is kept).
+    Swapping it for the dominating row keeps any schedule feasible and no
+    dearer, for every R and L_SLO. Returns a boolean mask over P's rows.
+    """
+    unit = np.array([C[g] for g in P.gpus], dtype=float)[P.gpu] / P.throughput
+    drop = np.zeros(len(P), dtype=bool)
+    for m in P.modules:
+        s = P.module_rows(m)
+        if s.stop - s.start < 2:
+            continue
+        cost = unit[s]
+        order = np.lexsort((cost, P.latency[s]))
+        c = cost[order]
+        keep = np.ones(len(c), dtype=bool)
+        keep[1:] = c[1:] < np.minimum.accumulate(c)[:-1]
+        drop[s.start + order[~keep]] = True
+    return drop
+
+def partial_latency_range(P):
+    """
+    Smallest and largest partial_latency of every row over the residuals
+    u_m = 0 .. P_r - 1 it can serve.
+    """
+    multi = (P.batch > 1) & (P.throughput >= 2)
+    lat_1 = P.duration + P.batch / (1 + 1.0/1000.0)
+    lat_n = P.duration + P.batch / (np.maximum(P.throughput - 1, 1) + 1.0/1000.0)
+    lo = np.where(multi, np.minimum(P.latency, lat_n), P.latency)
+    hi = np.where(multi, np.maximum(P.latency, lat_1), P.latency)
+    return lo, hi
+
+def partial_dominated(P):
+    """
+    Rows the partial phase never needs. A residual picks a configuration on
+    the GPU type of its major decision, at cost C[g] * rate_res / P_r and a
+    latency inside partial_latency_range, so a row is dominated when another
+    row of the same (module, GPU type) has P_r' >= P_r and a largest latency
+    no higher than its smallest one, whatever the residual (one duplicate is
+    kept). Returns a boolean mask over P's rows.
+    """
+    lo, hi = partial_latency_range(P)
+    drop = np.zeros(len(P), dtype=bool)
+    for i in range(len(P.offsets) - 1):
+        s, e = P.offsets[i], P.offsets[i + 1]
+        n = e - s
+        if n < 2:
+            continue
+        r = P.throughput[s:e]
+        dom = (r[:, None] >= r[None, :]) & (hi[s:e][:, None] <= lo[s:e][None, :])  # dom[a, b]: a beats b
+        np.fill_diagonal(dom, False)
+        # Rows that beat each other are duplicates: only the later one goes
+        dom &= ~(dom.T & (np.arange(n)[:, None] > np.arange(n)[None, :]))
+        drop[s:e] = dom.any(axis=0)
+    return drop
+
+def fill_rows(decision, P_conf, pairs):
+    """
+    Decision on a pruned table back to every (m, g, k) of P_conf and every
+    (m, g) of pairs, with zero allocation on the removed rows.
+    """
+    if decision is None or decision.get("objective") is None:
+        return decision
+
+    decision = dict(decision)
+    for name in ("alloc_conf", "rate", "util"):
+        if name in decision:
+            values = decision[name]
+            decision[name] = {c: values.get(c, 0.0) for c in P_conf}
+    if "alloc_gpu" in decision:
+        values = decision["alloc_gpu"]
+        decision["alloc_gpu"] = {p: values.get(p, 0) for p in pairs}
+    return decision
+
+def slo_infeasible(P, DAG, M_SNK, L_SLO, lat, R=None):
+    """
+    Rows that cannot meet L_SLO even when every other module runs at its
+    fastest (see slo_bounds), for the per-row latencies `lat` (P.latency for
+    the major phase, the low end of partial_latency_range for the partial
+    one). Modules with R[m] <= 0 carry no configuration and count as zero
+    latency. Returns (drop mask, es, ls); es / ls bound the ST variables.
+    """
+    min_lat = {}
+    for m in P.modules:
+        s = P.module_rows(m)
+        if R is not None and R[m] <= 0:
+            min_lat[m] = 0.0
+        else:
+            min_lat[m] = float(lat[s].min()) if s.stop > s.start else np.inf
+
+    es, after, ls = slo_bounds(P.modules, DAG, M_SNK, L_SLO, min_lat)
+
+    slack = np.array([np.inf if after[m] is None else L_SLO - es[m] - after[m] for m in P.modules])
+    drop = lat > slack[P.mod] + 1e-9
+    return drop, es, ls
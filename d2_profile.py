@@ -0,0 +1,184 @@
+import hashlib
+
+import numpy as np
+
+class ProfileTable:
+    """
+    Columnar profile store.
+
+    One row per profiled configuration (m, g, k), grouped by module then GPU
+    type. Modules and GPU types are integer ids into `modules` / `gpus`, and
+    `config` keeps the index k of the row in the legacy P[m, g] list, so keys
+    stay stable when rows are dropped. Rows of (module i, GPU j) are
+    offsets[i * len(gpus) + j] : offsets[i * len(gpus) + j + 1].
+
+    Columns: batch, parallel, latency, duration, throughput
+    (the five entries of a legacy P[m, g][k] row).
+    """
+
+    COLUMNS = ("batch", "parallel", "latency", "duration", "throughput")
+
+    def __init__(self, modules, gpus, mod, gpu, config, batch, parallel, latency, duration, throughput):
+        self.modules = list(modules)
+        self.gpus = list(gpus)
+
+        mod = np.asarray(mod, dtype=np.int32)
+        gpu = np.asarray(gpu, dtype=np.int32)
+        config = np.asarray(config, dtype=np.int32)
+
+        # Keep rows grouped by (module, GPU type), in config order within a group
+        order = np.lexsort((config, gpu, mod))
+        if np.any(order != np.arange(len(order))):
+            mod, gpu, config = mod[order], gpu[order], config[order]
+            batch, parallel, latency, duration, throughput = (
+                np.asarray(col)[order] for col in (batch, parallel, latency, duration, throughput))
+
+        self.mod = mod
+        self.gpu = gpu
+        self.config = config
+        self.batch = np.asarray(batch, dtype=np.int32)
+        self.parallel = np.asarray(parallel, dtype=np.int32)
+        self.latency = np.asarray(latency, dtype=np.float64)
+        self.duration = np.asarray(duration, dtype=np.float64)
+        self.throughput = np.asarray(throughput, dtype=np.float64)
+
+        n_group = len(self.modules) * len(self.gpus)
+        count = np.bincount(mod.astype(np.int64) * len(self.gpus) + gpu, minlength=n_group)
+        self.offsets = np.zeros(n_group + 1, dtype=np.int64)
+        np.cumsum(count, out=self.offsets[1:])
+
+        self._m_id = {m: i for i, m in enumerate(self.modules)}
+        self._g_id = {g: j for j, g in enumerate(self.gpus)}
+
+    @classmethod
+    def from_dict(cls, P, M, G):
+        """
+        Convert the legacy {(m, g): [[batch, parallel, latency, duration, throughput], ...]}
+        profile. Missing (m, g) pairs are treated as having no configurations.
+        """
+        groups = [(i, j, P.get((m, g), ())) for i, m in enumerate(M) for j, g in enumerate(G)]
+        size = np.array([len(rows) for _, _, rows in groups], dtype=np.int64)
+        mod = np.repeat(np.array([i for i, _, _ in groups], dtype=np.int32), size)
+        gpu = np.repeat(np.array([j for _, j, _ in groups], dtype=np.int32), size)
+        config = np.concatenate([np.arange(s, dtype=np.int32) for s in size]) if len(size) else np.zeros(0, np.int32)
+        prof = np.array([row for _, _, rows in groups for row in rows], dtype=np.float64).reshape(-1, 5)
+        return cls(M, G, mod, gpu, config, *prof.T)
+
+    def __len__(self):
+        return len(self.mod)
+
+    def rows(self, m, g):
+        """Row slice of (m, g)."""
+        i = self._m_id[m] * len(self.gpus) + self._g_id[g]
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def module_rows(self, m):
+        """Row slice of all GPU types of module m."""
+        i = self._m_id[m] * len(self.gpus)
+        return slice(self.offsets[i], self.offsets[i + len(self.gpus)])
+
+    def __getitem__(self, key):
+        """
+        Legacy view: P[m, g] is an (n, 5) array, so len(P[m, g]) and
+        P[m, g][k][i] keep working on unpruned tables.
+        """
+        s = self.rows(*key)
+        return np.column_stack([getattr(self, col)[s] for col in self.COLUMNS])
+
+    def conf(self):
+        """(m, g, k) keys of all rows, in row order (the P_conf of lp_scheduler)."""
+        return list(zip([self.modules[i] for i in self.mod.tolist()],
+                        [self.gpus[j] for j in self.gpu.tolist()],
+                        self.config.tolist()))
+
+    def column_dict(self, col, keys=None):
+        """{(m, g, k): value} for one column, e.g. P_r = P.column_dict('throughput')."""
+        return dict(zip(self.conf() if keys is None else keys, getattr(self, col).tolist()))
+
+    def take(self, idx):
+        """New table with the selected rows (index array or boolean mask)."""
+        return ProfileTable(self.modules, self.gpus, self.mod[idx], self.gpu[idx], self.config[idx],
+                            *(getattr(self, col)[idx] for col in self.COLUMNS))
+
+    def reindex(self, M, G):
+        """Restrict / reorder modules and GPU types to M and G."""
+        if list(M) == self.modules and list(G) == self.gpus:
+            return self
+        m_map = np.array([M.index(m) if m in M else -1 for m in self.modules], dtype=np.int32)
+        g_map = np.array([G.index(g) if g in G else -1 for g in self.gpus], dtype=np.int32)
+        mod = m_map[self.mod] if len(self.mod) else self.mod
+        gpu = g_map[self.gpu] if len(self.gpu) else self.gpu
+        keep = (mod >= 0) & (gpu >= 0)
+        return ProfileTable(M, G, mod[keep], gpu[keep], self.config[keep],
+                            *(getattr(self, col)[keep] for col in self.COLUMNS))
+
+    def to_dict(self):
+        """Back to the legacy dict-of-lists format."""
+        P = {}
+        for i, m in enumerate(self.modules):
+            for j, g in enumerate(self.gpus):
+                s = self.rows(m, g)
+                if s.start < s.stop:
+                    P[m, g] = self[m, g].tolist()
+        return P
+
+def config_rows(mod_start, mod_size, src):
+    """
+    For every entry of `src` (a module id), expand to that module's config ids.
+    Returns (row, config) pairs, one row per entry of `src` x config.
+    """
+    cnt = mod_size[src]
+    row = np.repeat(np.arange(len(src)), cnt)
+    first = np.repeat(np.cumsum(cnt) - cnt, cnt)
+    conf = np.repeat(mod_start[src], cnt) + np.arange(cnt.sum()) - first
+    return row, conf
+
+def as_profile_table(P, M, G):
+    """Accept either a ProfileTable or the legacy dict, indexed by M and G."""
+    if isinstance(P, ProfileTable):
+        return P.reindex(list(M), list(G))
+    return ProfileTable.from_dict(P, M, G)
+
+def profile_digest(P, M, G):
+    """sha256 (bytes) of the ProfileTable columns of P (a table or the legacy dict)."""
+    h = hashlib.sha256()
+    P = as_profile_table(P, M, G)
+    for column in ("mod", "gpu", "config") + P.COLUMNS:
+        h.update(np.ascontiguousarray(getattr(P, column), dtype=np.float64).tobytes())
+    return h.digest()
+
+def partial_latency(P_b, P_l, P_d, v):
+    """
+    Latency of a configuration whose residual instance serves v requests
+    (u_m = v): P_l when v == 0 or the batch size is 1, otherwise
+    P_d + P_b / (v + 0.001), the value Constr5_6_Aux1 gives with
+    temp_inv = 1 / (u_m + 0.001).
+    """
+    if v == 0 or P_b <= 1:
+        return P_l
+    return P_d + P_b / (v + 1.0/1000.0)
+
+def residual_decision(P_conf, P_r, alloc_conf, rate):
+    """
+    Split each module's major allocation into full instances and the residual
+    (partial) instance: rate_res / util_res per module and alloc_gpu per
+    (module, GPU type).
+    """
+    rate_res = {}
+    util_res = {}
+    alloc_gpu = {}
+    for m, g, k in P_conf:
+        if alloc_conf[m, g, k] and rate[m, g, k] > 0:
+            alloc_gpu[m, g] = 1
+            rate_res[m] = int(rate[m, g, k] % P_r[m, g, k])
+            if rate_res[m] == 0:
+                # major
+                rate_res[m] = P_r[m, g, k]
+                util_res[m] = 1.0
+            else:
+                # partial
+                util_res[m] = rate_res[m] / P_r[m, g, k]
+        else:
+            if (m, g) not in alloc_gpu:
+                alloc_gpu[m, g] = 0
+    return rate_res, util_res, alloc_gpu
@@ -0,0 +1,146 @@
+import gurobipy as gp
+from gurobipy import GRB
+
+from d2_alloc_lp import *
+
+def scenario_values(model, var, keys):
+    """var_values for the scenario selected by model.Params.ScenarioNumber."""
+    if isinstance(var, gp.MVar):
+        return dict(zip(keys, var.ScenNX.tolist()))
+    return dict(model.getAttr('ScenNX', var))
+
+def scenario_decision(model, x, r, u, st, l_max, P_conf, M, s):
+    """
+    solve_decision for scenario s of a solved multi-scenario model. ScenNX of
+    the integer x / r carries the integrality tolerance (187.999999999996 for
+    188), which residual_decision's rate % P_r would not survive, so both are
+    rounded.
+    """
+    model.Params.ScenarioNumber = s
+
+    if model.ScenNObjVal >= GRB.INFINITY:
+        status = GRB.INFEASIBLE if model.ScenNObjBound >= GRB.INFINITY else model.status
+        return dict(status=status, runtime=model.Runtime, objective=None, scenario=s)
+
+    return dict(
+        status=model.status,
+        runtime=model.Runtime,
+        objective=model.ScenNObjVal,
+        alloc_conf={c: float(round(v)) for c, v in scenario_values(model, x, P_conf).items()},
+        rate={c: float(round(v)) for c, v in scenario_values(model, r, P_conf).items()},
+        util=scenario_values(model, u, P_conf),
+        start_time=scenario_values(model, st, M),
+        critical_lat=l_max.ScenNX,
+        scenario=s)
+
+def lp_scheduler_scenarios(base_instance, rate_scenarios, builder="expr", verbose=False, link="bigm",
+                           partial_mode="lookup", engine="auto", aggregate=True, prune=True,
+                           precedence="aggregated", options=None, env=None):
+    """
+    lp_scheduler for many rate vectors of one instance, with the major phase
+    solved once as a Gurobi multi-scenario model.
+
+    base_instance: lp_scheduler inputs (M, DAG, M_SRC, M_SNK, G, P, C, R,
+                   L_SLO), e.g. main_d2_lp.DAG2().
+    rate_scenarios: list of {m: rate}, each laid over base_instance["R"].
+
+    One major model is built with the largest rate of every module, so the
+    bigm Constr3 coefficients R[m] / P_r hold for every scenario (link must be
+    "bigm" or "indicator": multi-scenario models are linear). Scenario s then
+    only changes the Constr1 right-hand sides and the R upper bounds. Pruning
+    uses the smallest rate of every module for slo_infeasible, which keeps
+    every row some scenario may need. The partial phase depends on each
+    scenario's major decision and runs once per scenario (partial_phase, by
+    the DP on chain / out-tree DAGs under engine="auto").
+
+    Returns one lp_scheduler result per scenario, in order; each major
+    decision also carries its "scenario" number.
+    """
+    M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO = (base_instance[key] for key in
+        ("M", "DAG", "M_SRC", "M_SNK", "G", "P", "C", "R", "L_SLO"))
+    if precedence == "lazy":
+        raise ValueError("precedence='lazy' needs a callback, which multi-scenario models do not run")
+    scenarios = [dict(R, **R_s) for R_s in rate_scenarios]
+    if not scenarios:
+        return []
+
+    P = as_profile_table(P, M, G)
+    options = as_solver_options(options)
+
+    if aggregate:
+        P, G_rep, C_rep, classes = aggregate_gpus(P, M, G, C)
+        if len(G_rep) < len(G):
+            reduced = dict(base_instance, G=G_rep, P=P, C=C_rep)
+            results = lp_scheduler_scenarios(reduced, scenarios, builder=builder, verbose=verbose, link=link,
+                                             partial_mode=partial_mode, engine=engine, aggregate=False,
+                                             prune=prune, precedence=precedence, options=options, env=env)
+            return [expand_result(result, classes) for result in results]
+
+    R_hi = {m: max(R_s[m] for R_s in scenarios) for m in M}
+    R_lo = {m: min(R_s[m] for R_s in scenarios) for m in M}
+
+    P_all = P
+    if prune:
+        slo_drop, st_lb, st_ub = slo_infeasible(P_all, DAG, M_SNK, L_SLO, P_all.latency, R_lo)
+        P = P_all.take(~(major_dominated(P_all, C) | slo_drop))
+
+    P_conf = gp.tuplelist(P.conf())
+    M_conf = conf_index(M, P_conf)
+    P_l = P.column_dict('latency', P_conf)
+    P_r = P.column_dict('throughput', P_conf)
+
+    if builder == "matrix":
+        model, x, r, u, st, l_max = build_major_model_matrix(
+            M, DAG, M_SRC, M_SNK, G, P, C, R_hi, L_SLO, link=link, precedence=precedence, env=env)
+    else:
+        model, x, r, u, st, l_max = build_major_model(
+            M, DAG, M_SRC, M_SNK, G, C, R_hi, L_SLO, P_conf, M_conf, P_l, P_r, link=link, precedence=precedence,
+            env=env)
+    model.Params.OutputFlag = int(verbose)
+    options.major.apply(model)
+    if prune:
+        bound_start_times(model, st, M, L_SLO, st_lb, st_ub)
+
+    # Scenario 0 is the base model; the others override Constr1 and the R bounds
+    set_attr(model, 'RHS', model._constr1, M, scenarios[0])
+    set_attr(model, 'UB', r, P_conf, {c: scenarios[0][c[0]] for c in P_conf})
+    model.NumScenarios = len(scenarios)
+    for s, R_s in enumerate(scenarios):
+        model.Params.ScenarioNumber = s
+        model.ScenNName = "R[{}]".format(s)
+        if s > 0:
+            set_attr(model, 'ScenNRHS', model._constr1, M, R_s)
+            set_attr(model, 'ScenNUB', r, P_conf, {c: R_s[c[0]] for c in P_conf})
+
+    model.optimize()
+
+    if engine == "auto":
+        engine = "dp" if is_out_forest(M, DAG) else "mip"
+
+    results = []
+    for s, R_s in enumerate(scenarios):
+        major = scenario_decision(model, x, r, u, st, l_max, P_conf, M, s)
+        major["pruned"] = len(P_all) - len(P)
+        if major["objective"] is None:
+            results.append(dict(major=major, partial=None))
+            continue
+
+        rate_res, util_res, alloc_gpu = residual_decision(P_conf, P_r, major["alloc_conf"], major["rate"])
+        major.update(rate_res=rate_res, util_res=util_res, alloc_gpu=alloc_gpu)
+        if verbose:
+            print("\n-------- SCENARIO {} --------".format(s))
+            print_major(P_conf, major)
+        if prune:
+            major = fill_rows(major, P_all.conf(), [(m, g) for m in M for g in G])
+
+        if all(util_res[m] == 1.0 for m in util_res):
+            results.append(dict(major=major, partial=None))
+            continue
+
+        partial = partial_phase(M, DAG, M_SRC, M_SNK, G, P_all, C, R_s, L_SLO, major, engine=engine,
+                                partial_mode=partial_mode, prune=prune, precedence=precedence, options=options,
+                                env=env, verbose=verbose)
+        results.append(dict(major=major, partial=partial))
+
+    model.Params.ScenarioNumber = 0
+    return results
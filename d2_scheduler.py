@@ -0,0 +1,211 @@
+import gurobipy as gp
+
+from d2_alloc_lp import (bound_start_times, build_major_model, build_partial_model, conf_index, fallback_decision,
+                         fix_partial_model, print_major, print_partial, set_attr, solve_decision, start_decision,
+                         update_bigm, warm_start_major)
+from d2_alloc_matrix import build_major_model_matrix
+from d2_greedy import greedy_major, greedy_partial
+from d2_options import as_solver_options
+from d2_presolve import (aggregate_gpus, expand_result, fill_rows, major_dominated, partial_dominated,
+                         slo_infeasible)
+from d2_profile import as_profile_table, residual_decision
+
+class D2Scheduler:
+    """
+    Long-lived two-phase scheduler for one (M, DAG, G, P, C).
+
+    Both Gurobi models are built once; update_rates / update_slo patch the
+    right-hand sides and bounds that depend on R and L_SLO in place, and
+    solve() re-optimizes. The partial model is built on the first major
+    decision that leaves a remainder and is re-pinned with fix_partial_model
+    on every later solve.
+
+    With warm_start, each solve seeds the major model with the previous major
+    decision (see warm_start_major). partial_mode picks the partial model
+    ("nonconvex" or "lookup", see build_partial_model). With aggregate, the
+    models are built on one representative per class of interchangeable GPU
+    types and solve() expands the result (see d2_presolve).
+
+    With prune, the major model only gets the rows major_dominated keeps
+    (that set does not depend on R or L_SLO), and the partial model those
+    rows plus every row partial_dominated keeps. Rows that cannot fit the
+    current SLO (slo_infeasible) stay in the major model with x fixed to 0,
+    and ST is bounded by the earliest / latest starts; both are recomputed
+    on every update_rates / update_slo.
+
+    options (SolverOptions or a preset name, see d2_options) sets the Gurobi
+    parameters of each phase; set_options changes them between solves.
+
+    With greedy, the d2_greedy allocation is the MIP start of a major solve
+    without a previous decision and of every partial solve, and is returned
+    for a phase that ends without a solution (see lp_scheduler).
+    """
+
+    def __init__(self, M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, builder="expr", verbose=False,
+                 warm_start=True, link="bilinear", partial_mode="nonconvex", aggregate=True, prune=True,
+                 precedence="aggregated", options=None, greedy=False):
+        self.classes = None
+        if aggregate:
+            P, G_rep, C, classes = aggregate_gpus(P, M, G, C)
+            if len(G_rep) < len(G):
+                G, self.classes = G_rep, classes
+
+        self.M, self.DAG, self.M_SRC, self.M_SNK, self.G, self.C = M, DAG, M_SRC, M_SNK, G, C
+        self.verbose = verbose
+        self.warm_start = warm_start
+        self.partial_mode = partial_mode
+        self.precedence = precedence
+        self.options = as_solver_options(options)
+        self.greedy = greedy
+        self.previous = None
+
+        P_all = as_profile_table(P, M, G)
+        self.pruned = None
+        if prune:
+            drop = major_dominated(P_all, C)
+            P_major = P_all.take(~drop)
+            self.P = P_all.take(~(drop & partial_dominated(P_all)))
+            self.pruned = dict(major=len(P_all) - len(P_major), partial=len(P_all) - len(self.P))
+            self.P_all_conf = P_all.conf()
+            self.pairs = [(m, g) for m in M for g in G]
+        else:
+            P_major = self.P = P_all
+        self.P_major = P_major
+
+        # Partial-phase rows (a superset of the major ones)
+        self.P_conf = gp.tuplelist(self.P.conf())
+        self.M_conf = conf_index(M, self.P_conf)
+
+        self.P_b = self.P.column_dict('batch', self.P_conf)
+        self.P_l = self.P.column_dict('latency', self.P_conf)
+        self.P_d = self.P.column_dict('duration', self.P_conf)
+        self.P_r = self.P.column_dict('throughput', self.P_conf)
+
+        # Major-phase rows
+        self.major_conf = gp.tuplelist(P_major.conf()) if prune else self.P_conf
+        self.major_M_conf = conf_index(M, self.major_conf) if prune else self.M_conf
+
+        self.R = dict(R)
+        self.L_SLO = L_SLO
+
+        if builder == "matrix":
+            self.major_model = build_major_model_matrix(M, DAG, M_SRC, M_SNK, G, P_major, C, self.R, L_SLO,
+                                                        link=link, precedence=precedence)
+        else:
+            self.major_model = build_major_model(M, DAG, M_SRC, M_SNK, G, C, self.R, L_SLO,
+                                                 self.major_conf, self.major_M_conf, self.P_l, self.P_r, link=link,
+                                                 precedence=precedence)
+        self.major_model[0].Params.OutputFlag = int(verbose)
+        self.options.major.apply(self.major_model[0])
+        if prune:
+            self._bound_slo()
+
+        self.partial_model = None
+
+    def _bound_slo(self):
+        """Fix x to 0 on the major rows that cannot fit L_SLO and bound ST (see slo_infeasible)."""
+        model, x, r, u, st, l_max = self.major_model
+        drop, st_lb, st_ub = slo_infeasible(self.P_major, self.DAG, self.M_SNK, self.L_SLO, self.P_major.latency, self.R)
+        set_attr(model, 'UB', x, self.major_conf, dict(zip(self.major_conf, (~drop).astype(float).tolist())))
+        bound_start_times(model, st, self.M, self.L_SLO, st_lb, st_ub)
+
+    def update_rates(self, R):
+        """New source/module rates: Constr1 right-hand sides and the R_upper bounds."""
+        self.R.update(R)
+        model, x, r, u, st, l_max = self.major_model
+
+        set_attr(model, 'RHS', model._constr1, self.M, self.R)
+        set_attr(model, 'UB', r, self.major_conf, {c: self.R[c[0]] for c in self.major_conf})
+        update_bigm(model, x, self.major_conf, self.P_r, self.R)
+        if self.pruned is not None:
+            self._bound_slo()
+
+    def update_slo(self, L_SLO):
+        """New SLO: L_max / ST upper bounds and the L_max <= L_SLO rows of both phases."""
+        self.L_SLO = L_SLO
+
+        model, x, r, u, st, l_max = self.major_model
+        set_attr(model, 'UB', st, self.M, L_SLO)
+        l_max.UB = L_SLO
+        model._const8.RHS = L_SLO
+        if self.pruned is not None:
+            self._bound_slo()
+
+        if self.partial_model is not None:
+            model, x, r, u, st, l_max = self.partial_model
+            set_attr(model, 'UB', st, self.M, L_SLO)
+            l_max.UB = L_SLO
+            model._const7.RHS = L_SLO
+
+    def set_options(self, options):
+        """New Gurobi parameters for both phases (applied on top of the current ones)."""
+        self.options = as_solver_options(options)
+        self.options.major.apply(self.major_model[0])
+        if self.partial_model is not None:
+            self.options.partial.apply(self.partial_model[0])
+
+    def solve(self):
+        """Same result as lp_scheduler for the current R and L_SLO."""
+        result = self._solve()
+        if self.pruned is not None:
+            result = dict(major=fill_rows(result["major"], self.P_all_conf, self.pairs),
+                          partial=fill_rows(result["partial"], self.P_all_conf, self.pairs))
+        if self.classes is not None:
+            result = expand_result(result, self.classes)
+        return result
+
+    def _solve(self):
+        model, x, r, u, st, l_max = self.major_model
+        seed = None
+        if self.greedy:
+            seed = greedy_major(self.M, self.DAG, self.M_SNK, self.G, self.P_major, self.C, self.R, self.L_SLO)
+
+        previous = self.previous if self.warm_start and self.previous is not None else seed
+        if previous is not None and previous["objective"] is not None:
+            warm_start_major(model, x, r, u, st, self.M, self.DAG, self.M_SNK, self.major_conf, self.major_M_conf,
+                             self.P_l, self.P_r, self.R, previous)
+
+        major = fallback_decision(solve_decision(model, x, r, u, st, l_max, self.major_conf, self.M), seed)
+        if major["objective"] is None:
+            return dict(major=major, partial=None)
+        self.previous = major
+
+        rate_res, util_res, alloc_gpu = residual_decision(self.major_conf, self.P_r, major["alloc_conf"], major["rate"])
+        major.update(rate_res=rate_res, util_res=util_res, alloc_gpu=alloc_gpu)
+        major["pruned"] = self.pruned["major"] if self.pruned else 0
+
+        if self.verbose:
+            print_major(self.major_conf, major)
+
+        if all(util_res[m] == 1.0 for m in util_res):
+            return dict(major=major, partial=None)
+
+        if self.partial_model is None:
+            self.partial_model = build_partial_model(
+                self.M, self.DAG, self.M_SRC, self.M_SNK, self.G, self.C, self.L_SLO,
+                self.P_conf, self.M_conf, self.P_b, self.P_l, self.P_d, self.P_r, mode=self.partial_mode,
+                precedence=self.precedence)
+            self.partial_model[0].Params.OutputFlag = int(self.verbose)
+            self.options.partial.apply(self.partial_model[0])
+
+        alloc_conf = major["alloc_conf"]
+        if self.pruned is not None:
+            alloc_conf = {c: alloc_conf.get(c, 0.0) for c in self.P_conf}
+            alloc_gpu = {(m, g): alloc_gpu.get((m, g), 0) for m, g, k in self.P_conf}
+
+        model, x, r, u, st, l_max = self.partial_model
+        fix_partial_model(model, x, r, u, self.P_conf, self.P_r, alloc_conf, alloc_gpu, rate_res, util_res,
+                          self.P_b, self.P_l, self.P_d)
+        seed = None
+        if self.greedy:
+            seed = greedy_partial(self.M, self.DAG, self.M_SNK, self.G, self.P, self.C, self.L_SLO, alloc_conf,
+                                  alloc_gpu, rate_res, util_res)
+            if seed["objective"] is not None:
+                start_decision(model, x, r, u, self.P_conf, seed)
+        partial = fallback_decision(solve_decision(model, x, r, u, st, l_max, self.P_conf, self.M), seed)
+        partial["pruned"] = self.pruned["partial"] if self.pruned else 0
+
+        if self.verbose and partial["objective"] is not None:
+            print_partial(self.P_conf, partial, util_res)
+
+        return dict(major=major, partial=partial)
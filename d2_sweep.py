@@ -0,0 +1,135 @@
+import numpy as np
+
+from d2_scheduler import D2Scheduler
+
+def scale_rates(R, src, value):
+    """R with R[src] set to `value` and every other rate scaled along (rounded, rates are integers)."""
+    return {m: int(round(R[m] * value / R[src])) for m in R}
+
+def chosen(decision):
+    """Configurations (m, g, k) a decision selects, as a sorted tuple (None without a decision)."""
+    if decision is None or decision.get("objective") is None:
+        return None
+    return tuple(sorted(c for c, v in decision["alloc_conf"].items() if v > 0.5))
+
+def sweep_point(scheduler, R, value, key="cost"):
+    """Re-solve `scheduler` at the rates R and record one point of the capacity curve for source rate `value`."""
+    scheduler.update_rates(R)
+    result = scheduler.solve()
+    major, partial = result["major"], result["partial"]
+
+    cost = None
+    if major["objective"] is not None and (partial is None or partial["objective"] is not None):
+        cost = major["objective"] + (partial["objective"] if partial else 0.0)
+    configs = chosen(major)
+    if key in ("all", "cost") and configs is not None:
+        configs = (configs, chosen(partial) if partial else ())
+    return dict(rate=value, configs=configs, major=major["objective"],
+                partial=partial["objective"] if partial else None, cost=cost, status=major["status"])
+
+def on_chord(left, mid, right, rel_tol):
+    """Whether mid's total cost lies within rel_tol of the line through left's and right's."""
+    if left["cost"] is None or mid["cost"] is None or right["cost"] is None:
+        return left["cost"] is None and mid["cost"] is None and right["cost"] is None
+    t = (mid["rate"] - left["rate"]) / (right["rate"] - left["rate"])
+    line = left["cost"] + t * (right["cost"] - left["cost"])
+    return abs(mid["cost"] - line) <= rel_tol * abs(line)
+
+def capacity_curve(instance, src, lo, hi, points=50, spacing="log", refine=True, tol=1, key="cost", rel_tol=0.01,
+                   rates=None, **kw):
+    """
+    Optimal GPU cost as a function of the source rate R[src] in [lo, hi].
+
+    rates: value -> {m: rate}, the rates of every module at R[src] = value;
+           None scales every rate of instance["R"] along (scale_rates).
+
+    One D2Scheduler is built for the whole sweep (kw: its options, e.g.
+    link="bigm", partial_mode="lookup"); each point only updates the rates
+    and is warm-started from the previous major decision. `points` rates are
+    sampled, evenly ("linear") or geometrically ("log") spaced. With refine,
+    every pair of neighbouring samples that disagree is bisected down to
+    `tol` requests to locate the breakpoints.
+
+    key: what a breakpoint is.
+         "cost" (the default) is a kink or jump of the total cost (major plus
+         partial): a pair of samples disagrees when the cost of their
+         midpoint is off their chord by more than rel_tol, and segments are
+         maximal runs of points within rel_tol of one line. The remainder
+         R % P_r makes the exact curve a fine sawtooth, so this keeps the
+         curve compact at the price of rel_tol; a pair whose midpoint
+         happens to lie on the chord is not bisected further.
+         "all" compares the major and partial configurations, the exact
+         breakpoints of the total cost; the partial configurations change
+         every few requests, so it needs many solves and segments.
+         "major" compares the major configurations only. Their cost is
+         C[g] * R[m] / P_r, linear in the rates, so it only finds breakpoints
+         when the rates do not scale proportionally (e.g. `rates` moving
+         R[src] alone): under scale_rates the curve is one segment unless
+         ties or rounding flip a choice.
+
+    Returns {"points": [...], "segments": [...]}. A point is {rate, configs,
+    major, partial, cost, status}; cost is the major plus partial objective.
+    A segment is {lo, hi, configs, slope, cost_lo, cost_hi}: configs are
+    those at lo, and slope is the total cost per unit of R[src] between its
+    two ends (None for a single point).
+    """
+    M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO = (instance[key] for key in
+        ("M", "DAG", "M_SRC", "M_SNK", "G", "P", "C", "R", "L_SLO"))
+    if rates is None:
+        rates = lambda value: scale_rates(R, src, value)
+
+    if spacing == "log":
+        values = np.geomspace(lo, hi, points)
+    else:
+        values = np.linspace(lo, hi, points)
+    values = sorted(set(int(round(v)) for v in values))
+
+    scheduler = D2Scheduler(M, DAG, M_SRC, M_SNK, G, P, C, rates(values[0]), L_SLO, **kw)
+    curve = [sweep_point(scheduler, rates(v), v, key) for v in values]
+
+    if refine:
+        # Bisect both halves of every disagreeing pair, so breakpoints between two samples are all found
+        stack = list(zip(curve[:-1], curve[1:]))
+        while stack:
+            left, right = stack.pop()
+            if right["rate"] - left["rate"] <= tol or (key != "cost" and left["configs"] == right["configs"]):
+                continue
+            value = (left["rate"] + right["rate"]) // 2
+            mid = sweep_point(scheduler, rates(value), value, key)
+            curve.append(mid)
+            if key != "cost" or not on_chord(left, mid, right, rel_tol):
+                stack.extend([(mid, right), (left, mid)])
+        curve.sort(key=lambda point: point["rate"])
+
+    return dict(points=curve, segments=segments(curve, rel_tol if key == "cost" else None))
+
+def segments(curve, rel_tol=None):
+    """
+    Segments of a sorted curve (see capacity_curve): runs of consecutive
+    points with the same configs, or with rel_tol, maximal runs whose total
+    cost stays within rel_tol of the line through their two ends.
+    """
+    runs = []
+    for point in curve:
+        if not runs:
+            runs.append([point])
+        elif rel_tol is None:
+            if runs[-1][-1]["configs"] == point["configs"]:
+                runs[-1].append(point)
+            else:
+                runs.append([point])
+        elif ((runs[-1][0]["cost"] is None) == (point["cost"] is None)
+              and all(on_chord(runs[-1][0], p, point, rel_tol) for p in runs[-1][1:])):
+            runs[-1].append(point)
+        else:
+            runs.append([point])
+
+    out = []
+    for run in runs:
+        first, last = run[0], run[-1]
+        slope = None
+        if last["rate"] > first["rate"] and first["cost"] is not None and last["cost"] is not None:
+            slope = (last["cost"] - first["cost"]) / (last["rate"] - first["rate"])
+        out.append(dict(lo=first["rate"], hi=last["rate"], configs=first["configs"], slope=slope,
+                        cost_lo=first["cost"], cost_hi=last["cost"]))
+    return out
@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from d2_dag import is_out_forest
+from d2_dp import solve_tree
+from d2_greedy import EPS, INFEASIBLE, fixed_decision, latency_budget
+from d2_profile import as_profile_table, partial_latency, profile_digest, residual_decision
+
+def table_digest(M, G, P, C):
+    """sha256 (hex) of what a CostTables depends on: M, G, the profile columns and C."""
+    h = hashlib.sha256()
+    h.update(repr((list(M), list(G), [float(C[g]) for g in G])).encode())
+    h.update(profile_digest(P, M, G))
+    return h.hexdigest()
+
+class CostTables:
+    """
+    Per-module lookup tables of a profile, built offline by compile_tables.
+
+    Every module is priced at each level of a latency grid: the cheapest
+    configuration whose latency fits the level. Rows are indices into the
+    ProfileTable of (M, G), -1 where nothing fits, and costs inf there.
+
+    major_row / major_unit [module, latency]: the major-phase row with the
+    lowest C[g] / P_r among those with P_l <= latency, and that cost per unit
+    rate (the major cost C[g] * R[m] / P_r is linear in the rate, so one
+    entry serves every rate).
+
+    cost / major_pick / partial_row [module, latency, rate]: both phases of
+    one module serving rate[r]: a major row c with P_l <= latency, and for the
+    remainder res = R % P_r(c) a row c' on the same GPU type whose
+    partial_latency fits too, at cost C[g] * R / P_r(c) + C[g] * res /
+    P_r(c'). Without a remainder only c is needed (partial_row is c, as in
+    the partial phase, which keeps it), at the major cost alone. Rate 0
+    costs nothing and has no rows.
+
+    Arrays are plain .npy files (save), so load(..., mmap_mode="r") maps
+    them read-only and every scheduler process on a host shares the page
+    cache copy instead of holding its own.
+    """
+
+    ARRAYS = ("latency", "rate", "major_row", "major_unit", "cost", "major_pick", "partial_row")
+
+    def __init__(self, modules, gpus, digest, latency, rate, major_row, major_unit, cost, major_pick, partial_row):
+        self.modules = list(modules)
+        self.gpus = list(gpus)
+        self.digest = digest
+        self.latency = latency
+        self.rate = rate
+        self.major_row = major_row
+        self.major_unit = major_unit
+        self.cost = cost
+        self.major_pick = major_pick
+        self.partial_row = partial_row
+
+    def __repr__(self):
+        return "CostTables({} modules, {} latency levels, {} rates)".format(
+            len(self.modules), len(self.latency), len(self.rate))
+
+    def save(self, path):
+        """Write one .npy per array and meta.json into the directory `path` (meta.json last, atomically)."""
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, name + ".npy"), np.asarray(getattr(self, name)))
+        meta = dict(modules=self.modules, gpus=self.gpus, digest=self.digest)
+        fd, tmp = tempfile.mkstemp(dir=path, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Tables saved in `path`; mmap_mode=None reads them into memory instead of mapping them."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = [np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode) for name in cls.ARRAYS]
+        return cls(meta["modules"], meta["gpus"], meta["digest"], *arrays)
+
+    def check(self, M, G, P, C):
+        """Raise ValueError unless the tables were compiled from these M, G, P and C."""
+        if list(M) != self.modules or list(G) != self.gpus or table_digest(M, G, P, C) != self.digest:
+            raise ValueError("CostTables were compiled from a different instance")
+
+    def latency_bucket(self, L):
+        """Index of the highest grid level <= L (-1 below the grid), elementwise."""
+        return np.searchsorted(self.latency, np.asarray(L, dtype=float) + EPS, side='right') - 1
+
+    def rate_bucket(self, R):
+        """Index of every rate in the grid; KeyError for a rate the tables were not compiled for."""
+        R = np.asarray(R, dtype=float)
+        idx = np.minimum(np.searchsorted(self.rate, R), len(self.rate) - 1)
+        if not np.array_equal(self.rate[idx], R):
+            raise KeyError("rates {} are not in the table grid".format(sorted(set(R[self.rate[idx] != R].tolist()))))
+        return idx
+
+    def lookup(self, R, L):
+        """
+        Two-phase (cost, major_pick, partial_row) of every module (arrays in
+        M order) serving R[i] within latency L[i], one table read each.
+        """
+        mod = np.arange(len(self.modules))
+        r, l = self.rate_bucket(R), self.latency_bucket(L)
+        at = np.maximum(l, 0)
+        fit = l >= 0
+        return (np.where(fit, self.cost[mod, at, r], np.inf),
+                np.where(fit, self.major_pick[mod, at, r], -1),
+                np.where(fit, self.partial_row[mod, at, r], -1))
+
+def _best(need, cost, latency):
+    """
+    For every row of need / cost (choices in columns), the cheapest choice
+    with need <= each level of `latency` (the first one on ties): (choice
+    index, -1 where none fits, cost, inf there), both (rows, levels).
+    """
+    n_row, n_choice = need.shape
+    if n_choice == 0:
+        return np.full((n_row, len(latency)), -1), np.full((n_row, len(latency)), np.inf)
+    order = np.argsort(need, axis=1, kind='stable')
+    need_s = np.take_along_axis(need, order, axis=1)
+    cost_s = np.take_along_axis(cost, order, axis=1)
+
+    # Position of the running minimum cost along increasing need
+    low = np.minimum.accumulate(cost_s, axis=1)
+    new = np.ones_like(cost_s, dtype=bool)
+    new[:, 1:] = cost_s[:, 1:] < low[:, :-1]
+    pos = np.maximum.accumulate(np.where(new, np.arange(n_choice), 0), axis=1)
+
+    # One searchsorted for all rows: shift row i by i * span so the rows stay apart
+    top = float(latency[-1]) + 1.0
+    span = top + 1.0
+    shift = np.arange(n_row)[:, None] * span
+    flat = (np.minimum(need_s, top) + shift).ravel()
+    count = np.searchsorted(flat, (latency[None, :] + EPS + shift).ravel(), side='right').reshape(n_row, -1)
+    k = count - np.arange(n_row)[:, None] * n_choice - 1
+
+    row = np.arange(n_row)[:, None]
+    at = pos[row, np.maximum(k, 0)]
+    fit = k >= 0
+    return np.where(fit, order[row, at], -1), np.where(fit, cost_s[row, at], np.inf)
+
+def compile_tables(M, G, P, C, rate, latency=None, n_latency=32):
+    """
+    Build the CostTables of (M, G, P, C) (see CostTables).
+
+    rate: the rates to price (e.g. np.arange(0, R_max + 1), or the levels a
+          deployment actually runs at); lookups need exact grid rates,
+          since the remainder logic makes the cost of a rate unrelated to
+          its neighbours'.
+    latency: the latency levels; None spaces n_latency levels geometrically
+          from the fastest P_l to the slowest partial_latency (one request
+          in a batch). Lookups round a latency limit down to a level, so
+          a finer grid wastes less of the limit.
+    """
+    P = as_profile_table(P, M, G)
+    n_m, n_g = len(M), len(G)
+    rate = np.unique(np.asarray(rate, dtype=float))
+    if latency is None:
+        slowest = float(np.max(np.where(P.batch > 1, P.duration + P.batch / (1.0 + 1.0/1000.0), P.latency),
+                               initial=0.0))
+        fastest = float(np.min(P.latency, initial=1.0))
+        latency = np.geomspace(fastest, max(slowest, P.latency.max(initial=fastest)), n_latency)
+    latency = np.unique(np.asarray(latency, dtype=float))
+    C_vec = np.array([C[g] for g in G], dtype=float)
+    unit = C_vec[P.gpu] / P.throughput
+
+    n_lat, n_rate = len(latency), len(rate)
+    major_row = np.full((n_m, n_lat), -1, dtype=np.int32)
+    major_unit = np.full((n_m, n_lat), np.inf)
+    cost = np.full((n_m, n_lat, n_rate), np.inf)
+    major_pick = np.full((n_m, n_lat, n_rate), -1, dtype=np.int32)
+    partial_row = np.full((n_m, n_lat, n_rate), -1, dtype=np.int32)
+
+    for i in range(n_m):
+        s = P.module_rows(M[i])
+        rows = np.arange(s.start, s.stop)
+        choice, best = _best(P.latency[rows][None, :], unit[rows][None, :], latency)
+        major_row[i] = np.where(choice[0] >= 0, rows[np.maximum(choice[0], 0)], -1)
+        major_unit[i] = best[0]
+
+        # (major row, partial row) pairs on one GPU type
+        groups = [np.arange(P.offsets[i * n_g + j], P.offsets[i * n_g + j + 1]) for j in range(n_g)]
+        pc = np.concatenate([np.repeat(grp, len(grp)) for grp in groups]) if groups else np.zeros(0, np.int64)
+        pp = np.concatenate([np.tile(grp, len(grp)) for grp in groups]) if groups else np.zeros(0, np.int64)
+
+        r = rate[:, None]
+        res = np.floor(np.mod(r, P.throughput[pc]))
+        full = res == 0
+        v = np.floor(np.mod(res, P.throughput[pp]))
+        batched = (v > 0) & (P.batch[pp] > 1)
+        p_lat = np.where(batched, P.duration[pp] + P.batch[pp] / (v + 1.0/1000.0), P.latency[pp])
+        need = np.where(full, np.where(pc == pp, P.latency[pc], np.inf), np.maximum(P.latency[pc], p_lat))
+        pair_cost = unit[pc] * r + np.where(full, 0.0, unit[pp] * res)
+
+        choice, best = _best(need, pair_cost, latency)
+        pick = np.maximum(choice, 0)
+        cost[i] = best.T
+        major_pick[i] = np.where(choice >= 0, pc[pick], -1).T
+        partial_row[i] = np.where(choice >= 0, pp[pick], -1).T
+
+    # Rate 0: nothing to serve
+    zero = rate == 0
+    cost[:, :, zero] = 0.0
+    major_pick[:, :, zero] = -1
+    partial_row[:, :, zero] = -1
+
+    return CostTables(M, G, table_digest(M, G, P, C), latency, rate, major_row, major_unit, cost, major_pick,
+                      partial_row)
+
+def _pick(M, DAG, M_SNK, L_SLO, tables, r):
+    """
+    Latency level per module from the tables alone (one cost column per
+    module): solve_tree over the levels on an out-forest, latency_budget
+    levels otherwise. None when some module has no level that fits.
+    """
+    mod = np.arange(len(M))
+    cost = tables.cost[mod, :, r]
+    finite = np.isfinite(cost)
+    if not finite.any(axis=1).all():
+        return None
+
+    if is_out_forest(M, DAG):
+        choices = {m: [(float(tables.latency[l]), float(cost[i, l]), l) for l in np.flatnonzero(finite[i]).tolist()]
+                   for i, m in enumerate(M)}
+        res = solve_tree(M, DAG, M_SNK, L_SLO, choices)
+        return None if res is None else np.array([res[0][m] for m in M])
+
+    min_lat = tables.latency[finite.argmax(axis=1)]
+    budget = latency_budget(M, DAG, M_SNK, L_SLO, dict(zip(M, min_lat.tolist())))
+    level = tables.latency_bucket(np.minimum(budget, tables.latency[-1]))
+    if (level < 0).any() or not np.isfinite(cost[mod, np.maximum(level, 0)]).all():
+        return None
+    return level
+
+def table_scheduler(M, DAG, M_SRC, M_SNK, G, P, C, R, L_SLO, tables, check=True):
+    """
+    lp_scheduler inputs and {"major": ..., "partial": ...} result from a
+    CostTables lookup, without a solver or a scan of the profile: every
+    module gets a latency level (exactly, by solve_tree over the levels, on
+    chain / out-tree DAGs; by latency_budget otherwise) and takes the two
+    rows the tables hold for its rate at that level. Both phases of a module
+    are priced together, so the major decision is not the major-phase
+    optimum, and the levels round latencies down to the grid: status is
+    SUBOPTIMAL. Every R[m] must be a rate of the grid.
+
+    check: verify the tables against (M, G, P, C) first (hashes P).
+    """
+    t0 = time.perf_counter()
+    P = as_profile_table(P, M, G)
+    if check:
+        tables.check(M, G, P, C)
+    rate = [R[m] for m in M]
+    r = tables.rate_bucket(rate)
+    level = _pick(M, DAG, M_SNK, L_SLO, tables, r)
+    if level is None:
+        return dict(major=dict(status=INFEASIBLE, runtime=time.perf_counter() - t0, objective=None), partial=None)
+
+    mod = np.arange(len(M))
+    major_pick = tables.major_pick[mod, level, r]
+    partial_row = tables.partial_row[mod, level, r]
+    C_vec = np.array([C[g] for g in G], dtype=float)
+
+    P_conf = P.conf()
+    P_r = {P_conf[row]: float(P.throughput[row]) for row in np.concatenate([major_pick, partial_row]).tolist()
+           if row >= 0}
+    serve = [i for i in mod.tolist() if major_pick[i] >= 0]
+    major = fixed_decision(
+        M, DAG, M_SNK, P_conf, P_r, {M[i]: P_conf[major_pick[i]] for i in serve},
+        {m: float(P.latency[major_pick[i]]) if major_pick[i] >= 0 else 0.0 for i, m in enumerate(M)}, R,
+        float(sum(C_vec[P.gpu[major_pick[i]]] * rate[i] / P.throughput[major_pick[i]] for i in serve)), t0)
+
+    rate_res, util_res, alloc_gpu = residual_decision(P_conf, P_r, major["alloc_conf"], major["rate"])
+    major.update(rate_res=rate_res, util_res=util_res, alloc_gpu=alloc_gpu)
+    if all(util_res[m] == 1.0 for m in util_res):
+        return dict(major=major, partial=None)
+
+    t1 = time.perf_counter()
+    lat = {m: 0.0 for m in M}
+    for i in serve:
+        c = partial_row[i]
+        v = int(rate_res[M[i]] % P.throughput[c]) if util_res[M[i]] < 1.0 else 0
+        lat[M[i]] = partial_latency(P.batch[c], P.latency[c], P.duration[c], v)
+    partial = fixed_decision(
+        M, DAG, M_SNK, P_conf, P_r, {M[i]: P_conf[partial_row[i]] for i in serve}, lat, rate_res,
+        float(sum(C_vec[P.gpu[partial_row[i]]] * rate_res[M[i]] / P.throughput[partial_row[i]] for i in serve)), t1)
+    return dict(major=major, partial=partial)
@@ -1,3 +1,5 @@
+import random
+
 from d2_alloc_lp import *
 
 def DAG1():
@@ -96,6 +98,57 @@ def DAG2():
     L_SLO = 0.75
     return dict(M=M, DAG=DAG, M_SRC=M_SRC, M_SNK=M_SNK, G=G, P=P, C=C, R=R, L_SLO=L_SLO)
 
+def DAG_synthetic(num_module=100, num_gpu=10, extra_edge=0.2, seed=0):
+    """
+    Random layered DAG for scaling experiments.
+
+    Every module hangs off one earlier module (an out-tree), and with
+    probability `extra_edge` gets a second parent, which makes it a general DAG.
+    GPU types differ by a speed factor applied to the DAG2 profile rows.
+    """
+    rng = random.Random(seed)
+
+    M = ["M_{}".format(i) for i in range(num_module)]
+    DAG = {}
+    depth = {M[0]: 1}
+    for i in range(1, num_module):
+        parents = {rng.randrange(max(0, i - 8), i)}
+        if rng.random() < extra_edge:
+            parents.add(rng.randrange(0, i))
+        for j in parents:
+            DAG[(M[j], M[i])] = 1
+        depth[M[i]] = max(depth[M[j]] for j in parents) + 1
+
+    has_in = {m for _, m in DAG}
+    has_out = {l for l, _ in DAG}
+    M_SRC = [m for m in M if m not in has_in]
+    M_SNK = [m for m in M if m not in has_out]
+
+    G = ["GPU_{}".format(i) for i in range(num_gpu)]
+    speed = {g: rng.uniform(0.5, 2.0) for g in G}
+
+    base = [[1, 1,  0.050,  0.025,     40],
+            [2, 1,  0.080,  0.040,     50],
+            [4, 1,  0.150,  0.075,     53],
+            [4, 2,  0.200,  2.0/15.0,  60],
+            [8, 4,  0.333,  4.0/15.0,  120]]
+
+    P = {}
+    for m in M:
+        for g in G:
+            s = speed[g] * rng.uniform(0.8, 1.2)
+            P[(m, g)] = [[b, p, l / s, d / s, max(1, int(t * s))] for b, p, l, d, t in base]
+
+    C = {g: round(speed[g] ** 1.2, 3) for g in G}
+
+    R = {m: rng.randrange(50, 500) for m in M}
+
+    # Longest path (in hops) sets the SLO, so that the slowest GPU type
+    # running the fastest config still fits.
+    L_SLO = round(max(depth.values()) * 0.25, 3)
+
+    return dict(M=M, DAG=DAG, M_SRC=M_SRC, M_SNK=M_SNK, G=G, P=P, C=C, R=R, L_SLO=L_SLO)
+
 if __name__ == "__main__":
     input = DAG2()
     lp_scheduler(**input)
\ No newline at end of file
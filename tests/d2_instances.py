@@ -0,0 +1,55 @@
+import random
+
+def random_instance(seed, nm=5, ng=3, nk=3, forest=False, slo=1.0):
+    """
+    Tiny random instance for the cross-checks: `nm` modules on a random DAG
+    (an out-forest with `forest`), `ng` GPU types and `nk` profile rows per
+    (module, GPU type), drawn from the rows of DAG_synthetic. Sized to fit a
+    size-limited Gurobi license; `slo` scales the SLO of the fastest path.
+    """
+    rng = random.Random(seed)
+    M = ["M{}".format(i) for i in range(nm)]
+    DAG = {}
+    for i in range(1, nm):
+        if forest:
+            if rng.random() < 0.8:
+                DAG[(M[rng.randrange(i)], M[i])] = 1
+        else:
+            for j in rng.sample(range(i), min(i, rng.choice((1, 1, 2)))):
+                DAG[(M[j], M[i])] = 1
+    M_SRC = [m for m in M if not any(n == m for _, n in DAG)]
+    M_SNK = [m for m in M if not any(l == m for l, _ in DAG)]
+
+    G = ["G{}".format(i) for i in range(ng)]
+    base = [[1, 1,  0.050,  0.025,     40],
+            [2, 1,  0.080,  0.040,     50],
+            [4, 1,  0.150,  0.075,     53],
+            [4, 2,  0.200,  2.0/15.0,  60],
+            [8, 4,  0.333,  4.0/15.0,  120]]
+    P = {}
+    for m in M:
+        for g in G:
+            s = rng.uniform(0.5, 2.0)
+            rows = sorted(rng.sample(base, nk), key=lambda row: (row[0], row[1]))
+            P[(m, g)] = [[b, p, l / s, d / s, max(1, int(t * s))] for b, p, l, d, t in rows]
+    C = {g: round(rng.uniform(0.5, 3.0), 3) for g in G}
+    R = {m: rng.randrange(20, 400) for m in M}
+
+    depth = {}
+    for m in M:
+        depth[m] = max((depth[l] for l, n in DAG if n == m), default=0) + 1
+    L_SLO = round(max(depth.values()) * 0.2 * slo, 3)
+    return dict(M=M, DAG=DAG, M_SRC=M_SRC, M_SNK=M_SNK, G=G, P=P, C=C, R=R, L_SLO=L_SLO)
+
+def solve(**kw):
+    """lp_scheduler(verbose=False, **kw); skips the test when the model exceeds a size-limited Gurobi license."""
+    import gurobipy as gp
+    import pytest
+
+    from d2_alloc_lp import lp_scheduler
+    try:
+        return lp_scheduler(verbose=False, **kw)
+    except gp.GurobiError as e:
+        if "size-limited" in str(e):
+            pytest.skip("model too large for the Gurobi license")
+        raise
@@ -0,0 +1,39 @@
+import pytest
+
+from d2_decomp import decomp_major
+from d2_greedy import greedy_major
+from d2_instances import random_instance, solve
+from d2_profile import as_profile_table
+
+MIP = dict(engine="mip", link="bigm", partial_mode="lookup")
+
+# Gurobi stops within its default MIPGap of the optimum
+GAP = 1e-4
+
+def objectives(result):
+    return [None if result[phase] is None else result[phase]["objective"] for phase in ("major", "partial")]
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("slo", [0.8, 1.0, 1.5])
+def test_dp_matches_mip_on_forests(seed, slo):
+    """engine="dp" reaches the MIP's objective in both phases on out-forests."""
+    inst = random_instance(seed, nm=6, ng=2, nk=3, forest=True, slo=slo)
+    for a, b in zip(objectives(solve(**inst, **MIP)), objectives(solve(**inst, engine="dp"))):
+        assert (a is None) == (b is None)
+        if a is not None:
+            assert b == pytest.approx(a, rel=GAP, abs=1e-6)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_heuristics_not_below_mip(seed):
+    """greedy_major and decomp_major never beat the exact major phase; decomp's bound never exceeds it."""
+    inst = random_instance(seed, nm=6, ng=2, nk=3)
+    M, DAG, M_SNK, G, C, R, L_SLO = (inst[key] for key in ("M", "DAG", "M_SNK", "G", "C", "R", "L_SLO"))
+    P = as_profile_table(inst["P"], M, G)
+    optimum = solve(**inst, **MIP)["major"]["objective"]
+    greedy = greedy_major(M, DAG, M_SNK, G, P, C, R, L_SLO)
+    decomp = decomp_major(M, DAG, M_SNK, G, P, C, R, L_SLO)
+    if optimum is None:
+        return
+    assert greedy["objective"] is None or greedy["objective"] >= optimum * (1.0 - GAP)
+    assert decomp["objective"] is None or decomp["objective"] >= optimum * (1.0 - GAP)
+    assert decomp["bound"] <= optimum * (1.0 + GAP)
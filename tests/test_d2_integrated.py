@@ -0,0 +1,23 @@
+import pytest
+
+from d2_instances import random_instance, solve
+from d2_options import PhaseOptions, SolverOptions
+
+EXACT = dict(mode="integrated", options=SolverOptions(PhaseOptions(mip_gap=0.0), PhaseOptions(mip_gap=0.0)))
+
+def cost(result):
+    major, partial = result["major"], result["partial"]
+    if major["objective"] is None:
+        return None
+    return major["objective"] + (partial["objective"] if partial else 0.0)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_integrated_pruning_and_backends_agree(seed):
+    """The integrated optimum does not depend on pruning or on the backend."""
+    inst = random_instance(seed, nm=5, ng=3, nk=3)
+    pruned = cost(solve(**inst, backend="highs", **EXACT))
+    unpruned = cost(solve(**inst, backend="highs", prune=False, **EXACT))
+    assert pruned is not None
+    assert unpruned == pytest.approx(pruned, abs=1e-6)
+    gurobi = cost(solve(**inst, backend="gurobi", prune=False, **EXACT))
+    assert gurobi == pytest.approx(pruned, abs=1e-6)
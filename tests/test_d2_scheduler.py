@@ -0,0 +1,26 @@
+import pytest
+
+from d2_alloc_lp import lp_scheduler
+from d2_scheduler import D2Scheduler
+from main_d2_lp import DAG_synthetic
+
+def cost(decision):
+    return decision["objective"] if decision else 0.0
+
+# Instances stay tiny so the nonconvex partial model fits a size-limited Gurobi license
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("kw", [dict(), dict(link="bigm", partial_mode="lookup")])
+def test_rate_drop_to_zero(seed, kw):
+    """A module whose rate drops to 0 between two ticks must not leave its old Constr1 RHS in the partial model."""
+    inst = DAG_synthetic(4, 1, seed=seed)
+    R = inst["R"]
+    ticks = [dict(R), dict(R, **{inst["M"][-1]: 0}), dict(R, **{inst["M"][-2]: 0}), dict(R)]
+
+    scheduler = D2Scheduler(**inst, **kw)
+    for rates in ticks:
+        scheduler.update_rates(rates)
+        result = scheduler.solve()
+        fresh = lp_scheduler(**dict(inst, R=rates), verbose=False, engine="mip", **kw)
+        assert result["major"]["objective"] == pytest.approx(fresh["major"]["objective"], abs=1e-6)
+        assert cost(result["partial"]) is not None
+        assert cost(result["partial"]) == pytest.approx(cost(fresh["partial"]), abs=1e-6)
@@ -0,0 +1,18 @@
+import pytest
+
+from d2_sweep import capacity_curve
+from main_d2_lp import DAG1
+
+def test_cost_segments_are_linear():
+    """key="cost" segments: slope from the total cost at both ends, every point within rel_tol of its line."""
+    inst = DAG1()
+    curve = capacity_curve(inst, inst["M_SRC"][0], 10, 500, points=20, rel_tol=0.01, link="bigm", partial_mode="lookup")
+    assert len(curve["segments"]) < len(curve["points"]) / 2
+    for seg in curve["segments"]:
+        if seg["slope"] is None:
+            continue
+        assert seg["cost_lo"] + seg["slope"] * (seg["hi"] - seg["lo"]) == pytest.approx(seg["cost_hi"])
+        for point in curve["points"]:
+            if seg["lo"] <= point["rate"] <= seg["hi"]:
+                line = seg["cost_lo"] + seg["slope"] * (point["rate"] - seg["lo"])
+                assert point["cost"] == pytest.approx(line, rel=0.01 + 1e-9)